@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import BlogPost, BlogCategory
+from lensra.utils.images import image_url
 
 class BlogCategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,21 +22,4 @@ class BlogPostSerializer(serializers.ModelSerializer):
         ]
 
     def get_featured_image_url(self, obj):
-        if obj.featured_image:
-            # Check if it's a CloudinaryResource (CloudinaryField)
-            if hasattr(obj.featured_image, 'build_url'):
-                url = obj.featured_image.build_url(
-                    quality='auto',
-                    fetch_format='auto',
-                    width=1200, # Increased for high-res blog headers
-                    crop='limit',
-                    flags='progressive'
-                )
-            else:
-                url = obj.featured_image.url
-            
-            # Secure URL enforcement
-            if url.startswith('http://'):
-                url = 'https://' + url[7:]
-            return url
-        return None
\ No newline at end of file
+        return image_url(obj.featured_image, preset='blog-hero')  # high-res blog header
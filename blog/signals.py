@@ -0,0 +1,14 @@
+# blog/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from blog.models import BlogPost, BlogCategory
+from lensra.utils.conditional import bump_versions
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=BlogCategory)
+@receiver(post_delete, sender=BlogCategory)
+def blog_changed(sender, instance, **kwargs):
+    # Invalidates ETags of the blog endpoints (see lensra.utils.conditional)
+    bump_versions('blog')
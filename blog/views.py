@@ -4,15 +4,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from .models import BlogPost, BlogCategory
 from .serializers import BlogPostSerializer, BlogCategorySerializer
+from lensra.utils.conditional import ConditionalGetMixin
 
-class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
+class BlogPostViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing Lensra blog posts.
     Supports filtering by category and fetching categories.
+    Answers repeat requests with 304 until a post or category changes.
     """
     serializer_class = BlogPostSerializer
     lookup_field = 'slug'
     permission_classes = [AllowAny]
+    cache_scopes = ('blog',)
     
     def get_queryset(self):
         """
@@ -1,19 +1,5 @@
-from django.db import models
-import string
-import secrets
-
-
-
-def generate_gift_code():
-    """
-    Generates a 6-character unique ID using a mix of upper, lower, 
-    and digits while excluding visually similar characters (I, l, 1, O, 0).
-    """
-    # Custom alphabet for maximum clarity and high variety
-    # Removed: I, l, 1, O, o, 0
-    alphabet = "abcdefghijkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789"
-    
-    return ''.join(secrets.choice(alphabet) for _ in range(6))
+from django.db import IntegrityError, models
+from lensra.utils.ids import SECRET_LENGTH, create_with_code
 
 
 class GiftStatus(models.TextChoices):
@@ -48,7 +34,8 @@ class DigitalGift(models.Model):
     sender_name = models.CharField(max_length=100)
     sender_email = models.EmailField()
     session_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
-    short_id = models.CharField(max_length=10, default=generate_gift_code, editable=False,db_index=True, null=False, blank=False)
+    # Set in save() unless given; 17 chars, see lensra.utils.ids
+    short_id = models.CharField(max_length=24, editable=False, unique=True, null=False, blank=True)
 
     # Recipient info
     recipient_name = models.CharField(max_length=100)
@@ -103,13 +90,19 @@ class DigitalGift(models.Model):
         return total
 
     def save(self, *args, **kwargs):
-            if not self.short_id:
-                # Collision check
-                new_id = generate_gift_code()
-                while DigitalGift.objects.filter(short_id=new_id).exists():
-                    new_id = generate_gift_code()
-                self.short_id = new_id
-            super().save(*args, **kwargs)
+            if not self._state.adding or self.short_id:
+                return super().save(*args, **kwargs)
+
+            # New gifts get a fresh short ID, retried if it's already taken. Gift
+            # links are shared publicly, so it ends in an unguessable random tail
+            def insert(code):
+                self.short_id = code
+                super(DigitalGift, self).save(*args, **kwargs)
+            try:
+                create_with_code('gift', insert, random_length=SECRET_LENGTH)
+            except IntegrityError:
+                self.short_id = ''  # not saved; don't keep a code that was never stored
+                raise
 
 
 class AddOn(models.Model):
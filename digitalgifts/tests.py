@@ -1,3 +1,28 @@
 from django.test import TestCase
+from .models import DigitalGift, ExperienceTier
 
-# Create your tests here.
+
+class DigitalGiftShortIdTest(TestCase):
+    """Test the public short IDs of digital gifts."""
+
+    def setUp(self):
+        self.tier = ExperienceTier.objects.create(name='Basic', description='Text only', price=1000.00)
+
+    def create_gift(self, **kwargs):
+        return DigitalGift.objects.create(
+            sender_name='Ada', sender_email='ada@example.com',
+            recipient_name='Bola', recipient_email='bola@example.com', tier=self.tier, **kwargs
+        )
+
+    def test_generated_short_id_has_a_random_tail(self):
+        from lensra.utils.ids import SECRET_LENGTH, SEQUENCE_WIDTH, TIME_WIDTH
+
+        gift = self.create_gift()
+        self.assertEqual(len(gift.short_id), TIME_WIDTH + SEQUENCE_WIDTH + SECRET_LENGTH)
+        short_id = gift.short_id
+        gift.is_opened = True
+        gift.save()
+        self.assertEqual(DigitalGift.objects.get(pk=gift.pk).short_id, short_id)
+
+    def test_given_short_id_is_kept(self):
+        self.assertEqual(self.create_gift(short_id='MYGIFT').short_id, 'MYGIFT')
@@ -10,6 +10,7 @@ from .serializers import (
     DigitalGiftSerializer
 )
 from rest_framework.permissions import AllowAny
+from lensra.utils.idempotency import IdempotencyMixin
 
 # 1. Fetch Occasions for Step 1
 class OccasionListView(generics.ListAPIView):
@@ -29,7 +30,7 @@ class AddOnListView(generics.ListAPIView):
     serializer_class = AddOnSerializer
     permission_classes = [AllowAny]
 # 4. Handle Gift Creation & Final Submission
-class DigitalGiftListCreateView(generics.ListCreateAPIView):
+class DigitalGiftListCreateView(IdempotencyMixin, generics.ListCreateAPIView):
     queryset = DigitalGift.objects.all()
     serializer_class = DigitalGiftSerializer
     permission_classes = [AllowAny]
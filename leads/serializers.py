@@ -1,7 +1,6 @@
 from rest_framework import serializers
 from .models import Lead, InviteLink, GiftPreview, WhatsAppLog
-import random
-import string
+from lensra.utils.ids import create_with_code
 
 class InviteLinkSerializer(serializers.ModelSerializer):
     code = serializers.CharField(required=False)
@@ -12,15 +11,12 @@ class InviteLinkSerializer(serializers.ModelSerializer):
         read_only_fields = ['clicks', 'created_at']
 
     def create(self, validated_data):
-        if 'code' not in validated_data or not validated_data['code']:
-            validated_data['code'] = self.generate_unique_code()
-        return super().create(validated_data)
-
-    def generate_unique_code(self):
-        while True:
-            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-            if not InviteLink.objects.filter(code=code).exists():
-                return code
+        if validated_data.get('code'):
+            return super().create(validated_data)
+        # Time-ordered code (lensra.utils.ids), retried if it's already taken
+        return create_with_code(
+            'invite', lambda code: super(InviteLinkSerializer, self).create({**validated_data, 'code': code})
+        )
 
 
 class GiftPreviewSerializer(serializers.ModelSerializer):
@@ -3,6 +3,7 @@ from .models import Lead, InviteLink, GiftPreview
 from .serializers import LeadSerializer, InviteLinkSerializer, GiftPreviewSerializer
 from rest_framework.permissions import AllowAny
 from rest_framework import serializers, status
+from lensra.utils.pagination import KeysetPageNumberPagination
 
 
 # LEAD VIEWS
@@ -10,6 +11,7 @@ class LeadListCreateView(generics.ListCreateAPIView):
     queryset = Lead.objects.all().order_by('-created_at')
     serializer_class = LeadSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPageNumberPagination  # ?pagination=cursor / ?count=false
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -49,12 +51,12 @@ class GiftPreviewDetailView(generics.RetrieveUpdateAPIView):
 
 
 
-import random
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from products.models import Product
 from products.serializers import ProductSerializer
-from django.db import models
+from products.view_counts import record_view
+from products.sampling import random_object
 
 
 class RandomProductRecommendationAPIView(GenericAPIView):
@@ -68,26 +70,20 @@ class RandomProductRecommendationAPIView(GenericAPIView):
         )
 
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-
-        if not queryset.exists():
+        # Bias towards featured; ids are drawn from cached pools (see products.sampling)
+        product = random_object(
+            ['customizable-featured', 'customizable'],
+            self.get_queryset()
+        )
+        if product is None:
             return Response(
                 {"detail": "No products available"},
                 status=404
             )
 
-        # Bias towards featured / trending
-        featured = queryset.filter(is_featured=True)
-        if featured.exists():
-            product = random.choice(featured)
-        else:
-            product = random.choice(queryset)
-
         serializer = self.get_serializer(product)
 
-        # Optional: increment preview count
-        Product.objects.filter(pk=product.pk).update(
-            view_count=models.F("view_count") + 1
-        )
+        # Optional: increment preview count (buffered, see products.view_counts)
+        record_view(product.pk)
 
         return Response(serializer.data)
@@ -73,3 +73,11 @@ def send_order_recieved_email(self, order_id):
         dynamic_data=dynamic_data
     )
 
+
+
+@shared_task
+def release_expired_stock_reservations():
+    """Give back variant stock held by checkouts that were never paid."""
+    from orders.inventory import release_expired_reservations  # import inside task to avoid circular imports
+
+    return release_expired_reservations()
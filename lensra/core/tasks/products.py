@@ -0,0 +1,40 @@
+from celery import shared_task
+
+
+@shared_task
+def refresh_product_read_models(product_ids=None):
+    """Rebuild the precomputed read models (product cards, search vectors) for the given products."""
+    from products.cards import refresh_product_cards  # import inside task to avoid circular imports
+    from products.search import update_search_vectors
+
+    refresh_product_cards(product_ids)
+    update_search_vectors(product_ids)
+
+
+@shared_task
+def flush_product_view_counts():
+    """Fold buffered product views from Redis into Product.view_count."""
+    from products.view_counts import flush_view_counts
+
+    return flush_view_counts()
+
+
+@shared_task
+def refresh_related_products(product_ids=None):
+    """Recompute the related-products neighbour table for everything these products affect."""
+    from products.related import affected_products, refresh_related_products as refresh
+
+    if product_ids is not None:
+        product_ids = affected_products(product_ids)
+    return refresh(product_ids)
+
+
+@shared_task
+def sync_product_sales():
+    """Flip products whose sale window opened or closed, then refresh their read models."""
+    from products.sales import sync_sale_states
+    from products.signals import products_changed
+
+    product_ids = sync_sale_states()
+    products_changed(product_ids)
+    return len(product_ids)
@@ -63,6 +63,7 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
     "x-session-id", 
+    "idempotency-key",  # lensra/utils/idempotency.py
 ]
 CORS_ALLOW_METHODS = [
     'DELETE',
@@ -82,6 +83,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
@@ -314,3 +316,21 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_BACKEND = "django-db"
 
+CELERY_BEAT_SCHEDULE = {
+    # Write-behind product view counter (products/view_counts.py)
+    "flush-product-view-counts": {
+        "task": "lensra.core.tasks.products.flush_product_view_counts",
+        "schedule": 60.0,
+    },
+    # Sale activation / expiry and Product.effective_price (products/sales.py)
+    "sync-product-sales": {
+        "task": "lensra.core.tasks.products.sync_product_sales",
+        "schedule": 60.0,
+    },
+    # Give back stock held by unpaid checkouts (orders/inventory.py)
+    "release-expired-stock-reservations": {
+        "task": "lensra.core.tasks.orders.release_expired_stock_reservations",
+        "schedule": 60.0,
+    },
+}
+
@@ -0,0 +1,107 @@
+"""
+Conditional GET for public catalog resources.
+
+Catalog endpoints used to re-serialize on every request even when the client
+(or a CDN) already held the same bytes. Views using ConditionalGetMixin derive
+an ETag from cheap validators before any serialization happens:
+
+- version stamps for whole resource groups ("categories", "blog", ...), kept
+  in the shared cache and bumped by model signals (bump_versions), and/or
+- a per-object stamp such as a row's updated_at (get_object_validators).
+
+A matching If-None-Match / If-Modified-Since is answered with 304 straight
+from `initial()`. Responses carry Cache-Control plus a Surrogate-Key header so
+a CDN can cache them and purge by resource group or object.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+VERSION_KEY = 'conditional:version:{}'
+
+
+def get_version(scope):
+    # Seeded from the clock so a cache flush never reissues an ETag a client holds
+    key = VERSION_KEY.format(scope)
+    cache.add(key, int(time.time() * 1000), timeout=None)
+    return cache.get(key) or 0
+
+
+def bump_versions(*scopes):
+    """Invalidate validators for these resource groups once the transaction commits."""
+    def bump():
+        for scope in scopes:
+            get_version(scope)
+            cache.incr(VERSION_KEY.format(scope))
+    transaction.on_commit(bump)
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    For read-only API views. Subclasses set `cache_scopes` and may override
+    get_object_validators() to add a per-object stamp.
+    """
+    cache_scopes = ()
+    cache_max_age = 60            # browsers
+    cache_shared_max_age = 300    # CDN, which can be purged by surrogate key
+
+    def get_object_validators(self, request):
+        """
+        Extra validators for the requested object: (etag_parts, last_modified,
+        surrogate_keys), with last_modified as a Unix timestamp or None.
+        """
+        return [], None, []
+
+    def not_modified(self, request):
+        """Hook run when a 304 is sent instead of the full response."""
+
+    def get_validators(self, request):
+        parts, last_modified, keys = self.get_object_validators(request)
+        parts = [f'{scope}:{get_version(scope)}' for scope in self.cache_scopes] + list(parts)
+        # Same path with different query params (page, fields, ...) is a different representation
+        parts.append(request.get_full_path())
+        etag = '"%s"' % hashlib.md5('|'.join(map(str, parts)).encode()).hexdigest()
+        return etag, last_modified, [*self.cache_scopes, *keys]
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validators = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+
+        self._validators = self.get_validators(request)
+        etag, last_modified, _ = self._validators
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            self.not_modified(request)
+            raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators is None or response.status_code not in (200, 304):
+            return response
+
+        etag, last_modified, keys = validators
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(
+            response, public=True, max_age=self.cache_max_age, s_maxage=self.cache_shared_max_age
+        )
+        response['Surrogate-Key'] = ' '.join(keys)
+        return response
@@ -1,28 +1,90 @@
-import random
-import string
+from decimal import Decimal
+from django.db.models import F, Q
 from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
-from orders.models import Coupon
-
-def generate_unique_coupon():
-    return "LENSRA-" + ''.join(
-        random.choices(string.ascii_uppercase + string.digits, k=6)
-    )
-
+from lensra.utils.ids import SECRET_LENGTH, create_with_code
+from orders.models import Coupon, CouponRedemption
 
 def generate_coupon_for_email(email):
 
-    coupon_code = generate_unique_coupon()
     expiry_date = timezone.now() + timedelta(days=7)
 
-    Coupon.objects.create(
-        code=coupon_code,
+    # The random tail keeps coupon codes unguessable; retried if the code is taken
+    coupon = create_with_code('coupon', lambda code: Coupon.objects.create(
+        code="LENSRA-" + code,
         discount_type=Coupon.PERCENTAGE,
         value=10,  # 10% discount
         expires_at=expiry_date,
         max_uses=1,
         email=email
+    ), random_length=SECRET_LENGTH)
+
+    return coupon.code
+
+
+# -----------------------------
+# Validation & redemption
+# -----------------------------
+# Shared by ValidateCouponView (preview) and checkout (redeem), so both
+# accept and reject the same codes with the same messages.
+
+class CouponError(Exception):
+    def __init__(self, message, not_found=False):
+        super().__init__(message)
+        self.message = message
+        self.not_found = not_found
+
+
+def usable_coupons(now=None):
+    """Coupon.can_be_used() as a filter, so the check and the increment are one statement."""
+    now = now or timezone.now()
+    return Coupon.objects.filter(
+        Q(is_active=True),
+        Q(expires_at__isnull=True) | Q(expires_at__gte=now),
+        Q(max_uses__isnull=True) | Q(max_uses=0) | Q(used_count__lt=F('max_uses')),
     )
 
-    return coupon_code
\ No newline at end of file
+
+def calculate_discount(coupon, subtotal):
+    if coupon.discount_type == Coupon.PERCENTAGE:
+        discount_amount = (coupon.value / 100) * subtotal
+    else:
+        discount_amount = coupon.value
+    return min(discount_amount, subtotal)  # Discount can't exceed product cost
+
+
+def validate_coupon(code, subtotal=None):
+    """(coupon, discount) for a code against a subtotal, or CouponError saying why not."""
+    try:
+        # Case-insensitive lookup
+        coupon = Coupon.objects.get(code__iexact=code)
+    except Coupon.DoesNotExist:
+        raise CouponError("Invalid coupon code.", not_found=True)
+
+    # 1. Check basic validity (active, expired, usage limits)
+    if not coupon.can_be_used():
+        raise CouponError("This coupon is no longer valid.")
+
+    # 2. Check minimum order amount; a code-only preview (no subtotal) skips it,
+    # checkout always passes the real subtotal
+    if subtotal in (None, ''):
+        return coupon, Decimal('0.00')
+    subtotal = Decimal(str(subtotal))
+    if coupon.min_order_amount and subtotal < coupon.min_order_amount:
+        raise CouponError(f"Minimum order of ₦{coupon.min_order_amount:,.2f} required for this code.")
+
+    return coupon, calculate_discount(coupon, subtotal)
+
+
+def redeem_coupon(coupon, order, user=None):
+    """
+    Count one use of `coupon` for `order`. The usage check and the increment
+    are a single conditional UPDATE, so concurrent checkouts can never take
+    the count past max_uses. Call it inside the order transaction, as late as
+    possible: the coupon row stays locked until that transaction commits.
+    """
+    claimed = usable_coupons().filter(pk=coupon.pk).update(used_count=F('used_count') + 1)
+    if not claimed:
+        raise CouponError("This coupon is no longer valid.")
+    return CouponRedemption.objects.create(coupon=coupon, user=user, order=order)
@@ -0,0 +1,141 @@
+"""
+Idempotency-Key support for write endpoints.
+
+Mobile clients retry POSTs on flaky networks, and every retry of checkout or
+payment initialization used to run the whole thing again (a second order, a
+second Paystack transaction). A client that sends an `Idempotency-Key` header
+gets exactly one execution per key:
+
+- the first request claims the key in the shared cache (an atomic add) and,
+  once handled, stores its response there for IDEMPOTENCY_TTL;
+- repeats of the same request get the stored response back, marked with an
+  `Idempotent-Replayed: true` header, without touching the view;
+- a repeat that arrives while the first is still running gets 409, and reusing
+  a key for a different request body gets 422.
+
+Keys are scoped to the endpoint and the caller: the user, or for guests the
+`session_id` (body, query string or X-Session-ID header) that owns their cart
+and orders. A guest request with the header but no session_id gets 400, since
+its key would otherwise be shared with every other guest. Only
+responses below 500 are stored; a request that ends in an exception
+(validation error, server error) releases its key so it can be retried.
+Requests without the header behave as before.
+
+Use the `idempotent` decorator on APIView handler methods, or
+IdempotencyMixin on generic views (it wraps `post`).
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_TTL = 60 * 60 * 24
+# How long a claimed key blocks repeats if its request dies without finishing
+IN_FLIGHT_TTL = 60
+MAX_KEY_LENGTH = 255
+
+IN_FLIGHT = 'in-flight'
+DONE = 'done'
+
+
+def _owner(request):
+    """Who a key belongs to: the user, the guest's session_id, or None for an unidentified guest."""
+    if request.user and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    data = request.data if hasattr(request.data, 'get') else {}
+    session_id = (
+        data.get('session_id')
+        or request.query_params.get('session_id')
+        or request.headers.get('X-Session-ID')
+    )
+    return f'session:{session_id}' if session_id else None
+
+
+def _cache_key(owner, request, key):
+    scope = f'{owner}|{request.method}|{request.path}|{key}'
+    return 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(entry):
+    response = Response(entry['data'], status=entry['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def run_idempotent(request, handler):
+    """Call `handler()` at most once per Idempotency-Key and replay its response to repeats."""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response(
+            {"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    owner = _owner(request)
+    if owner is None:
+        return Response(
+            {"error": f"{IDEMPOTENCY_HEADER} needs a signed-in user or a session_id."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    cache_key = _cache_key(owner, request, key)
+    fingerprint = _fingerprint(request)
+    if not cache.add(cache_key, {'state': IN_FLIGHT, 'fingerprint': fingerprint}, IN_FLIGHT_TTL):
+        entry = cache.get(cache_key)
+        if entry is None:
+            # Expired between add() and get(); treat it as still running, the client retries
+            entry = {'state': IN_FLIGHT, 'fingerprint': fingerprint}
+        if entry['fingerprint'] != fingerprint:
+            return Response(
+                {"error": f"This {IDEMPOTENCY_HEADER} was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if entry['state'] == IN_FLIGHT:
+            return Response(
+                {"error": "A request with this Idempotency-Key is still being processed."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return _replay(entry)
+
+    try:
+        response = handler()
+    except Exception:
+        cache.delete(cache_key)
+        raise
+
+    if response.status_code >= 500 or not hasattr(response, 'data'):
+        cache.delete(cache_key)
+    else:
+        cache.set(cache_key, {
+            'state': DONE,
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'data': response.data,
+        }, IDEMPOTENCY_TTL)
+    return response
+
+
+def idempotent(handler):
+    """Decorator for APIView handler methods (post, put, ...)."""
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        return run_idempotent(request, lambda: handler(self, request, *args, **kwargs))
+    return wrapper
+
+
+class IdempotencyMixin:
+    """Makes a generic view's POST honour Idempotency-Key."""
+
+    def post(self, request, *args, **kwargs):
+        return run_idempotent(request, lambda: super(IdempotencyMixin, self).post(request, *args, **kwargs))
@@ -0,0 +1,108 @@
+"""
+Short, time-ordered codes for orders, gifts, invites and coupons.
+
+Codes used to be random strings checked with `filter(code=...).exists()` until
+one was free (or, for orders, not checked at all), which costs a query per
+attempt and collides more as tables grow. A code is now built from:
+
+    minutes since ID_EPOCH   5 chars
+    per-minute sequence      5 chars, from a Redis INCR per namespace
+    optional random tail     for codes that must not be guessable
+
+in Crockford base32 (digits and upper-case letters without I, L, O, U), so
+codes are unambiguous to read out, always the same width, sort by minute (and
+within a minute in issue order while the counter is up), and land at the right
+edge of their btree index.
+
+The time and sequence parts are predictable: anyone who knows roughly when a
+code was issued can enumerate them. Codes that are shared publicly and act as
+a credential (gift links, coupons) therefore carry SECRET_LENGTH random chars
+(35 bits), at least as much as the 6-char random codes they replaced.
+
+The counter is only a cheap way to avoid collisions, not a guarantee: the
+cache can be unreachable (tests, local dev, a blip), flushed or evicted
+mid-minute, and a namespace could in theory outrun 32**5 codes a minute. In
+those cases the sequence part is random (25 bits) instead. The unique
+constraint on each code column is what guarantees uniqueness, so rows are
+inserted through create_with_code(), which retries a colliding insert with a
+random sequence part.
+"""
+import secrets
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ID_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+TIME_WIDTH = 5       # 32**5 minutes is about 63 years
+SEQUENCE_WIDTH = 5   # 32**5 codes per namespace per minute before falling back to random
+SEQUENCE_KEY = 'ids:{}:{}'
+SECRET_LENGTH = 7    # random tail for unguessable codes: 32**7, about 35 bits
+CODE_ATTEMPTS = 5
+
+
+def _get_connection():
+    """Raw Redis connection for the default cache, or None if the cache isn't Redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def encode(number, width=0):
+    """Crockford base32, left-padded with zeros to `width`."""
+    chars = []
+    while number:
+        number, digit = divmod(number, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars)).rjust(width, ALPHABET[0])
+
+
+def random_chars(count):
+    return ''.join(secrets.choice(ALPHABET) for _ in range(count))
+
+
+def _next_sequence(namespace, minute):
+    """This minute's next sequence number for `namespace`, or None if there isn't a usable one."""
+    conn = _get_connection()
+    if conn is None:
+        return None
+
+    from redis.exceptions import RedisError
+    key = SEQUENCE_KEY.format(namespace, minute)
+    try:
+        pipe = conn.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, 120)  # the minute is over long before this
+        sequence, _ = pipe.execute()
+    except RedisError:
+        return None
+    sequence -= 1
+    return sequence if sequence < 32 ** SEQUENCE_WIDTH else None
+
+
+def generate_code(namespace, random_length=0, now=None, use_counter=True):
+    """A new code for `namespace` (e.g. 'order'), with `random_length` unguessable chars appended."""
+    minute = int(((now or timezone.now()) - ID_EPOCH).total_seconds() // 60)
+    sequence = _next_sequence(namespace, minute) if use_counter else None
+    sequence_part = random_chars(SEQUENCE_WIDTH) if sequence is None else encode(sequence, SEQUENCE_WIDTH)
+    return encode(minute, TIME_WIDTH) + sequence_part + random_chars(random_length)
+
+
+def create_with_code(namespace, create, random_length=0, attempts=CODE_ATTEMPTS):
+    """
+    Return create(code) for a new code, retrying with a random sequence part
+    when the insert hits a unique violation. Each attempt runs in a savepoint,
+    so a collision doesn't break the caller's transaction.
+    """
+    for attempt in range(attempts):
+        code = generate_code(namespace, random_length, use_counter=attempt == 0)
+        try:
+            with transaction.atomic():
+                return create(code)
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
@@ -0,0 +1,187 @@
+"""
+Page-number pagination with two cheaper opt-in modes.
+
+PageNumberPagination runs COUNT(*) over the filtered queryset and an OFFSET
+scan that grows with the page number. Infinite-scroll clients need neither:
+
+- `?pagination=cursor` switches to keyset pagination: rows are fetched with
+  WHERE (ordering fields) > (last row seen) over the view's existing ordering
+  plus an id tiebreak, so every page costs the same. Follow the `next` link,
+  which carries an opaque `cursor`. NULLs sort as PostgreSQL places them by
+  default (last ascending, first descending), made explicit so the cursor
+  condition and the ORDER BY agree on every backend.
+- `?count=false` keeps page numbers but skips the COUNT; one extra row is
+  fetched to know whether there is a next page.
+
+Without either parameter responses are unchanged.
+"""
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime, time
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    # isoformat keeps microseconds, which DjangoJSONEncoder would truncate
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)  # Decimal, UUID, ...
+
+
+class KeysetPageNumberPagination(PageNumberPagination):
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def uses_keyset(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or self.cursor_query_param in params
+
+    def skips_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('false', '0')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.mode = 'pages'
+        if self.uses_keyset(request):
+            ordering = self.get_keyset_ordering(queryset)
+            if ordering is not None:
+                self.mode = 'cursor'
+                return self.paginate_keyset(queryset, request, ordering)
+        if self.uses_keyset(request) or self.skips_count(request):
+            self.mode = 'no-count'
+            return self.paginate_without_count(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.mode == 'pages':
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.next_link),
+            ('previous', self.previous_link),
+            ('results', data),
+        ]))
+
+    # Keyset mode
+
+    def get_keyset_ordering(self, queryset):
+        """
+        The queryset's ordering as plain field names with a pk tiebreak, or
+        None if it orders by expressions we can't build a cursor for.
+        """
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not all(isinstance(field, str) and field != '?' and '__' not in field for field in ordering):
+            return None
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering.append('-pk' if ordering and ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    def _output_field(self, queryset, name):
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        if name == 'pk':
+            return queryset.model._meta.pk
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, queryset, ordering, token):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            return [
+                None if value is None else self._output_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, ordering):
+        values = [_encode_value(getattr(obj, field.lstrip('-'))) for field in ordering]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    @staticmethod
+    def _order_by(ordering):
+        return [
+            F(field[1:]).desc(nulls_first=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+            for field in ordering
+        ]
+
+    @staticmethod
+    def _beyond(field, value):
+        """Rows whose `field` sorts strictly after `value`, or None if none can."""
+        name = field.lstrip('-')
+        if field.startswith('-'):
+            # Descending, NULLs first: after a NULL comes every non-NULL
+            return Q(**{f'{name}__isnull': False}) if value is None else Q(**{f'{name}__lt': value})
+        # Ascending, NULLs last: nothing sorts after a NULL
+        return None if value is None else Q(**{f'{name}__gt': value}) | Q(**{f'{name}__isnull': True})
+
+    @staticmethod
+    def _equal(field, value):
+        name = field.lstrip('-')
+        return Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+
+    def _after(self, ordering, values):
+        """Rows strictly after `values` in `ordering`: (a > x) OR (a = x AND b > y) OR ..."""
+        condition = Q()
+        for i, field in enumerate(ordering):
+            step = self._beyond(field, values[i])
+            if step is None:
+                continue
+            for previous, value in zip(ordering[:i], values):
+                step &= self._equal(previous, value)
+            condition |= step
+        return condition
+
+    def paginate_keyset(self, queryset, request, ordering):
+        page_size = self.get_page_size(request)
+        token = request.query_params.get(self.cursor_query_param)
+
+        queryset = queryset.order_by(*self._order_by(ordering))
+        if token:
+            queryset = queryset.filter(self._after(ordering, self.decode_cursor(queryset, ordering, token)))
+
+        rows = list(queryset[:page_size + 1])
+        page = rows[:page_size]
+
+        url = remove_query_param(request.build_absolute_uri(), 'page')
+        self.previous_link = None
+        self.next_link = None
+        if len(rows) > page_size:
+            url = replace_query_param(url, self.mode_query_param, 'cursor')
+            self.next_link = replace_query_param(url, self.cursor_query_param, self.encode_cursor(page[-1], ordering))
+        return page
+
+    # No-count mode
+
+    def paginate_without_count(self, queryset, request):
+        page_size = self.get_page_size(request)
+        try:
+            number = int(request.query_params.get(self.page_query_param, 1))
+            if number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+
+        offset = (number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        page = rows[:page_size]
+
+        url = request.build_absolute_uri()
+        self.next_link = replace_query_param(url, self.page_query_param, number + 1) if len(rows) > page_size else None
+        if number == 1:
+            self.previous_link = None
+        elif number == 2:
+            self.previous_link = remove_query_param(url, self.page_query_param)
+        else:
+            self.previous_link = replace_query_param(url, self.page_query_param, number - 1)
+        return page
@@ -0,0 +1,79 @@
+"""
+Sparse fieldsets for nested serializers.
+
+Serializers using DynamicFieldsMixin read two query parameters, addressed by
+dotted path from the response root (list levels are skipped):
+
+    ?fields=id,name,variants.id         render only these fields
+    ?expand=variants                    add fields left out by default
+
+A serializer can be given a default subset with the `fields=` kwarg;
+`?expand=` adds to it and `?fields=` replaces it. Nested product payloads
+(cart items, wishlist) render in full unless the client trims them.
+
+Meta.prefetch_map lists the prefetch_related lookups each field needs, so
+views can prefetch only what will actually be rendered (get_prefetch_lookups).
+"""
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+def _under(paths, prefix):
+    """Paths below `prefix`, with the prefix removed ('' selects everything)."""
+    if not prefix:
+        return paths
+    start = prefix + '.'
+    return [path[len(start):] for path in paths if path.startswith(start)]
+
+
+class DynamicFieldsMixin:
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.default_fields = fields
+        self.default_expand = expand
+        super().__init__(*args, **kwargs)
+
+    def get_field_path(self):
+        """Dotted path of this serializer from the root of the response."""
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_field_selection(self):
+        """(only, expand): top-level field names requested for this serializer."""
+        request = self.context.get('request')
+        params = getattr(request, 'query_params', {})
+        path = self.get_field_path()
+
+        only = _under(_split(params.get(self.fields_query_param)), path)
+        expand = _under(_split(params.get(self.expand_query_param)), path)
+        if not only and self.default_fields is not None:
+            only = list(self.default_fields)
+            expand = [*expand, *(self.default_expand or ())]
+
+        top = lambda paths: {p.split('.', 1)[0] for p in paths}
+        return (top(only) or None), top(expand)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self.get_field_selection()
+        if only is None:
+            return fields
+        keep = only | expand
+        return {name: field for name, field in fields.items() if name in keep}
+
+    def get_prefetch_lookups(self, prefix=''):
+        """prefetch_related lookups needed by the fields this serializer will render."""
+        prefetch_map = getattr(self.Meta, 'prefetch_map', {})
+        lookups = []
+        for name in self.fields:
+            lookups.extend(prefix + lookup for lookup in prefetch_map.get(name, ()))
+        return list(dict.fromkeys(lookups))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CartItem, Order, OrderItem, Coupon, CouponRedemption, ShippingZone, ShippingLocation, ShippingOption
+from .models import CartItem, Order, OrderItem, Coupon, CouponRedemption, ShippingZone, ShippingLocation, ShippingOption, StockReservation
 
 # 1. ORDER ITEMS INLINE
 class OrderItemInline(admin.TabularInline):
@@ -128,6 +128,13 @@ class CouponRedemptionAdmin(admin.ModelAdmin):
     list_display = ('coupon', 'user', 'order', 'redeemed_at')
     list_filter = ('redeemed_at',)
 
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    # Stock moves with status changes (orders/inventory.py), so no hand edits
+    list_display = ('variant', 'order', 'quantity', 'status', 'expires_at', 'created_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('variant', 'order', 'quantity', 'status', 'expires_at', 'created_at', 'updated_at')
+
 @admin.register(ShippingZone)
 class ShippingZoneAdmin(admin.ModelAdmin):
     list_display = ('name', 'base_fee')
@@ -0,0 +1,258 @@
+"""
+Cart storage.
+
+Most guest carts are abandoned, yet every add/update/remove used to be a
+CartItem write. Guest carts now live in a Redis hash per session (the
+django-redis connection behind CACHES) with a sliding TTL, and only become
+rows when they turn into something durable:
+
+- at login, MergeCartView moves the lines onto the user's CartItem rows;
+- at checkout, OrderCreateSerializer turns them straight into OrderItems.
+
+Authenticated carts stay in CartItem. Both stores hand out CartItem instances
+(unsaved for guests, with pk set to the line id), so CartItemSerializer and
+checkout don't care where a line came from. When the cache isn't Redis
+(tests, local dev) guest carts fall back to CartItem rows as before.
+
+Hash layout, key "cart:guest:<session_id>":
+
+    "_next" -> last line id handed out (HINCRBY); its presence also marks
+               the cart as checked for pre-Redis CartItem rows
+    "<id>"  -> JSON {"product", "variant", "placement", "quantity", "secret_message", "emotion"}
+"""
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from products.models import DesignPlacement, Product, ProductVariant
+from .cart_totals import aggregate_totals, invalidate_cart_totals
+from .models import CartItem
+
+GUEST_CART_KEY = 'cart:guest:{}'
+GUEST_CART_TTL = timedelta(days=30)
+NEXT_ID_FIELD = '_next'
+
+LINE_FIELDS = ('product', 'variant', 'placement', 'quantity', 'secret_message', 'emotion')
+CART_RELATIONS = ('product', 'variant', 'placement__product', 'placement__design')
+
+
+def _get_connection():
+    """Raw Redis connection for the default cache, or None if the cache isn't Redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def get_cart_store(user=None, session_id=None):
+    """The store holding this visitor's cart."""
+    if user is not None:
+        return DatabaseCartStore(user=user)
+    conn = _get_connection() if session_id else None
+    if conn is None:
+        return DatabaseCartStore(session_id=session_id)
+    return RedisCartStore(conn, session_id)
+
+
+class DatabaseCartStore:
+    """CartItem rows owned by a user, or by a guest session when Redis isn't available."""
+
+    def __init__(self, user=None, session_id=None):
+        self.user = user
+        self.session_id = session_id
+
+    @property
+    def owner(self):
+        return f'user:{self.user.pk}' if self.user is not None else f'session:{self.session_id}'
+
+    def queryset(self):
+        if self.user is not None:
+            return CartItem.objects.filter(user=self.user)
+        if self.session_id:
+            return CartItem.objects.filter(session_id=self.session_id, user__isnull=True)
+        return CartItem.objects.none()
+
+    def lines(self, prefetch=()):
+        return self.queryset().select_related(*CART_RELATIONS).prefetch_related(*prefetch)
+
+    def get(self, line_id, prefetch=()):
+        return self.lines(prefetch).filter(pk=line_id).first()
+
+    def add(self, **fields):
+        invalidate_cart_totals(self.owner)
+        return CartItem.objects.create(user=self.user, session_id=None if self.user else self.session_id, **fields)
+
+    def update(self, item, **fields):
+        for name, value in fields.items():
+            setattr(item, name, value)
+        item.save()
+        invalidate_cart_totals(self.owner)
+        return item
+
+    def remove(self, item):
+        item.delete()
+        invalidate_cart_totals(self.owner)
+
+    def discard(self, items):
+        """Drop lines that were checked out; call inside the order transaction."""
+        CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
+        invalidate_cart_totals(self.owner)
+
+    def merge_into(self, user):
+        """Hand a guest cart to `user` at login. Returns the number of lines moved."""
+        invalidate_cart_totals(self.owner, DatabaseCartStore(user=user).owner)
+        return self.queryset().update(user=user, session_id=None)
+
+    def totals(self):
+        return aggregate_totals(self.queryset())
+
+
+class RedisCartStore:
+    """A guest cart held in one Redis hash."""
+
+    def __init__(self, conn, session_id):
+        self.conn = conn
+        self.session_id = session_id
+        self.key = GUEST_CART_KEY.format(session_id)
+
+    @property
+    def owner(self):
+        return f'session:{self.session_id}'
+
+    # Raw lines
+
+    def _touch(self, pipe):
+        pipe.expire(self.key, int(GUEST_CART_TTL.total_seconds()))
+
+    def _read(self):
+        """{line_id: data} for the whole cart."""
+        if not self.session_id:
+            return {}
+        raw = self.conn.hgetall(self.key)
+        if not raw:
+            # Only a brand-new (or merged away) cart; afterwards "_next" marks it adopted
+            return self._adopt_rows()
+        return {
+            int(line_id): json.loads(data)
+            for line_id, data in raw.items()
+            if line_id.decode() != NEXT_ID_FIELD
+        }
+
+    def _adopt_rows(self):
+        """
+        Move CartItem rows saved for this session before carts moved to Redis.
+        Writes "_next" even when there are none, so the probe runs once per cart.
+        """
+        rows = list(CartItem.objects.filter(session_id=self.session_id, user__isnull=True))
+        lines = {row.pk: self._dump(row) for row in rows}
+        pipe = self.conn.pipeline()
+        pipe.hset(self.key, mapping={**{line_id: json.dumps(data) for line_id, data in lines.items()},
+                                      NEXT_ID_FIELD: max(lines, default=0)})
+        self._touch(pipe)
+        pipe.execute()
+        if lines:
+            CartItem.objects.filter(pk__in=lines.keys()).delete()
+        return lines
+
+    @staticmethod
+    def _dump(item):
+        return {
+            'product': item.product_id,
+            'variant': item.variant_id,
+            'placement': item.placement_id,
+            'quantity': item.quantity,
+            'secret_message': item.secret_message,
+            'emotion': item.emotion,
+        }
+
+    def _write(self, line_id, item):
+        pipe = self.conn.pipeline()
+        pipe.hset(self.key, line_id, json.dumps(self._dump(item)))
+        self._touch(pipe)
+        pipe.execute()
+        invalidate_cart_totals(self.owner)
+
+    # Hydration
+
+    def _hydrate(self, lines, prefetch=()):
+        """CartItem instances for raw lines, related rows loaded in one query per table."""
+        def ids(field):
+            return {data[field] for data in lines.values() if data.get(field)}
+
+        products = Product.objects.in_bulk(ids('product'))
+        variants = ProductVariant.objects.in_bulk(ids('variant'))
+        placements = DesignPlacement.objects.select_related('product', 'design').in_bulk(ids('placement'))
+
+        items = []
+        for line_id, data in sorted(lines.items()):
+            product = products.get(data['product'])
+            if product is None:
+                continue  # product deleted; CartItem rows would have cascaded too
+            items.append(CartItem(
+                pk=line_id,
+                session_id=self.session_id,
+                product=product,
+                variant=variants.get(data.get('variant')),
+                placement=placements.get(data.get('placement')),
+                quantity=data['quantity'],
+                secret_message=data.get('secret_message'),
+                emotion=data.get('emotion'),
+            ))
+        if prefetch:
+            prefetch_related_objects(items, *prefetch)
+        return items
+
+    # Store interface
+
+    def lines(self, prefetch=()):
+        return self._hydrate(self._read(), prefetch)
+
+    def get(self, line_id, prefetch=()):
+        raw = self.conn.hget(self.key, line_id) if self.session_id else None
+        if raw is None:
+            return None
+        items = self._hydrate({line_id: json.loads(raw)}, prefetch)
+        return items[0] if items else None
+
+    def add(self, **fields):
+        item = CartItem(session_id=self.session_id, **{name: fields[name] for name in LINE_FIELDS if name in fields})
+        item.pk = self.conn.hincrby(self.key, NEXT_ID_FIELD, 1)
+        self._write(item.pk, item)
+        return item
+
+    def update(self, item, **fields):
+        for name in LINE_FIELDS:
+            if name in fields:
+                setattr(item, name, fields[name])
+        self._write(item.pk, item)
+        return item
+
+    def remove(self, item):
+        self.conn.hdel(self.key, item.pk)
+        invalidate_cart_totals(self.owner)
+
+    def discard(self, items):
+        """Drop lines that were checked out, once the order is committed."""
+        line_ids = [item.pk for item in items]
+        if line_ids:
+            transaction.on_commit(lambda: self.conn.hdel(self.key, *line_ids))
+            invalidate_cart_totals(self.owner)
+
+    def merge_into(self, user):
+        """Write the guest lines as the user's CartItem rows at login. Returns the number moved."""
+        items = self.lines()
+        for item in items:
+            item.pk = None
+            item.user, item.session_id = user, None
+        CartItem.objects.bulk_create(items)
+        self.conn.delete(self.key)
+        invalidate_cart_totals(self.owner, DatabaseCartStore(user=user).owner)
+        return len(items)
+
+    def totals(self):
+        # Same pricing rule as cart_totals.UNIT_PRICE, applied to the hydrated lines
+        items = self.lines()
+        return sum(item.quantity for item in items), sum(item.total_price for item in items)
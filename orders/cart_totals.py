@@ -0,0 +1,55 @@
+"""
+Cart totals for the header badge.
+
+A line costs its variant's price_override if it has one, else the product's
+effective_price (the sale price while a sale is live, see products/sales.py)
+- the same rule CartItem.unit_price and checkout use. For CartItem rows that
+is one aggregate over a Coalesce expression.
+
+The badge is fetched on every page load, so summaries are cached per cart
+owner. Cart stores drop the entry whenever they change a cart, and the key
+carries the catalog version, so price changes and sale flips invalidate it
+too.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+
+from lensra.utils.conditional import get_version
+
+CART_TOTALS_KEY = 'cart:totals:{}'
+CART_TOTALS_TTL = 60 * 5
+
+UNIT_PRICE = Coalesce(
+    'variant__price_override', 'product__effective_price', 'product__base_price',
+    output_field=DecimalField(max_digits=10, decimal_places=2),
+)
+
+
+def aggregate_totals(queryset):
+    """(total quantity, total price) of CartItem rows in one query."""
+    totals = queryset.aggregate(total_qty=Sum('quantity'), total_amt=Sum(F('quantity') * UNIT_PRICE))
+    return totals['total_qty'] or 0, totals['total_amt'] or 0
+
+
+def _key(owner):
+    return CART_TOTALS_KEY.format(owner)
+
+
+def get_cart_summary(store):
+    """{'total_quantity', 'total_price'} for a cart store, from cache when possible."""
+    entry = cache.get(_key(store.owner))
+    version = get_version('catalog')
+    if entry is not None and entry['version'] == version:
+        return entry['summary']
+
+    total_qty, total_amt = store.totals()
+    summary = {'total_quantity': total_qty, 'total_price': total_amt}
+    cache.set(_key(store.owner), {'version': version, 'summary': summary}, CART_TOTALS_TTL)
+    return summary
+
+
+def invalidate_cart_totals(*owners):
+    """Forget cached summaries once the current transaction commits."""
+    transaction.on_commit(lambda: cache.delete_many([_key(owner) for owner in owners]))
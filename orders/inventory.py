@@ -0,0 +1,155 @@
+"""
+Stock reservations for ProductVariant inventory.
+
+Checkout places a time-limited hold on each variant it sells. A hold takes the
+stock straight away with a conditional UPDATE:
+
+    UPDATE products_productvariant
+       SET stock_quantity = stock_quantity - n
+     WHERE id = v AND stock_quantity >= n
+
+which either succeeds or matches nothing, without a SELECT ... FOR UPDATE
+held across the request. Only variants with track_stock set are held;
+untracked ones (the default, as stock_quantity wasn't kept up to date before
+reservations) sell without limit. Each hold runs in its own short transaction,
+outside the order transaction, so concurrent checkouts of a hot variant only
+queue on its row for the length of one statement. PostgreSQL re-checks the
+WHERE clause after waiting on the row, so stock can never go negative.
+
+- reserve_stock() takes every hold a cart needs, or none (it gives back what
+  it already took when one line is short).
+- commit_reservations() makes an order's holds permanent once it is paid.
+- release_reservations() / release_expired_reservations() give stock back,
+  the latter in batches with SKIP LOCKED so parallel sweeps never block.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from products.models import ProductVariant
+from .models import StockReservation
+
+logger = logging.getLogger(__name__)
+
+# How long checkout holds stock for an unpaid order
+RESERVATION_TTL = timedelta(minutes=15)
+RELEASE_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    def __init__(self, variant_ids):
+        self.variant_ids = variant_ids
+        super().__init__(f"Insufficient stock for variants {variant_ids}")
+
+
+def _take(variant_id, quantity):
+    return ProductVariant.objects.filter(
+        pk=variant_id, stock_quantity__gte=quantity
+    ).update(stock_quantity=F('stock_quantity') - quantity) == 1
+
+
+def _give_back(quantities):
+    # Sorted so concurrent releases lock variant rows in the same order
+    for variant_id, quantity in sorted(quantities.items()):
+        ProductVariant.objects.filter(pk=variant_id).update(stock_quantity=F('stock_quantity') + quantity)
+
+
+def reserve_stock(lines, ttl=RESERVATION_TTL):
+    """
+    Hold stock for (variant_id, quantity) lines on tracked variants. Returns
+    the StockReservations, or raises InsufficientStock after giving back
+    anything already held. Must not be called inside the order transaction.
+    """
+    wanted = Counter()
+    for variant_id, quantity in lines:
+        if variant_id is not None:
+            wanted[variant_id] += quantity
+    tracked = set(ProductVariant.objects.filter(pk__in=wanted, track_stock=True).values_list('pk', flat=True))
+
+    expires_at = timezone.now() + ttl
+    reservations = []
+    for variant_id, quantity in sorted(wanted.items()):
+        if variant_id not in tracked:
+            continue
+        with transaction.atomic():
+            if not _take(variant_id, quantity):
+                short = variant_id
+                break
+            reservations.append(StockReservation.objects.create(
+                variant_id=variant_id, quantity=quantity, expires_at=expires_at
+            ))
+    else:
+        return reservations
+
+    release_reservations(reservations)
+    raise InsufficientStock([short])
+
+
+def _release(queryset):
+    """Give back stock for the held reservations in `queryset` (locked by the caller's query)."""
+    with transaction.atomic():
+        held = list(queryset.filter(status=StockReservation.HELD).values_list('pk', 'variant_id', 'quantity'))
+        if not held:
+            return 0
+        quantities = Counter()
+        for _, variant_id, quantity in held:
+            quantities[variant_id] += quantity
+        _give_back(quantities)
+        StockReservation.objects.filter(pk__in=[pk for pk, _, _ in held]).update(
+            status=StockReservation.RELEASED, updated_at=timezone.now()
+        )
+        return len(held)
+
+
+def release_reservations(reservations):
+    """Give back stock for these holds (a failed checkout, a cancelled order)."""
+    return _release(
+        StockReservation.objects.select_for_update().filter(pk__in=[r.pk for r in reservations]).order_by('pk')
+    )
+
+
+def release_order_reservations(order):
+    return _release(StockReservation.objects.select_for_update().filter(order=order).order_by('pk'))
+
+
+def release_expired_reservations(now=None, batch_size=RELEASE_BATCH_SIZE):
+    """Release held reservations past their expiry, batch by batch. Returns how many."""
+    now = now or timezone.now()
+    released = 0
+    while True:
+        batch = StockReservation.objects.select_for_update(skip_locked=True).filter(
+            pk__in=StockReservation.objects.filter(
+                status=StockReservation.HELD, expires_at__lte=now
+            ).order_by('expires_at').values('pk')[:batch_size]
+        )
+        count = _release(batch)
+        released += count
+        if count < batch_size:
+            return released
+
+
+def commit_reservations(order):
+    """
+    Make an order's holds permanent once it is paid. Holds that expired before
+    payment arrived are taken again if the stock is still there.
+    """
+    with transaction.atomic():
+        StockReservation.objects.filter(order=order, status=StockReservation.HELD).update(
+            status=StockReservation.COMMITTED, updated_at=timezone.now()
+        )
+        lapsed = StockReservation.objects.select_for_update().filter(
+            order=order, status=StockReservation.RELEASED
+        ).order_by('pk')
+        for reservation in lapsed:
+            if not _take(reservation.variant_id, reservation.quantity):
+                logger.warning(
+                    "Order %s paid after its hold on variant %s lapsed and the stock is gone",
+                    order.order_number, reservation.variant_id,
+                )
+            # Committed either way so the shortfall isn't retried on every save
+            reservation.status = StockReservation.COMMITTED
+            reservation.save(update_fields=['status', 'updated_at'])
@@ -87,13 +87,18 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
 
     @property
-    def total_price(self):
+    def unit_price(self):
         # 1. Use variant price override if it exists
-        # 2. Else use product base price
-        price = self.product.base_price
-        if self.variant and self.variant.price_override:
-            price = self.variant.price_override
-        return price * self.quantity
+        # 2. Else use product price, sale-aware (see cart_totals.UNIT_PRICE)
+        if self.variant and self.variant.price_override is not None:
+            return self.variant.price_override
+        if self.product.effective_price is not None:
+            return self.product.effective_price
+        return self.product.base_price
+
+    @property
+    def total_price(self):
+        return self.unit_price * self.quantity
 
     def __str__(self):
         owner = self.user.email if self.user else f"Guest ({self.session_id[:8]})"
@@ -320,4 +325,35 @@ class OrderItem(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.product.name} x {self.quantity} (Order: {self.order.order_number})"
\ No newline at end of file
+        return f"{self.product.name} x {self.quantity} (Order: {self.order.order_number})"
+
+class StockReservation(models.Model):
+    """A time-limited hold on variant stock taken at checkout (see orders/inventory.py)."""
+    HELD = 'held'
+    COMMITTED = 'committed'
+    RELEASED = 'released'
+
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (RELEASED, 'Released'),
+    ]
+
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='reservations')
+    # Attached once the order row exists; holds are taken before it is created
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, null=True, blank=True, related_name='reservations')
+    quantity = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Lets the sweeper find expired holds without scanning settled ones
+            models.Index(fields=['expires_at'], name='reservation_held_expiry_idx', condition=models.Q(status='held')),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x variant {self.variant_id} ({self.status})"
@@ -0,0 +1,115 @@
+"""
+Checkout pricing, shared by the quote endpoint and OrderCreateSerializer.
+
+price_cart() turns cart lines plus a shipping choice and an optional coupon
+into the order's financial fields, so a quote and the order placed from it
+can't disagree:
+
+    subtotal_amount      sum of CartItem.total_price (variant/sale aware)
+    shipping_base_cost   the location's ShippingZone.base_fee
+    shipping_option_cost ShippingOption.additional_cost
+    total_amount         subtotal + shipping
+    discount_amount      validate_coupon() on the subtotal
+    payable_amount       total - discount
+
+Shipping locations, zones and options are a few dozen rows read on every
+quote and checkout, so each process keeps them in memory (get_shipping_rates)
+and reloads them when the "shipping" version changes; the shipping model
+signals bump it on every save and delete. Writes that skip the signals
+(queryset.update(), admin bulk actions, raw SQL) don't bump it, so the table
+is also reloaded once it is RATES_TTL old.
+"""
+import threading
+import time
+from decimal import Decimal
+
+from lensra.utils.conditional import get_version
+from lensra.utils.coupons import validate_coupon
+from .models import ShippingLocation, ShippingOption
+
+# Longest a process prices from rows changed without a version bump
+RATES_TTL = 60
+
+
+class ShippingRates:
+    """Every ShippingLocation (with its zone) and ShippingOption, by id."""
+
+    def __init__(self, version):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.locations = {
+            location.pk: location for location in ShippingLocation.objects.select_related('zone')
+        }
+        self.options = {option.pk: option for option in ShippingOption.objects.all()}
+
+    def is_current(self, version):
+        return self.version == version and time.monotonic() - self.loaded_at < RATES_TTL
+
+    def location(self, location_id):
+        try:
+            return self.locations[int(location_id)]
+        except (KeyError, TypeError, ValueError):
+            raise ShippingLocation.DoesNotExist
+
+    def option(self, option_id):
+        try:
+            return self.options[int(option_id)]
+        except (KeyError, TypeError, ValueError):
+            raise ShippingOption.DoesNotExist
+
+
+_rates = None
+_rates_lock = threading.Lock()
+
+
+def get_shipping_rates(reload=False):
+    """This process's rate table, reloaded if shipping data changed since it was built or it is RATES_TTL old."""
+    global _rates
+    version = get_version('shipping')
+    rates = _rates
+    if not reload and rates is not None and rates.is_current(version):
+        return rates
+    with _rates_lock:
+        if reload or _rates is None or not _rates.is_current(version):
+            _rates = ShippingRates(version)
+        return _rates
+
+
+def get_shipping_choice(location_id, option_id):
+    """
+    (ShippingLocation, ShippingOption) for checkout. Raises the model's
+    DoesNotExist for an unknown id, after one reload in case the row is newer
+    than the table (the version bump lands on commit).
+    """
+    for reload in (False, True):
+        rates = get_shipping_rates(reload=reload)
+        try:
+            return rates.location(location_id), rates.option(option_id)
+        except (ShippingLocation.DoesNotExist, ShippingOption.DoesNotExist):
+            if reload:
+                raise
+
+
+def price_cart(cart_items, location, option, coupon_code=None):
+    """
+    Order financial fields (see module docstring) for these cart lines.
+    Raises CouponError for a coupon checkout would refuse.
+    """
+    subtotal = sum((item.total_price for item in cart_items), Decimal('0.00'))
+
+    applied_coupon, discount_amount = None, Decimal('0.00')
+    if coupon_code:
+        applied_coupon, discount_amount = validate_coupon(coupon_code, subtotal)
+
+    shipping_base_cost = location.zone.base_fee
+    shipping_option_cost = option.additional_cost
+    total_amount = subtotal + shipping_base_cost + shipping_option_cost
+    return {
+        'subtotal_amount': subtotal,
+        'shipping_base_cost': shipping_base_cost,
+        'shipping_option_cost': shipping_option_cost,
+        'total_amount': total_amount,
+        'applied_coupon': applied_coupon,
+        'discount_amount': discount_amount,
+        'payable_amount': total_amount - discount_amount,
+    }
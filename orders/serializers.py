@@ -1,9 +1,11 @@
-import uuid
 from rest_framework import serializers
-from django.db.models import Sum
+from django.db.models import Prefetch, Sum
 from .models import CartItem, Order, OrderItem, Coupon, CouponRedemption
 from products.models import Product, DesignPlacement, ProductVariant
-from products.serializers import ProductSerializer, DesignPlacementSerializer, ProductVariantSerializer
+from lensra.utils.images import image_url
+from products.serializers import (
+    ProductSerializer, DesignPlacementSerializer, ProductVariantSerializer
+)
 
 class CartSummarySerializer(serializers.Serializer):
     total_quantity = serializers.IntegerField()
@@ -11,6 +13,7 @@ class CartSummarySerializer(serializers.Serializer):
     wishlist_count = serializers.IntegerField() 
 
 class CartItemSerializer(serializers.ModelSerializer):
+    # Full product by default; ?fields=id,quantity,product_details.name,... trims it (and its prefetches)
     product_details = ProductSerializer(source='product', read_only=True)
     placement_details = DesignPlacementSerializer(source='placement', read_only=True)
     variant_details = ProductVariantSerializer(source='variant', read_only=True)
@@ -33,6 +36,49 @@ class CartItemSerializer(serializers.ModelSerializer):
             'quantity', 'total_price', 'session_id'
         ]
 
+class CartLineSerializer(serializers.ModelSerializer):
+    """
+    Flat, read-only projection of a cart line for the cart drawer: a product
+    snapshot, a variant label, a placement thumbnail and the line total,
+    instead of the nested product/variant/placement serializers.
+    Needs product, variant and placement__design joined and
+    variant__attributes__attribute prefetched (CartLineListView does).
+    """
+    product_id = serializers.IntegerField(read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    product_slug = serializers.CharField(source='product.slug', read_only=True)
+    product_image = serializers.SerializerMethodField()
+    variant_id = serializers.IntegerField(read_only=True)
+    variant_label = serializers.SerializerMethodField()
+    placement_id = serializers.IntegerField(read_only=True)
+    placement_thumbnail = serializers.SerializerMethodField()
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    line_total = serializers.DecimalField(source='total_price', max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = CartItem
+        fields = [
+            'id', 'product_id', 'product_name', 'product_slug', 'product_image',
+            'variant_id', 'variant_label', 'placement_id', 'placement_thumbnail',
+            'secret_message', 'emotion', 'quantity', 'unit_price', 'line_total',
+        ]
+        read_only_fields = fields
+
+    def get_product_image(self, obj):
+        return image_url(obj.product.image, preset='thumbnail')
+
+    def get_variant_label(self, obj):
+        """e.g. 'Color: Red, Size: XL'"""
+        if not obj.variant:
+            return None
+        return ", ".join(f"{a.attribute.name}: {a.value}" for a in obj.variant.attributes.all())
+
+    def get_placement_thumbnail(self, obj):
+        placement = obj.placement
+        if not placement:
+            return None
+        return image_url(placement.preview_mockup or placement.design.preview_image, preset='thumbnail')
+
 # 2. ORDER ITEM SERIALIZER (Includes Reveal Data for the recipient)
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.SerializerMethodField()
@@ -66,12 +112,38 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return None
 
 # 3. ORDER CREATE SERIALIZER (Transfers Cart data to Order)
-import uuid
-from decimal import Decimal
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import serializers
-from .models import Order, OrderItem, CartItem, ShippingLocation, ShippingOption, Coupon, CouponRedemption
+from .models import Order, OrderItem, CartItem, ShippingLocation, ShippingOption, Coupon, CouponRedemption, StockReservation
+from . import inventory
+from .cart_store import get_cart_store
+from lensra.utils.ids import create_with_code
+from lensra.utils.coupons import CouponError, redeem_coupon
+from .pricing import get_shipping_choice, price_cart
+
+
+def validate_shipping_choice(attrs):
+    """(location, option) for the submitted ids, as a field-level ValidationError if unknown."""
+    try:
+        return get_shipping_choice(attrs.get('shipping_location_id'), attrs.get('shipping_option_id'))
+    except ShippingLocation.DoesNotExist:
+        raise serializers.ValidationError({"shipping_location_id": "Invalid shipping location."})
+    except ShippingOption.DoesNotExist:
+        raise serializers.ValidationError({"shipping_option_id": "Invalid shipping option."})
+
+
+def quote_or_error(cart_items, location, option, coupon_code):
+    """
+    price_cart() with a refused coupon raised as a ValidationError on
+    coupon_code, so the quote and checkout both reject the request and say
+    why. (Checkout used to drop an invalid coupon silently and charge full price.)
+    """
+    try:
+        return price_cart(cart_items, location, option, coupon_code)
+    except CouponError as exc:
+        raise serializers.ValidationError({"coupon_code": exc.message})
+
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     id = serializers.ReadOnlyField()
@@ -118,18 +190,10 @@ class OrderCreateSerializer(serializers.ModelSerializer):
             if not user and not attrs.get('guest_email'):
                 raise serializers.ValidationError({"guest_email": "Email is required for guest checkout."})
 
-        # 2. Shipping Validation
-        try:
-            attrs['location_obj'] = ShippingLocation.objects.get(id=attrs.get('shipping_location_id'))
-            attrs['option_obj'] = ShippingOption.objects.get(id=attrs.get('shipping_option_id'))
-        except ShippingLocation.DoesNotExist:
-            raise serializers.ValidationError({"shipping_location_id": "Invalid shipping location."})
-        except ShippingOption.DoesNotExist:
-            raise serializers.ValidationError({"shipping_option_id": "Invalid shipping option."})
-        
+        # 2. Shipping Validation (in-process rate table, no queries)
+        attrs['location_obj'], attrs['option_obj'] = validate_shipping_choice(attrs)
         return attrs
 
-    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         user = request.user if request.user and request.user.is_authenticated else None
@@ -145,83 +209,115 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         validated_data.pop('shipping_location_id')
         validated_data.pop('shipping_option_id')
 
-        # 3. Cart Identification
-        cart_queryset = CartItem.objects.filter(user=user) if user else CartItem.objects.filter(session_id=session_id)
-        if not cart_queryset.exists():
+        # 3. Cart Identification: one fetch, with everything pricing needs joined in
+        cart_store = get_cart_store(user=user, session_id=session_id)
+        cart_items = list(cart_store.lines())
+        if not cart_items:
             raise serializers.ValidationError({"error": "Your bag is empty."})
 
-        # 4. Initialize Order (Placeholders for financials)
-        order = Order.objects.create(
-            user=user,
-            session_id=session_id, 
-            order_number=f"LRG-{uuid.uuid4().hex[:8].upper()}",
-            shipping_location=location,
-            shipping_option=option,
-            shipping_base_cost=location.zone.base_fee,
-            shipping_option_cost=option.additional_cost,
-            subtotal_amount=0,
-            total_amount=0,
-            payable_amount=0,
-            **validated_data
-        )
+        # Hold variant stock before the order transaction; each hold is one short UPDATE
+        try:
+            reservations = inventory.reserve_stock((item.variant_id, item.quantity) for item in cart_items)
+        except inventory.InsufficientStock as exc:
+            raise serializers.ValidationError({
+                "error": "Some items in your bag are out of stock.", "variants": exc.variant_ids
+            })
 
-        # 5. Process Items & Transfer Reveal Data
-        product_subtotal = Decimal('0.00')
-        for item in cart_queryset:
-            price = item.variant.price_override if item.variant and item.variant.price_override else item.product.base_price
-            
-            OrderItem.objects.create(
-                order=order,
+        try:
+            return self._create_order(user, session_id, coupon_code, location, option, cart_store, cart_items, reservations, validated_data)
+        except Exception:
+            inventory.release_reservations(reservations)
+            raise
+
+    def _create_order(self, user, session_id, coupon_code, location, option, cart_store, cart_items, reservations, validated_data):
+        # 4. Price every line in memory (variant override, else product price; sale-aware)
+        order_items = [
+            OrderItem(
                 product=item.product,
                 variant=item.variant,
-                placement=item.placement,
+                placement_id=item.placement_id,
                 quantity=item.quantity,
-                unit_price=price,
-                subtotal=price * item.quantity,
+                unit_price=item.unit_price,
+                subtotal=item.total_price,
                 secret_message=item.secret_message,
-                emotion=item.emotion
+                emotion=item.emotion,
             )
-            product_subtotal += (price * item.quantity)
-
-        # 6. Coupon Logic
-        discount_amount = Decimal('0.00')
-        applied_coupon = None
+            for item in cart_items
+        ]
 
-        if coupon_code:
-            try:
-                coupon = Coupon.objects.get(code__iexact=coupon_code)
-                if coupon.can_be_used():
-                    # Check Minimum Purchase Requirement
-                    if not coupon.min_order_amount or product_subtotal >= coupon.min_order_amount:
-                        if coupon.discount_type == Coupon.PERCENTAGE:
-                            discount_amount = (coupon.value / 100) * product_subtotal
-                        else:
-                            discount_amount = coupon.value
-                        
-                        # Apply and track
-                        discount_amount = min(discount_amount, product_subtotal) # Discount can't exceed product cost
-                        applied_coupon = coupon
-            except Coupon.DoesNotExist:
-                pass # Invalid codes are ignored or could raise an error based on preference
-
-        # 7. Finalize Financials
-        total_shipping = order.shipping_base_cost + order.shipping_option_cost
-        order.subtotal_amount = product_subtotal
-        order.discount_amount = discount_amount
-        order.applied_coupon = applied_coupon
-        order.total_amount = product_subtotal + total_shipping
-        order.payable_amount = order.total_amount - discount_amount
-        order.save()
-
-        # 8. Record Redemption & Cleanup
-        if applied_coupon:
-            CouponRedemption.objects.create(coupon=applied_coupon, user=user, order=order)
-            applied_coupon.used_count += 1
-            applied_coupon.save()
-
-        cart_queryset.delete()
+        # 5-6. Coupon and financials, exactly as the quote endpoint prices them;
+        # the coupon use is only counted at the end
+        totals = quote_or_error(cart_items, location, option, coupon_code)
+        applied_coupon = totals['applied_coupon']
+
+        with transaction.atomic():
+            # Retried with a fresh number in the (rare) case it's already taken
+            order = create_with_code('order', lambda code: Order.objects.create(
+                user=user,
+                session_id=session_id,
+                order_number=f"LRG-{code}",
+                shipping_location=location,
+                shipping_option=option,
+                **totals,
+                **validated_data
+            ))
+
+            # 7. Items & Reveal Data in one insert (OrderItem.save is bypassed; prices are set above)
+            for line in order_items:
+                line.order = order
+            OrderItem.objects.bulk_create(order_items)
+
+            # 8. Cleanup
+            StockReservation.objects.filter(pk__in=[r.pk for r in reservations]).update(order=order)
+            # Only the lines that were ordered; anything added meanwhile stays in the bag
+            cart_store.discard(cart_items)
+
+            # 9. Record Redemption last: the coupon row stays locked until commit
+            if applied_coupon:
+                try:
+                    redeem_coupon(applied_coupon, order, user)
+                except CouponError as exc:
+                    raise serializers.ValidationError({"coupon_code": exc.message})
         return order
 
+class CheckoutQuoteSerializer(serializers.Serializer):
+    """
+    What checkout would charge for the current bag, without writing anything:
+    same cart lines, shipping table and coupon checks as OrderCreateSerializer.
+    """
+    session_id = serializers.CharField(write_only=True, required=False, allow_blank=True)
+    shipping_location_id = serializers.IntegerField(write_only=True)
+    shipping_option_id = serializers.IntegerField(write_only=True)
+    coupon_code = serializers.CharField(required=False, allow_blank=True)
+
+    item_count = serializers.IntegerField(read_only=True)
+    subtotal_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    shipping_base_cost = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    shipping_option_cost = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    total_shipping = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    discount_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    payable_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+
+    def validate(self, attrs):
+        request = self.context.get('request')
+        user = request.user if request.user and request.user.is_authenticated else None
+        location, option = validate_shipping_choice(attrs)
+
+        cart_items = list(get_cart_store(user=user, session_id=attrs.get('session_id')).lines())
+        if not cart_items:
+            raise serializers.ValidationError({"error": "Your bag is empty."})
+
+        totals = quote_or_error(cart_items, location, option, attrs.get('coupon_code'))
+        applied_coupon = totals.pop('applied_coupon')
+        return {
+            **attrs,
+            **totals,
+            'coupon_code': applied_coupon.code if applied_coupon else None,
+            'item_count': sum(item.quantity for item in cart_items),
+            'total_shipping': totals['shipping_base_cost'] + totals['shipping_option_cost'],
+        }
+
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     shipping_method = serializers.ReadOnlyField(source='shipping_option.name')
@@ -245,6 +341,20 @@ class OrderSerializer(serializers.ModelSerializer):
     def get_customer_email(self, obj):
         return obj.user.email if obj.user else obj.guest_email
 
+    @staticmethod
+    def with_details(queryset):
+        """
+        Load everything this serializer reads: the order's foreign keys in the
+        same query, then items, and their variants' attributes, one query each
+        however many orders or items there are.
+        """
+        items = OrderItem.objects.select_related('product', 'variant', 'placement__design').prefetch_related(
+            'variant__attributes'
+        )
+        return queryset.select_related(
+            'user', 'shipping_option', 'shipping_location', 'applied_coupon'
+        ).prefetch_related(Prefetch('items', queryset=items))
+
 
 
 class CouponSerializer(serializers.ModelSerializer):
@@ -4,9 +4,11 @@ from .models import Order
 
 
 # orders/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from orders.models import Order
+from orders import inventory
+from orders.models import Order, ShippingZone, ShippingLocation, ShippingOption
+from lensra.utils.conditional import bump_versions
 from lensra.core.tasks.orders import send_order_confirmation_email, send_order_recieved_email
 
 @receiver(post_save, sender=Order)
@@ -20,6 +22,18 @@ def order_created(sender, instance, created, **kwargs):
 def order_paid(sender, instance, **kwargs):
     """Signal handler for when an order is paid."""
     if instance.is_paid and instance.status == 'processing':
-        # Logic after payment is confirmed
-        # For example: notify warehouse, send confirmation email, etc.
-        pass
+        # Stock held at checkout is now sold
+        inventory.commit_reservations(instance)
+    elif instance.status == 'cancelled' and not instance.is_paid:
+        inventory.release_order_reservations(instance)
+
+
+@receiver(post_save, sender=ShippingZone)
+@receiver(post_delete, sender=ShippingZone)
+@receiver(post_save, sender=ShippingLocation)
+@receiver(post_delete, sender=ShippingLocation)
+@receiver(post_save, sender=ShippingOption)
+@receiver(post_delete, sender=ShippingOption)
+def shipping_changed(sender, instance, **kwargs):
+    # Invalidates ETags of the shipping endpoints (see lensra.utils.conditional)
+    bump_versions('shipping')
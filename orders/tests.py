@@ -85,3 +85,532 @@ class OrderAPITest(TestCase):
         res = self.client.post('/api/orders/', payload, format='json')
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         self.assertIn('order_number', res.data)
+
+
+class StockReservationTest(TestCase):
+    """Test the conditional-update stock holds in orders/inventory.py."""
+
+    def setUp(self):
+        from products.models import ProductVariant
+
+        product = Product.objects.create(name='Mug', slug='mug', base_price=2500.00)
+        self.hot = ProductVariant.objects.create(product=product, stock_quantity=3, track_stock=True)
+        self.other = ProductVariant.objects.create(product=product, stock_quantity=1, track_stock=True)
+        self.untracked = ProductVariant.objects.create(product=product)
+
+    def test_reserve_takes_stock_or_nothing(self):
+        from .inventory import InsufficientStock, reserve_stock
+
+        reservations = reserve_stock([(self.hot.pk, 1), (self.hot.pk, 1), (None, 5)])
+        self.assertEqual([(r.variant_id, r.quantity) for r in reservations], [(self.hot.pk, 2)])
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.stock_quantity, 1)
+
+        # Second line is short, so the hold on the first is given back
+        with self.assertRaises(InsufficientStock):
+            reserve_stock([(self.hot.pk, 1), (self.other.pk, 2)])
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.stock_quantity, 1)
+
+    def test_untracked_variants_are_not_held(self):
+        from .inventory import reserve_stock
+
+        reservations = reserve_stock([(self.untracked.pk, 4), (self.other.pk, 1)])
+        self.assertEqual([r.variant_id for r in reservations], [self.other.pk])
+        self.untracked.refresh_from_db()
+        self.assertEqual(self.untracked.stock_quantity, 0)
+
+    def test_expired_holds_are_released(self):
+        from datetime import timedelta
+        from .inventory import release_expired_reservations, reserve_stock
+        from .models import StockReservation
+
+        reserve_stock([(self.hot.pk, 2)], ttl=timedelta(0))
+        reserve_stock([(self.other.pk, 1)])
+        self.assertEqual(release_expired_reservations(), 1)
+        self.hot.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.hot.stock_quantity, self.other.stock_quantity), (3, 0))
+        self.assertEqual(StockReservation.objects.filter(status=StockReservation.HELD).count(), 1)
+
+
+class CouponValidationTest(TestCase):
+    """Test the coupon checks shared by ValidateCouponView and checkout."""
+
+    def setUp(self):
+        from .models import Coupon
+
+        self.coupon = Coupon.objects.create(
+            code='FLASH10', discount_type=Coupon.PERCENTAGE, value=10, max_uses=2, min_order_amount=1000
+        )
+
+    def test_validate_coupon_view(self):
+        client = APIClient()
+        res = client.post('/api/orders/validate-coupon/', {'code': 'flash10', 'subtotal': '5000'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['discount_amount'], 500.0)
+
+        res = client.post('/api/orders/validate-coupon/', {'code': 'FLASH10', 'subtotal': '500'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        # Code-only preview: the minimum is checked once there is a subtotal
+        res = client.post('/api/orders/validate-coupon/', {'code': 'FLASH10'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['discount_amount'], 0.0)
+        res = client.post('/api/orders/validate-coupon/', {'code': 'NOPE'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_usable_coupons_matches_can_be_used(self):
+        from lensra.utils.coupons import usable_coupons
+
+        self.assertTrue(usable_coupons().filter(pk=self.coupon.pk).exists())
+        self.coupon.used_count = 2
+        self.coupon.save()
+        self.assertFalse(self.coupon.can_be_used())
+        self.assertFalse(usable_coupons().filter(pk=self.coupon.pk).exists())
+
+
+class GuestCartTest(TestCase):
+    """Test guest carts through the cart store (CartItem fallback when the cache isn't Redis)."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(name='Mug', slug='mug', base_price=2500.00)
+
+    def test_guest_lines_merge_into_user_cart(self):
+        res = self.client.post('/api/orders/cart/', {'session_id': 'guest-1', 'product': self.product.pk, 'quantity': 2}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        line_id = res.data['id']
+
+        res = self.client.patch(f'/api/orders/cart/{line_id}/?session_id=guest-1', {'quantity': 3}, format='json')
+        self.assertEqual(res.data['quantity'], 3)
+        self.assertEqual(self.client.get(f'/api/orders/cart/{line_id}/?session_id=guest-2').status_code, status.HTTP_404_NOT_FOUND)
+
+        user = User.objects.create_user(email='guest@example.com', password='testpass123')
+        self.client.force_authenticate(user=user)
+        res = self.client.post('/api/orders/cart/merge/', {'session_id': 'guest-1'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(user.cart_items.values_list('quantity', flat=True)), [3])
+
+
+class StubRedis:
+    """Just the redis-py hash commands RedisCartStore uses; like redis-py, hashes hold bytes."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.ttls = {}
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(self._bytes(field))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        fields = dict(mapping or {})
+        if field is not None:
+            fields[field] = value
+        self.hashes.setdefault(key, {}).update({self._bytes(f): self._bytes(v) for f, v in fields.items()})
+
+    def hincrby(self, key, field, amount=1):
+        value = int(self.hashes.get(key, {}).get(self._bytes(field), 0)) + amount
+        self.hset(key, field, value)
+        return value
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(self._bytes(field), None)
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+    def pipeline(self):
+        return StubPipeline(self)
+
+
+class StubPipeline:
+    def __init__(self, conn):
+        self.conn, self.calls = conn, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.conn, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class RedisCartStoreTest(TestCase):
+    """Test guest carts held in a Redis hash."""
+
+    def setUp(self):
+        from unittest import mock
+        from products.models import ProductVariant
+
+        self.redis = StubRedis()
+        patcher = mock.patch('orders.cart_store._get_connection', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.product = Product.objects.create(name='Mug', slug='mug', base_price=2500.00)
+        self.variant = ProductVariant.objects.create(product=self.product, price_override=2000.00)
+
+    def store(self, session_id='guest-r'):
+        from .cart_store import RedisCartStore, get_cart_store
+
+        store = get_cart_store(session_id=session_id)
+        self.assertIsInstance(store, RedisCartStore)
+        return store
+
+    def test_lines_live_in_redis_and_hydrate(self):
+        from .models import CartItem
+
+        store = self.store()
+        item = store.add(product=self.product, variant=self.variant, quantity=2, emotion='joy')
+        store.add(product=self.product, quantity=1)
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(self.redis.ttls[store.key], 30 * 24 * 60 * 60)
+
+        store.update(store.get(item.pk), quantity=5)
+        with self.assertNumQueries(2):  # products and variants, one query each
+            lines = self.store().lines()
+        self.assertEqual([(line.pk, line.quantity, line.variant_id) for line in lines],
+                         [(item.pk, 5, self.variant.pk), (item.pk + 1, 1, None)])
+        self.assertEqual(lines[0].emotion, 'joy')
+        self.assertEqual(store.totals(), (6, 12500))
+
+        store.remove(lines[1])
+        self.assertEqual([line.pk for line in store.lines()], [item.pk])
+        self.assertIsNone(store.get(item.pk + 1))
+
+    def test_discard_waits_for_commit(self):
+        store = self.store()
+        store.add(product=self.product, quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            store.discard(store.lines())
+            self.assertEqual(len(store.lines()), 1)
+        self.assertEqual(store.lines(), [])
+
+    def test_merge_into_user(self):
+        store = self.store()
+        store.add(product=self.product, variant=self.variant, quantity=2)
+        user = User.objects.create_user(email='guest@example.com', password='testpass123')
+        self.assertEqual(store.merge_into(user), 1)
+        self.assertEqual(list(user.cart_items.values_list('variant', 'quantity')), [(self.variant.pk, 2)])
+        self.assertNotIn(store.key, self.redis.hashes)
+
+    def test_adopts_legacy_rows_once(self):
+        from .models import CartItem
+
+        legacy = CartItem.objects.create(session_id='guest-r', product=self.product, quantity=4)
+        store = self.store()
+        self.assertEqual([(line.pk, line.quantity) for line in store.lines()], [(legacy.pk, 4)])
+        self.assertFalse(CartItem.objects.exists())
+        self.assertEqual(store.add(product=self.product, quantity=1).pk, legacy.pk + 1)
+
+        # An empty cart is probed once, then "_next" marks it adopted
+        empty = self.store('guest-new')
+        self.assertEqual(empty.lines(), [])
+        with self.assertNumQueries(0):
+            self.assertEqual(empty.lines(), [])
+
+
+class CartSummaryTest(TestCase):
+    """Test the cached, variant- and sale-aware cart badge totals."""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from products.models import ProductVariant
+
+        now = timezone.now()
+        self.client = APIClient()
+        self.sale = Product.objects.create(
+            name='Mug', slug='mug', base_price=2500.00, sale_price=2000.00, is_on_sale=True,
+            sale_start=now - timedelta(days=1), sale_end=now + timedelta(days=1),
+        )
+        shirt = Product.objects.create(name='Tee', slug='tee', base_price=5000.00)
+        self.variant = ProductVariant.objects.create(product=shirt, price_override=6000.00)
+
+    def test_summary_prices_lines_and_refreshes_on_change(self):
+        for payload in ({'product': self.sale.pk, 'quantity': 2}, {'product': self.variant.product_id, 'variant': self.variant.pk}):
+            self.client.post('/api/orders/cart/', {'session_id': 'guest-1', **payload}, format='json')
+
+        res = self.client.get('/api/orders/cart/summary/?session_id=guest-1')
+        self.assertEqual((res.data['total_quantity'], res.data['total_price']), (3, 10000))
+
+        line_id = self.client.get('/api/orders/cart/?session_id=guest-1').data['results'][0]['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/orders/cart/{line_id}/?session_id=guest-1')
+        res = self.client.get('/api/orders/cart/summary/', HTTP_X_SESSION_ID='guest-1')
+        self.assertEqual((res.data['total_quantity'], res.data['total_price']), (1, 6000))
+
+
+class CartLinesTest(TestCase):
+    """Test the flat cart-line projection."""
+
+    def test_lines_load_in_constant_queries(self):
+        from products.models import Attribute, AttributeValue, ProductVariant
+
+        client = APIClient()
+        size = Attribute.objects.create(name='Size')
+        for i in range(5):
+            product = Product.objects.create(name=f'Tee {i}', slug=f'tee-{i}', base_price=5000.00)
+            variant = ProductVariant.objects.create(product=product, price_override=4500.00)
+            variant.attributes.add(AttributeValue.objects.create(attribute=size, value=f'S{i}'))
+            client.post('/api/orders/cart/', {'session_id': 'guest-1', 'product': product.pk, 'variant': variant.pk, 'quantity': 2}, format='json')
+
+        with self.assertNumQueries(2):
+            res = client.get('/api/orders/cart/lines/?session_id=guest-1')
+        self.assertEqual(len(res.data), 5)
+        self.assertEqual(res.data[0]['variant_label'], 'Size: S0')
+        self.assertEqual(res.data[0]['line_total'], '9000.00')
+
+
+class OrderNumberTest(TestCase):
+    """Test the time-ordered codes behind order numbers and gift IDs."""
+
+    def test_codes_sort_in_issue_order(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from lensra.utils.ids import SECRET_LENGTH, generate_code
+
+        now = timezone.now()
+        earlier = generate_code('order', now=now - timedelta(minutes=5))
+        later = generate_code('order', now=now)
+        self.assertEqual(len(later), 10)
+        self.assertLess(earlier, later)
+        self.assertEqual(len(generate_code('gift', random_length=SECRET_LENGTH)), 17)
+
+    def test_taken_code_is_retried(self):
+        from unittest import mock
+        from django.utils import timezone
+        from lensra.utils import ids
+        from .models import Coupon
+
+        # A counter that restarts (flushed cache) hands out a code that's already in use
+        now = timezone.now()
+        create = lambda code: Coupon.objects.create(code=code, discount_type=Coupon.FIXED, value=100)
+        with mock.patch.object(ids, '_next_sequence', return_value=0), \
+                mock.patch.object(ids.timezone, 'now', return_value=now):
+            first = ids.create_with_code('order', create)
+            second = ids.create_with_code('order', create)
+
+        self.assertNotEqual(first.code, second.code)
+        self.assertEqual(first.code[:ids.TIME_WIDTH], second.code[:ids.TIME_WIDTH])
+        self.assertEqual(len(second.code), 10)
+
+
+class OrderDetailQueriesTest(TestCase):
+    """Test that order reads don't issue queries per item."""
+
+    def setUp(self):
+        from products.models import Attribute, AttributeValue, ProductVariant
+
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.size = Attribute.objects.create(name='Size')
+        self.variants = []
+        for i in range(6):
+            product = Product.objects.create(name=f'Tee {i}', slug=f'tee-{i}', base_price=5000.00)
+            variant = ProductVariant.objects.create(product=product)
+            variant.attributes.add(AttributeValue.objects.create(attribute=self.size, value=f'S{i}'))
+            self.variants.append(variant)
+
+    def _order(self, number, item_count):
+        # bulk_create skips the post_save hooks (notification tasks) that need a broker
+        order, = Order.objects.bulk_create([Order(
+            user=self.user, order_number=number, total_amount=5000, shipping_address='1 Test St',
+            shipping_city='Lagos', shipping_state='Lagos', phone_number='08012345678',
+        )])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=variant.product, variant=variant, quantity=1, unit_price=5000, subtotal=5000)
+            for variant in self.variants[:item_count]
+        ])
+        return order
+
+    def _count_queries(self, method, url, data=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            res = getattr(client, method)(url, data, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries), res
+
+    def test_query_count_does_not_grow_with_items(self):
+        small_order = self._order('LRG-SMALL', 1)
+        large_order = self._order('LRG-LARGE', 6)
+
+        small, _ = self._count_queries('get', f'/api/orders/orders/{small_order.pk}/')
+        large, res = self._count_queries('get', f'/api/orders/orders/{large_order.pk}/')
+        self.assertEqual(small, large)
+        self.assertEqual(len(res.data['items']), 6)
+        self.assertEqual(res.data['items'][0]['attributes'], f'{self.size.pk}: S0')
+
+        small, _ = self._count_queries('post', '/api/orders/track-order/', {'order_number': 'LRG-SMALL', 'email': 'buyer@example.com'})
+        large, _ = self._count_queries('post', '/api/orders/track-order/', {'order_number': 'LRG-LARGE', 'email': 'buyer@example.com'})
+        self.assertEqual(small, large)
+
+    def test_history_query_count_does_not_grow_with_orders(self):
+        self._order('LRG-FIRST', 2)
+        few, _ = self._count_queries('get', '/api/orders/orders/')
+        for i in range(4):
+            self._order(f'LRG-MORE{i}', 6)
+        many, res = self._count_queries('get', '/api/orders/orders/')
+        self.assertEqual(few, many)
+
+
+class CheckoutQuoteTest(TestCase):
+    """Test the side-effect-free checkout quote."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from . import pricing
+        from .models import Coupon, ShippingLocation, ShippingOption, ShippingZone
+
+        # The rate table is per process and its version bump waits for a commit
+        # that TestCase never makes, so don't price from another test's rows
+        cache.clear()
+        pricing._rates = None
+
+        self.client = APIClient()
+        self.zone = ShippingZone.objects.create(name='Mainland', base_fee=2000)
+        self.location = ShippingLocation.objects.create(city_name='Ikeja', zone=self.zone)
+        self.option = ShippingOption.objects.create(name='Express', additional_cost=1500, estimated_delivery='24h')
+        self.coupon = Coupon.objects.create(code='TENOFF', discount_type=Coupon.PERCENTAGE, value=10, max_uses=1)
+        product = Product.objects.create(name='Mug', slug='mug', base_price=4000.00)
+        self.client.post('/api/orders/cart/', {'session_id': 'guest-q', 'product': product.pk, 'quantity': 3}, format='json')
+
+    def quote(self, **data):
+        payload = {
+            'session_id': 'guest-q', 'shipping_location_id': self.location.pk, 'shipping_option_id': self.option.pk,
+            **data,
+        }
+        return self.client.post('/api/orders/checkout/quote/', payload, format='json')
+
+    def test_quote_matches_checkout_pricing(self):
+        res = self.quote(coupon_code='tenoff')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['item_count'], 3)
+        self.assertEqual(res.data['subtotal_amount'], '12000.00')
+        self.assertEqual(res.data['total_shipping'], '3500.00')
+        self.assertEqual(res.data['discount_amount'], '1200.00')
+        self.assertEqual(res.data['payable_amount'], '14300.00')
+        self.assertEqual(res.data['coupon_code'], 'TENOFF')
+
+    def test_rates_changed_without_signals_are_picked_up_after_ttl(self):
+        from unittest import mock
+        from . import pricing
+        from .models import ShippingOption
+
+        self.assertEqual(self.quote().data['total_shipping'], '3500.00')
+        ShippingOption.objects.filter(pk=self.option.pk).update(additional_cost=500)
+        self.assertEqual(self.quote().data['total_shipping'], '3500.00')  # no version bump
+
+        later = pricing._rates.loaded_at + pricing.RATES_TTL
+        with mock.patch.object(pricing.time, 'monotonic', return_value=later):
+            self.assertEqual(self.quote().data['total_shipping'], '2500.00')
+
+        # Nothing written, so the single-use coupon is still available
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 0)
+        self.assertFalse(Order.objects.exists())
+
+        res = self.quote(shipping_option_id=0)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('shipping_option_id', res.data)
+
+    def test_rate_table_follows_shipping_changes(self):
+        self.assertEqual(self.quote().data['shipping_base_cost'], '2000.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.zone.base_fee = 2500
+            self.zone.save()
+        self.assertEqual(self.quote().data['shipping_base_cost'], '2500.00')
+
+
+class CheckoutIdempotencyTest(TestCase):
+    """Test Idempotency-Key on checkout (IdempotencyMixin on OrderListCreateView)."""
+
+    def setUp(self):
+        from unittest import mock
+        from lensra.core.tasks import orders as order_tasks
+        from .models import Coupon, ShippingLocation, ShippingOption, ShippingZone
+        from django.core.cache import cache
+
+        cache.clear()  # stored responses would outlive this test's rows
+
+        # Confirmation emails go through the broker; not what's under test
+        for task in (order_tasks.send_order_confirmation_email, order_tasks.send_order_recieved_email):
+            patcher = mock.patch.object(task, 'delay')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        zone = ShippingZone.objects.create(name='Mainland', base_fee=2000)
+        self.location = ShippingLocation.objects.create(city_name='Ikeja', zone=zone)
+        self.option = ShippingOption.objects.create(name='Standard', additional_cost=0, estimated_delivery='3 days')
+        self.coupon = Coupon.objects.create(code='ONCE', discount_type=Coupon.FIXED, value=500, max_uses=5)
+        product = Product.objects.create(name='Mug', slug='mug', base_price=4000.00)
+        self.client.post('/api/orders/cart/', {'session_id': 'guest-i', 'product': product.pk, 'quantity': 1}, format='json')
+
+    def checkout(self, key='checkout-1', session_id='guest-i'):
+        payload = {
+            'session_id': session_id, 'guest_email': 'guest@example.com', 'coupon_code': 'ONCE',
+            'shipping_address': '1 Test St', 'shipping_city': 'Ikeja', 'shipping_state': 'Lagos',
+            'phone_number': '08012345678',
+            'shipping_location_id': self.location.pk, 'shipping_option_id': self.option.pk,
+        }
+        return self.client.post('/api/orders/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replayed_checkout_places_one_order(self):
+        from .models import CouponRedemption
+
+        first = self.checkout()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        replay = self.checkout()
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data['order_number'], first.data['order_number'])
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(CouponRedemption.objects.count(), 1)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+
+    def test_repeat_while_in_flight_gets_409(self):
+        from unittest import mock
+        from .serializers import OrderCreateSerializer
+
+        original = OrderCreateSerializer.create
+        repeats = []
+
+        def create(serializer, validated_data):
+            # The client retries before the first request has answered
+            repeats.append(self.checkout())
+            return original(serializer, validated_data)
+
+        with mock.patch.object(OrderCreateSerializer, 'create', create):
+            first = self.checkout()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(repeats[0].status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_per_guest_session(self):
+        self.assertEqual(self.checkout().status_code, status.HTTP_201_CREATED)
+
+        # Same key from another guest: handled on its own (an empty bag), not replayed
+        other = self.checkout(session_id='guest-j')
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', other)
+
+        # A guest without a session_id has nothing to scope the key to
+        anonymous = self.checkout(session_id='')
+        self.assertEqual(anonymous.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('needs a signed-in user or a session_id', anonymous.data['error'])
+        self.assertEqual(Order.objects.count(), 1)
@@ -6,12 +6,15 @@ urlpatterns = [
     # Cart endpoints
     path('cart/', views.CartItemListCreateView.as_view(), name='cart-list'),
     path('cart/<int:pk>/', views.CartItemDetailView.as_view(), name='cart-detail'),
+    path('cart/lines/', views.CartLineListView.as_view(), name='cart-lines'),
 
     # Order endpoints
     path('orders/', views.OrderListCreateView.as_view(), name='order-list'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
+    path('checkout/quote/', views.CheckoutQuoteView.as_view(), name='checkout-quote'),
 
     path('cart/summary/', CartSummaryView.as_view(), name='cart-summary'),
+    path('cart/merge/', views.MergeCartView.as_view(), name='cart-merge'),
     path('secret-message/<uuid:reveal_token>/', views.GetSecretMessageView.as_view(), name='secret-message-reveal'),
     path('track-order/', views.TrackOrderView.as_view(), name='track-order'),
 
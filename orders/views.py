@@ -2,58 +2,97 @@ from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q
+from django.db.models import Prefetch, Q
+from products.models import AttributeValue
 from .models import CartItem, Order
 from .serializers import (
     CartItemSerializer, 
+    CartLineSerializer,
+    CheckoutQuoteSerializer,
     OrderSerializer, 
     OrderCreateSerializer,
     CouponSerializer,
 )
+from lensra.utils.pagination import KeysetPageNumberPagination
+from lensra.utils.conditional import ConditionalGetMixin
+from lensra.utils.coupons import CouponError, validate_coupon
+from lensra.utils.idempotency import IdempotencyMixin
+from django.http import Http404
+from .cart_store import get_cart_store
+from .cart_totals import get_cart_summary
 
 # --- CART VIEWS ---
 
-class CartItemListCreateView(generics.ListCreateAPIView):
+class CartItemQuerysetMixin:
+    """
+    Reads and writes cart lines through the visitor's cart store (see
+    orders/cart_store.py), loading the relations CartItemSerializer renders,
+    pruned to the requested fields.
+    """
+
+    def get_session_id(self):
+        return self.request.query_params.get('session_id')
+
+    def get_cart_store(self):
+        user = self.request.user if self.request.user.is_authenticated else None
+        return get_cart_store(user=user, session_id=self.get_session_id())
+
+    def get_cart_prefetch_lookups(self):
+        product_serializer = self.get_serializer().fields.get('product_details')
+        lookups = ['variant__attributes__attribute']
+        if product_serializer is not None:
+            lookups += product_serializer.get_prefetch_lookups(prefix='product__')
+        return lookups
+
+    def get_queryset(self):
+        return self.get_cart_store().lines(prefetch=self.get_cart_prefetch_lookups())
+
+
+class CartItemListCreateView(CartItemQuerysetMixin, generics.ListCreateAPIView):
     """Handles both Authenticated and Guest (session-based) carts."""
     serializer_class = CartItemSerializer
     permission_classes = [AllowAny] # Must be AllowAny to support guests
 
-    def get_queryset(self):
-        user = self.request.user
-        session_id = self.request.query_params.get('session_id')
-
-        if user.is_authenticated:
-            # Show items belonging to user
-            return CartItem.objects.filter(user=user)
-        elif session_id:
-            # Show items belonging to session
-            return CartItem.objects.filter(session_id=session_id, user__isnull=True)
-        return CartItem.objects.none()
+    def get_session_id(self):
+        if self.request.method == 'POST':
+            return self.request.data.get('session_id')
+        return super().get_session_id()
 
     def perform_create(self, serializer):
-        user = self.request.user if self.request.user.is_authenticated else None
-        session_id = self.request.data.get('session_id')
-        
-        # Link to user if logged in, otherwise link to session_id
-        serializer.save(
-            user=user,
-            session_id=None if user else session_id
-        )
+        # Link to user if logged in, otherwise to session_id (a Redis line for guests)
+        fields = {k: v for k, v in serializer.validated_data.items() if k != 'session_id'}
+        serializer.instance = self.get_cart_store().add(**fields)
 
-class CartItemDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CartItemDetailView(CartItemQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     """Update or delete items using either user ownership or session_id."""
     serializer_class = CartItemSerializer
     permission_classes = [AllowAny]
 
-    def get_queryset(self):
-        user = self.request.user
-        # We allow a broad queryset but the logic ensures you only touch what is yours
-        if user.is_authenticated:
-            return CartItem.objects.filter(user=user)
-        
-        # For guests, we filter by the session_id passed in the request
-        session_id = self.request.query_params.get('session_id')
-        return CartItem.objects.filter(session_id=session_id, user__isnull=True)
+    def get_object(self):
+        # Stores only ever return lines owned by this user or session
+        item = self.get_cart_store().get(self.kwargs['pk'], prefetch=self.get_cart_prefetch_lookups())
+        if item is None:
+            raise Http404
+        return item
+
+    def perform_update(self, serializer):
+        fields = {k: v for k, v in serializer.validated_data.items() if k != 'session_id'}
+        serializer.instance = self.get_cart_store().update(serializer.instance, **fields)
+
+    def perform_destroy(self, instance):
+        self.get_cart_store().remove(instance)
+
+class CartLineListView(CartItemQuerysetMixin, generics.ListAPIView):
+    """
+    The cart as flat lines (CartLineSerializer), unpaginated: one joined
+    query for the lines plus one for variant attributes, however many lines.
+    """
+    serializer_class = CartLineSerializer
+    permission_classes = [AllowAny]
+    pagination_class = None
+
+    def get_cart_prefetch_lookups(self):
+        return [Prefetch('variant__attributes', queryset=AttributeValue.objects.select_related('attribute'))]
 
 class MergeCartView(APIView):
     """
@@ -67,12 +106,8 @@ class MergeCartView(APIView):
         if not session_id:
             return Response({"error": "session_id required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Find all guest items for this session
-        guest_items = CartItem.objects.filter(session_id=session_id, user__isnull=True)
-        
-        # Move them to the authenticated user
-        count = guest_items.count()
-        guest_items.update(user=request.user, session_id=None)
+        # Guest lines (Redis or CartItem rows) become the user's CartItem rows
+        count = get_cart_store(session_id=session_id).merge_into(request.user)
         
         return Response({"message": f"Merged {count} items to your account."}, status=status.HTTP_200_OK)
 
@@ -86,7 +121,9 @@ from django.shortcuts import get_object_or_404
 from .models import Order
 from .serializers import OrderSerializer, OrderCreateSerializer
 
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(IdempotencyMixin, generics.ListCreateAPIView):
+    pagination_class = KeysetPageNumberPagination  # ?pagination=cursor / ?count=false
+
     def get_permissions(self):
         # Anyone can create an order (Guests or Users)
         if self.request.method == 'POST':
@@ -102,12 +139,12 @@ class OrderListCreateView(generics.ListCreateAPIView):
     def get_queryset(self):
         user = self.request.user
         if user.is_authenticated:
-            return Order.objects.filter(user=user).prefetch_related('items__product', 'items__variant')
+            return OrderSerializer.with_details(Order.objects.filter(user=user)).order_by('-created_at')
         
         # Guest View: If a guest provides their session_id in the URL params
         session_id = self.request.query_params.get('session_id')
         if session_id:
-            return Order.objects.filter(session_id=session_id).prefetch_related('items__product')
+            return OrderSerializer.with_details(Order.objects.filter(session_id=session_id)).order_by('-created_at')
             
         return Order.objects.none()
 
@@ -129,8 +166,8 @@ class OrderDetailView(generics.RetrieveAPIView):
     lookup_field = 'order_number' # Default to looking up by LRG-XXXX
 
     def get_queryset(self):
-        # Optimizing with prefetch to avoid hitting DB for every item in the order
-        return Order.objects.all().prefetch_related('items__product', 'items__variant')
+        # Order, items and item attributes in three queries whatever the order size
+        return OrderSerializer.with_details(Order.objects.all())
     
     def get_object(self):
         """
@@ -141,10 +178,10 @@ class OrderDetailView(generics.RetrieveAPIView):
         
         # 1. Try fetching by Order Number (LRG-...)
         if str(lookup_value).startswith('LRG-'):
-            order = get_object_or_404(Order, order_number=lookup_value)
+            order = get_object_or_404(self.get_queryset(), order_number=lookup_value)
         else:
             # 2. Try fetching by ID
-            order = get_object_or_404(Order, pk=lookup_value)
+            order = get_object_or_404(self.get_queryset(), pk=lookup_value)
 
         # SECURITY CHECK: 
         # If order belongs to a user, only that user can see it.
@@ -158,8 +195,6 @@ class OrderDetailView(generics.RetrieveAPIView):
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
-from django.db.models import Sum, F
-from .models import CartItem
 
 class CartSummaryView(APIView):
     """
@@ -169,29 +204,16 @@ class CartSummaryView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        # 1. Identify the user/session
-        session_id = request.headers.get('X-Session-ID')
-        
-        if request.user.is_authenticated:
-            queryset = CartItem.objects.filter(user=request.user)
-        else:
-            queryset = CartItem.objects.filter(session_id=session_id) if session_id else CartItem.objects.none()
-
-        # 2. Calculate Totals
-        # We aggregate quantity and calculate price * quantity for each item
-        totals = queryset.aggregate(
-            total_qty=Sum('quantity'),
-            total_amt=Sum(
-                # Logic: If variant price exists use it, otherwise use product base price
-                # We use Case/When for database-level calculation or simple F expressions
-                F('quantity') * F('product__base_price')
-            )
-        )
+        # 1. Identify the user/session (?session_id= like the other cart views; header kept for older clients)
+        session_id = request.query_params.get('session_id') or request.headers.get('X-Session-ID')
+        user = request.user if request.user.is_authenticated else None
+
+        # 2. Totals: variant- and sale-aware, cached until the cart or catalog changes
+        summary = get_cart_summary(get_cart_store(user=user, session_id=session_id))
 
         # 3. Formulate Response
         data = {
-            "total_quantity": totals.get('total_qty') or 0,
-            "total_price": totals.get('total_amt') or 0.00,
+            **summary,
             "wishlist_count": 0  # You can add wishlist logic here later
         }
 
@@ -246,7 +268,7 @@ class TrackOrderView(APIView):
             return Response({"error": "Both order_number and email are required."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            order = Order.objects.get(
+            order = OrderSerializer.with_details(Order.objects.all()).get(
                 Q(guest_email=email) | Q(user__email=email),
                 order_number=order_number
             )
@@ -263,21 +285,23 @@ from rest_framework import generics
 from .models import ShippingZone, ShippingOption
 from .serializers import ShippingZoneSerializer, ShippingOptionSerializer
 
-class ShippingZoneListView(generics.ListAPIView):
+class ShippingZoneListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Returns all shipping zones with their associated cities (locations).
     """
     queryset = ShippingZone.objects.all().prefetch_related('locations')
     serializer_class = ShippingZoneSerializer
     permission_classes = [AllowAny]
+    cache_scopes = ('shipping',)
 
-class ShippingOptionListView(generics.ListAPIView):
+class ShippingOptionListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Returns speed options like 'Standard' or 'Express'.
     """
     queryset = ShippingOption.objects.filter(additional_cost__gte=0) # Only active options
     serializer_class = ShippingOptionSerializer
     permission_classes = [AllowAny]
+    cache_scopes = ('shipping',)
 
 
 
@@ -285,11 +309,22 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from decimal import Decimal
-from .models import Coupon
 
 
 
+class CheckoutQuoteView(APIView):
+    """
+    Price breakdown for the current bag and shipping choice, as checkout will
+    charge it. Writes nothing, so the checkout page can call it on every change.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = CheckoutQuoteSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
 class ValidateCouponView(APIView):
     permission_classes = [AllowAny]
 
@@ -301,36 +336,15 @@ class ValidateCouponView(APIView):
             return Response({"error": "Please enter a coupon code."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Case-insensitive lookup
-            coupon = Coupon.objects.get(code__iexact=code)
-            
-            # 1. Check basic validity (active, expired, usage limits)
-            if not coupon.can_be_used():
-                return Response({"error": "This coupon is no longer valid."}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 2. Check minimum order amount
-            if subtotal:
-                subtotal_dec = Decimal(str(subtotal))
-                if coupon.min_order_amount and subtotal_dec < coupon.min_order_amount:
-                    return Response({
-                        "error": f"Minimum order of ₦{coupon.min_order_amount:,.2f} required for this code."
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                subtotal_dec = Decimal('0.00')
-
-            # 3. Calculate the discount preview
-            if coupon.discount_type == Coupon.PERCENTAGE:
-                discount_amount = (coupon.value / 100) * subtotal_dec
-            else:
-                discount_amount = coupon.value
-
-            return Response({
-                "valid": True,
-                "code": coupon.code,
-                "discount_type": coupon.discount_type,
-                "value": coupon.value,
-                "discount_amount": float(min(discount_amount, subtotal_dec))
-            }, status=status.HTTP_200_OK)
-
-        except Coupon.DoesNotExist:
-            return Response({"error": "Invalid coupon code."}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            coupon, discount_amount = validate_coupon(code, subtotal)
+        except CouponError as exc:
+            error_status = status.HTTP_404_NOT_FOUND if exc.not_found else status.HTTP_400_BAD_REQUEST
+            return Response({"error": exc.message}, status=error_status)
+
+        return Response({
+            "valid": True,
+            "code": coupon.code,
+            "discount_type": coupon.discount_type,
+            "value": coupon.value,
+            "discount_amount": float(discount_amount)
+        }, status=status.HTTP_200_OK)
\ No newline at end of file
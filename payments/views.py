@@ -11,6 +11,8 @@ from .serializers import (
     PaymentInitializeSerializer,
     PaymentVerifySerializer
 )
+from lensra.utils.idempotency import idempotent
+from lensra.utils.pagination import KeysetPageNumberPagination
 from django.utils import timezone
 from digitalgifts.models import DigitalGift
 
@@ -25,6 +27,7 @@ class PaymentInitializeView(APIView):
     """Initialize payment for an Order or DigitalGift."""
     permission_classes = [AllowAny]
 
+    @idempotent  # a retried call must not open a second Paystack transaction
     def post(self, request, *args, **kwargs):
         serializer = PaymentInitializeSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -165,6 +168,7 @@ class PaymentListView(generics.ListAPIView):
     """List payments for logged-in users."""
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPageNumberPagination  # ?pagination=cursor / ?count=false
 
     def get_queryset(self):
         return Payment.objects.filter(user=self.request.user)
@@ -79,13 +79,9 @@ class CategoryAdmin(admin.ModelAdmin):
 
     def get_full_path(self, obj):
         # Build a breadcrumb-style path: "Grandparent > Parent > Name"
-        path = []
-        current = obj
-        while current:
-            path.append(current.name)
-            current = current.parent
-        return ' > '.join(reversed(path)) if path else obj.name
+        return obj.get_full_path(separator=' > ')
     get_full_path.short_description = 'Category Path'
+    get_full_path.admin_order_field = 'path'  # sorting by path groups each subtree together
 
 @admin.register(Attribute)
 class AttributeAdmin(admin.ModelAdmin):
@@ -223,8 +219,8 @@ class ProductAdmin(admin.ModelAdmin):
 
 @admin.register(ProductVariant)
 class ProductVariantAdmin(admin.ModelAdmin):
-    list_display = ('product', 'get_attributes', 'price_override', 'stock_quantity')
-    list_filter = ('product', 'attributes__attribute')
+    list_display = ('product', 'get_attributes', 'price_override', 'stock_quantity', 'track_stock')
+    list_filter = ('product', 'attributes__attribute', 'track_stock')
 
     def get_attributes(self, obj):
         return ", ".join([f"{a.attribute.name}: {a.value}" for a in obj.attributes.all()])
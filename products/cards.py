@@ -0,0 +1,110 @@
+"""
+Product card read model.
+
+The catalog list endpoints (product list, featured, deals, related) all render
+the same ProductListSerializer "card". Building it walks categories, tags and
+variants for every row, so we keep the finished payload in ProductCard and only
+rebuild it when the product or something it embeds changes (see products.signals).
+
+Sale fields depend on the clock, so they are not stored; they are laid over the
+stored payload from the product row at read time.
+"""
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Product, ProductCard
+from .serializers import ProductListSerializer
+
+# Fields whose value depends on timezone.now() and must be computed per request
+SALE_FIELDS = ('is_on_sale', 'display_price', 'original_price', 'sale_label', 'sale_ends_in')
+
+CARD_PREFETCH = (
+    'categories',
+    'tags',
+    'variants__attributes__attribute',
+)
+
+REFRESH_BATCH_SIZE = 200
+
+
+def build_card_payload(product, context=None):
+    """Serialize a product into its stored card payload (JSON-ready, no sale fields)."""
+    data = ProductListSerializer(product, context=context if context is not None else {}).data
+    for field in SALE_FIELDS:
+        data.pop(field, None)
+    # Round-trip through DRF's encoder so the stored payload matches what the API renders
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+def get_sale_fields(product):
+    """Live sale fields for a product, matching ProductListSerializer's method fields."""
+    serializer = ProductListSerializer()
+    return {
+        'is_on_sale': serializer.get_is_on_sale(product),
+        'display_price': serializer.get_display_price(product),
+        'original_price': serializer.get_original_price(product),
+        'sale_label': serializer.get_sale_label(product),
+        'sale_ends_in': serializer.get_sale_ends_in(product),
+    }
+
+
+def refresh_product_cards(product_ids=None):
+    """
+    Rebuild and upsert cards for the given products (all products when None).
+    Returns the number of cards written.
+    """
+    products = Product.objects.prefetch_related(*CARD_PREFETCH).order_by('pk')
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    written = 0
+    batch = []
+    context = {}  # shared so the category tree is loaded once per refresh
+    for product in products.iterator(chunk_size=REFRESH_BATCH_SIZE):
+        batch.append(ProductCard(product=product, payload=build_card_payload(product, context)))
+        if len(batch) >= REFRESH_BATCH_SIZE:
+            written += _upsert_cards(batch)
+            batch = []
+    if batch:
+        written += _upsert_cards(batch)
+    return written
+
+
+def _upsert_cards(cards):
+    ProductCard.objects.bulk_create(
+        cards,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['payload', 'updated_at'],
+    )
+    return len(cards)
+
+
+def render_cards(products):
+    """
+    Return card payloads for an iterable of products (ideally loaded with
+    select_related('card')). Products without a card yet get one built now.
+    """
+    products = list(products)
+    missing = [p for p in products if not _has_card(p)]
+    if missing:
+        refresh_product_cards([p.pk for p in missing])
+        cards = ProductCard.objects.in_bulk([p.pk for p in missing])
+        for product in missing:
+            if product.pk in cards:
+                product.card = cards[product.pk]
+
+    results = []
+    for product in products:
+        payload = dict(product.card.payload) if _has_card(product) else build_card_payload(product)
+        payload.update(get_sale_fields(product))
+        results.append(payload)
+    return results
+
+
+def _has_card(product):
+    try:
+        return product.card is not None
+    except ProductCard.DoesNotExist:
+        return False
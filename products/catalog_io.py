@@ -0,0 +1,419 @@
+"""
+Streaming catalog import/export.
+
+Supplier feeds are far too large to load through ProductAdmin one product at
+a time. These helpers stream CSV or JSONL records and upsert products,
+categories, tags, attribute values, variants and their M2M links in batches
+with bulk_create(update_conflicts=...), so memory stays flat no matter how
+big the file is.
+
+One JSONL line is one product:
+
+    {"slug": "red-mug", "name": "Red Mug", "base_price": "2500.00",
+     "categories": ["gifts/kitchen"], "tags": ["for-her"],
+     "variants": [{"sku": "MUG-R-11", "stock_quantity": 4, "price_override": null,
+                   "attributes": {"Color": "Red", "Size": "11oz"}}]}
+
+A CSV row is one variant (or one variant-less product). Rows of the same
+product must be consecutive; product columns are read from its first row.
+Lists are "|"-separated and attributes are "Color=Red;Size=11oz".
+
+- Categories are "/"-separated slug paths; missing ones are created. Slugs
+  are unique, so a path naming an existing category under a different
+  parent is an error rather than a silent link to wherever it lives.
+- Tags are names; slugs are derived with slugify, like ProductAdmin does.
+- Variants are matched on sku (defaulting to "<slug>:<attributes>"); variants
+  missing from the file are left alone, since orders may reference them.
+  Variants without a sku (from before the column existed) are matched on
+  product and attributes and given the sku on their first import.
+- Only product columns present in the file are written on update, and
+  categories/tags are only replaced for records that carry them (an empty
+  value clears them; a missing column or key leaves them alone).
+- Images are not part of the feed.
+"""
+import csv
+import json
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .categories import CategoryTree
+from .sales import recompute_sale_states
+from .models import Attribute, AttributeValue, Category, Product, ProductVariant, Tag
+
+BATCH_SIZE = 500
+
+PRODUCT_FIELDS = (
+    'name', 'base_price', 'description', 'message', 'min_order_quantity',
+    'is_customizable', 'is_featured', 'is_trending', 'is_active',
+    'sale_price', 'is_on_sale', 'sale_start', 'sale_end', 'sale_label',
+)
+REQUIRED_FIELDS = ('name', 'base_price')
+LIST_SEPARATOR = '|'
+CSV_COLUMNS = ('slug', *PRODUCT_FIELDS, 'categories', 'tags', 'sku', 'price_override', 'stock_quantity', 'attributes')
+
+
+class CatalogFormatError(ValueError):
+    pass
+
+
+# Reading
+
+def _split(value, separator):
+    if isinstance(value, list):
+        return value
+    return [part.strip() for part in (value or '').split(separator) if part.strip()]
+
+
+def _parse_attributes(value):
+    if isinstance(value, dict):
+        return value
+    pairs = (part.split('=', 1) for part in _split(value, ';'))
+    return {name.strip(): option.strip() for name, option in pairs}
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise CatalogFormatError(f'line {line_number}: {exc}')
+
+
+def read_csv(stream):
+    """Group consecutive rows by slug into one product record each."""
+    rows = enumerate(csv.DictReader(stream), 2)  # line 1 is the header
+    for slug, group in groupby(rows, key=lambda item: item[1].get('slug')):
+        group = list(group)
+        line_number, first = group[0]
+        record = {key: value for key, value in first.items() if key in PRODUCT_FIELDS and value is not None}
+        record['slug'] = slug
+        # Absent columns stay absent, so the product's links are left alone
+        for column in ('categories', 'tags'):
+            if column in first:
+                record[column] = _split(first[column], LIST_SEPARATOR)
+        record['variants'] = [
+            {
+                'sku': row.get('sku') or None,
+                'price_override': row.get('price_override') or None,
+                'stock_quantity': row.get('stock_quantity') or 0,
+                'attributes': _parse_attributes(row.get('attributes')),
+            }
+            for _, row in group
+            if row.get('sku') or row.get('attributes') or row.get('stock_quantity')
+        ]
+        yield line_number, record
+
+
+def _combo(attributes):
+    return ';'.join(f'{name}={value}' for name, value in sorted(attributes.items()))
+
+
+def _clean(field_name, value):
+    field = Product._meta.get_field(field_name)
+    if value in ('', None):
+        return None if field.null else field.get_default()
+    if field.get_internal_type() == 'BooleanField' and isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 't', 'yes', 'y')
+    return field.to_python(value)
+
+
+def _batches(records, size):
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CatalogImporter:
+    """
+    Upserts product records batch by batch. Lookup caches (categories, tags,
+    attributes) grow with the number of distinct values, not with the file.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, on_batch=None):
+        self.batch_size = batch_size
+        self.on_batch = on_batch or (lambda product_ids: None)
+        self.slug_paths = {}
+        self.tag_ids = {}
+        self.attribute_ids = {}
+        self.imported = 0
+
+    def run(self, records, progress=None):
+        for batch in _batches(records, self.batch_size):
+            with transaction.atomic():
+                product_ids = self.import_batch(batch)
+                self.on_batch(product_ids)
+            self.imported += len(batch)
+            if progress:
+                progress(self.imported)
+        return self.imported
+
+    # Lookups
+
+    def category_id(self, slug_path):
+        if slug_path in self.slug_paths:
+            return self.slug_paths[slug_path]
+
+        parent = None
+        for slug in slug_path.strip('/').split('/'):
+            category = Category.objects.select_related('parent').filter(slug=slug).first()
+            if category is None:
+                category = Category(name=slug.replace('-', ' ').title(), slug=slug, parent=parent)
+                category.save()
+            elif category.parent_id != (parent.pk if parent else None):
+                # Slugs are global, so a feed can't put an existing category somewhere else
+                where = f'under {category.parent.slug!r}' if category.parent else 'at the top level'
+                raise CatalogFormatError(f'category {slug_path!r}: {slug!r} already exists {where}')
+            parent = category
+        self.slug_paths[slug_path] = parent.pk
+        return parent.pk
+
+    def resolve_tags(self, names):
+        wanted = {slugify(name): name for name in names if slugify(name)}
+        missing = [slug for slug in wanted if slug not in self.tag_ids]
+        if missing:
+            Tag.objects.bulk_create(
+                [Tag(slug=slug, name=wanted[slug]) for slug in missing], ignore_conflicts=True
+            )
+            # A tag may already exist under the same name with a different slug
+            names = [wanted[slug] for slug in missing]
+            for slug, name, pk in Tag.objects.filter(Q(slug__in=missing) | Q(name__in=names)).values_list('slug', 'name', 'pk'):
+                self.tag_ids[slug] = pk
+                self.tag_ids.setdefault(slugify(name), pk)
+
+    def attribute_id(self, name):
+        if name not in self.attribute_ids:
+            attribute = Attribute.objects.filter(name=name).order_by('pk').first()
+            if attribute is None:
+                attribute = Attribute.objects.create(name=name)
+            self.attribute_ids[name] = attribute.pk
+        return self.attribute_ids[name]
+
+    def resolve_attribute_values(self, pairs):
+        """{(attribute name, value): AttributeValue id} for every pair, creating missing ones."""
+        keyed = {(self.attribute_id(name), value): (name, value) for name, value in pairs}
+        AttributeValue.objects.bulk_create(
+            [AttributeValue(attribute_id=attribute_id, value=value) for attribute_id, value in keyed],
+            ignore_conflicts=True,
+        )
+        found = AttributeValue.objects.filter(
+            attribute_id__in={attribute_id for attribute_id, _ in keyed},
+            value__in={value for _, value in keyed},
+        ).values_list('attribute_id', 'value', 'pk')
+        return {keyed[(a, v)]: pk for a, v, pk in found if (a, v) in keyed}
+
+    # Batches
+
+    def import_batch(self, batch):
+        for line_number, record in batch:
+            if not record.get('slug'):
+                raise CatalogFormatError(f'line {line_number}: missing slug')
+            missing = [field for field in REQUIRED_FIELDS if field not in record]
+            if missing:
+                raise CatalogFormatError(f"line {line_number}: missing {', '.join(missing)}")
+        # One upsert can't touch a row twice; the last record for a slug wins
+        batch = list({record['slug']: (line_number, record) for line_number, record in batch}.values())
+
+        # Each record writes only the fields it carries (JSONL records can differ),
+        # so records are upserted in groups sharing the same set of fields
+        groups = {}
+        for line_number, record in batch:
+            columns = tuple(field for field in PRODUCT_FIELDS if field in record)
+            try:
+                product = Product(slug=record['slug'], **{field: _clean(field, record[field]) for field in columns})
+            except Exception as exc:
+                raise CatalogFormatError(f'line {line_number}: {exc}')
+            product.sync_sale_state()  # bulk_create skips save()
+            groups.setdefault(columns, []).append(product)
+
+        for columns, products in groups.items():
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=[*columns, 'updated_at'],
+            )
+        slugs = [record['slug'] for _, record in batch]
+        product_ids = dict(Product.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+        # Updated rows may keep sale columns the file doesn't carry
+        recompute_sale_states(product_ids.values())
+
+        records = [record for _, record in batch]
+        self.link_categories(records, product_ids)
+        self.link_tags(records, product_ids)
+        self.import_variants(records, product_ids)
+        return list(product_ids.values())
+
+    def _replace_links(self, through, field, product_ids, links):
+        if not product_ids:
+            return
+        through.objects.filter(product_id__in=product_ids).delete()
+        through.objects.bulk_create(
+            [through(product_id=product_id, **{field: value}) for product_id, value in links],
+            ignore_conflicts=True,
+        )
+
+    def link_categories(self, records, product_ids):
+        records = [record for record in records if 'categories' in record]
+        links = {
+            (product_ids[record['slug']], self.category_id(path))
+            for record in records for path in _split(record['categories'], LIST_SEPARATOR)
+        }
+        self._replace_links(Product.categories.through, 'category_id',
+                            [product_ids[record['slug']] for record in records], links)
+
+    def link_tags(self, records, product_ids):
+        records = [record for record in records if 'tags' in record]
+        self.resolve_tags(name for record in records for name in _split(record['tags'], LIST_SEPARATOR))
+        links = {
+            (product_ids[record['slug']], self.tag_ids[slugify(name)])
+            for record in records for name in _split(record['tags'], LIST_SEPARATOR) if slugify(name)
+        }
+        self._replace_links(Product.tags.through, 'tag_id', [product_ids[record['slug']] for record in records], links)
+
+    def import_variants(self, records, product_ids):
+        rows = []
+        for record in records:
+            for variant in record.get('variants') or ():
+                attributes = _parse_attributes(variant.get('attributes'))
+                sku = variant.get('sku') or f"{record['slug']}:{_combo(attributes)}"
+                rows.append((sku, product_ids[record['slug']], variant, attributes))
+        rows = list({row[0]: row for row in rows}.values())
+        if not rows:
+            return
+
+        self.adopt_legacy_variants(rows)
+        ProductVariant.objects.bulk_create(
+            [
+                ProductVariant(
+                    sku=sku,
+                    product_id=product_id,
+                    price_override=Decimal(str(variant['price_override'])) if variant.get('price_override') not in (None, '') else None,
+                    stock_quantity=int(variant.get('stock_quantity') or 0),
+                )
+                for sku, product_id, variant, _ in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=['product', 'price_override', 'stock_quantity'],
+        )
+        variant_ids = dict(ProductVariant.objects.filter(sku__in=[row[0] for row in rows]).values_list('sku', 'pk'))
+
+        value_ids = self.resolve_attribute_values({pair for *_, attributes in rows for pair in attributes.items()})
+        through = ProductVariant.attributes.through
+        through.objects.filter(productvariant_id__in=variant_ids.values()).delete()
+        through.objects.bulk_create(
+            [
+                through(productvariant_id=variant_ids[sku], attributevalue_id=value_ids[pair])
+                for sku, _, _, attributes in rows for pair in attributes.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+
+    def adopt_legacy_variants(self, rows):
+        """
+        Give SKU-less variants (created before the sku column) the sku their
+        row resolves to, matched on product and attribute combination, so the
+        upsert updates them instead of inserting duplicates.
+        """
+        taken = set(ProductVariant.objects.filter(sku__in=[row[0] for row in rows]).values_list('sku', flat=True))
+        wanted = {
+            (product_id, _combo(attributes)): sku
+            for sku, product_id, _, attributes in rows if sku not in taken
+        }
+        if not wanted:
+            return
+        legacy = ProductVariant.objects.filter(
+            product_id__in={product_id for product_id, _ in wanted}, sku__isnull=True
+        ).order_by('pk').prefetch_related('attributes__attribute')
+
+        adopted = []
+        for variant in legacy:
+            attributes = {value.attribute.name: value.value for value in variant.attributes.all()}
+            sku = wanted.pop((variant.product_id, _combo(attributes)), None)
+            if sku is not None:
+                variant.sku = sku
+                adopted.append(variant)
+        ProductVariant.objects.bulk_update(adopted, ['sku'])
+
+
+# Writing
+
+def _category_paths(tree):
+    paths = {}
+    for category in tree.by_id.values():
+        slugs, current = [], category
+        while current is not None:
+            slugs.append(current.slug or slugify(current.name))
+            current = tree.get(current.parent_id) if current.parent_id else None
+        paths[category.pk] = '/'.join(reversed(slugs))
+    return paths
+
+
+def _value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_records(queryset=None, chunk_size=BATCH_SIZE):
+    """Stream one JSON-ready record per product, in pk order."""
+    category_paths = _category_paths(CategoryTree.load())
+    products = (queryset if queryset is not None else Product.objects.all()).order_by('pk').prefetch_related(
+        'categories', 'tags', 'variants__attributes__attribute'
+    )
+    for product in products.iterator(chunk_size=chunk_size):
+        yield {
+            'slug': product.slug,
+            **{field: _value(getattr(product, field)) for field in PRODUCT_FIELDS},
+            'categories': [category_paths[c.pk] for c in product.categories.all()],
+            'tags': [tag.name for tag in product.tags.all()],
+            'variants': [
+                {
+                    'sku': variant.sku,
+                    'price_override': _value(variant.price_override),
+                    'stock_quantity': variant.stock_quantity,
+                    'attributes': {value.attribute.name: value.value for value in variant.attributes.all()},
+                }
+                for variant in product.variants.all()
+            ],
+        }
+
+
+def write_jsonl(records, stream):
+    for record in records:
+        stream.write(json.dumps(record) + '\n')
+        yield record
+
+
+def write_csv(records, stream):
+    writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for record in records:
+        base = {key: record[key] for key in ('slug', *PRODUCT_FIELDS)}
+        base['categories'] = LIST_SEPARATOR.join(record['categories'])
+        base['tags'] = LIST_SEPARATOR.join(record['tags'])
+        for variant in record['variants'] or [None]:
+            row = dict(base)
+            if variant is not None:
+                row.update(
+                    sku=variant['sku'] or '',
+                    price_override=variant['price_override'] or '',
+                    stock_quantity=variant['stock_quantity'],
+                    attributes=';'.join(f'{name}={value}' for name, value in variant['attributes'].items()),
+                )
+            writer.writerow({key: '' if value is None else value for key, value in row.items()})
+        yield record
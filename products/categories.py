@@ -0,0 +1,37 @@
+"""
+In-memory category tree.
+
+Categories are a small, read-heavy table, so serializers load the whole tree
+once per response (ordered by materialized path) and answer breadcrumbs,
+parents and nested subcategories from memory instead of walking `parent`
+one query at a time.
+"""
+from .models import Category
+
+
+class CategoryTree:
+    def __init__(self, categories):
+        self.by_id = {}
+        self.children = {}
+        for category in categories:
+            self.by_id[category.pk] = category
+            self.children.setdefault(category.parent_id, []).append(category)
+
+    @classmethod
+    def load(cls):
+        """Whole tree in a single query."""
+        return cls(Category.objects.order_by('path'))
+
+    def get(self, pk):
+        return self.by_id.get(pk)
+
+    def children_of(self, category):
+        return self.children.get(category.pk, [])
+
+    def full_path(self, category, separator=' > '):
+        names = []
+        current = category
+        while current is not None:
+            names.append(current.name)
+            current = self.by_id.get(current.parent_id) if current.parent_id else None
+        return separator.join(reversed(names))
@@ -0,0 +1,104 @@
+"""
+Facet counts for the catalog filter sidebar.
+
+Given the current ProductFilter state, count matching products per category
+(including subcategories, like ?category= does), per tag, per price bucket and
+per flag in three aggregate queries, instead of the frontend calling the list
+endpoint once per filter value. Results are cached per filter state and per
+catalog/categories/tags version, so any product change invalidates them.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from lensra.utils.conditional import get_version
+from .models import Category, Product
+
+FACETS_TTL = 60 * 15
+FACET_SCOPES = ('catalog', 'categories', 'tags')
+
+# (key, min_price, next bucket's min_price) on effective_price; the gift finder budgets
+PRICE_BUCKETS = (
+    ('under-15000', None, 15000),
+    ('15000-50000', 15000, 50000),
+    ('over-50000', 50000, None),
+)
+
+FLAGS = ('is_customizable', 'is_featured', 'is_trending')
+
+
+def _price_q(low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(effective_price__gte=low)
+    if high is not None:
+        q &= Q(effective_price__lt=high)
+    return q
+
+
+def compute_facets(queryset):
+    matching = queryset.order_by().values('pk')
+    through = Product.categories.through
+
+    totals = queryset.order_by().aggregate(
+        count=Count('pk'),
+        **{f'price_{key}': Count('pk', filter=_price_q(low, high)) for key, low, high in PRICE_BUCKETS},
+        **{flag: Count('pk', filter=Q(**{flag: True})) for flag in FLAGS},
+    )
+
+    # Distinct products anywhere in each category's subtree (materialized path prefix)
+    in_subtree = (
+        through.objects
+        .filter(category__path__startswith=OuterRef('path'), product_id__in=matching)
+        .order_by()
+        .annotate(group=Value(1))  # single group: one count per outer category
+        .values('group')
+        .annotate(n=Count('product_id', distinct=True))
+        .values('n')
+    )
+    categories = (
+        Category.objects
+        .annotate(count=Coalesce(Subquery(in_subtree, output_field=IntegerField()), 0))
+        .filter(count__gt=0)
+        .order_by('path')
+        .values('id', 'slug', 'name', 'parent_id', 'count')
+    )
+
+    tags = (
+        Product.tags.through.objects
+        .filter(product_id__in=matching)
+        .values('tag__slug', 'tag__name')
+        .annotate(count=Count('product_id'))
+        .order_by('-count', 'tag__name')
+    )
+
+    return {
+        'count': totals['count'],
+        'categories': list(categories),
+        'tags': [{'slug': t['tag__slug'], 'name': t['tag__name'], 'count': t['count']} for t in tags],
+        'price': [
+            {
+                'key': key,
+                'min_price': low,
+                'max_price': high - 0.01 if high is not None else None,  # max_price is inclusive
+                'count': totals[f'price_{key}'],
+            }
+            for key, low, high in PRICE_BUCKETS
+        ],
+        'flags': {flag: totals[flag] for flag in FLAGS},
+    }
+
+
+def get_facets(queryset, params):
+    """compute_facets() through the cache, keyed by filter params and catalog versions."""
+    state = sorted((key, value) for key in params for value in params.getlist(key))
+    versions = [get_version(scope) for scope in FACET_SCOPES]
+    key = 'products:facets:' + hashlib.md5(repr((state, versions)).encode()).hexdigest()
+
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.set(key, facets, FACETS_TTL)
+    return facets
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from products import catalog_io
+from products.models import Product
+from .import_catalog import catalog_format
+
+
+class Command(BaseCommand):
+    help = "Stream the catalog to a CSV or JSONL file in the format import_catalog reads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for stdout (default).")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--active-only', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=catalog_io.BATCH_SIZE)
+
+    def handle(self, *args, path, format, active_only, batch_size, **options):
+        queryset = Product.objects.filter(is_active=True) if active_only else Product.objects.all()
+        to_stdout = path == '-'
+        stream = sys.stdout if to_stdout else open(path, 'w', newline='', encoding='utf-8')
+        writer = catalog_io.write_csv if catalog_format(path, format) == 'csv' else catalog_io.write_jsonl
+
+        count = 0
+        try:
+            for count, _ in enumerate(writer(catalog_io.export_records(queryset, batch_size), stream), 1):
+                if not to_stdout and count % batch_size == 0:
+                    self.stdout.write(f"Exported {count} products...")
+        finally:
+            if not to_stdout:
+                stream.close()
+
+        if not to_stdout:
+            self.stdout.write(self.style.SUCCESS(f"Exported {count} products to {path}."))
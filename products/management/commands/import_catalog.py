@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products import catalog_io, sampling
+from products.signals import products_changed, related_products_changed
+
+
+def catalog_format(path, requested):
+    if requested:
+        return requested
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+class Command(BaseCommand):
+    help = "Stream a CSV or JSONL catalog file and upsert products, categories, tags and variants in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Catalog file, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=catalog_io.BATCH_SIZE)
+
+    def handle(self, *args, path, format, batch_size, **options):
+        def batch_done(product_ids):
+            # Caches and read models refresh once per batch, not once per row
+            products_changed(product_ids, touch=False)
+            related_products_changed(product_ids)
+            transaction.on_commit(sampling.invalidate_pools)
+
+        def progress(count):
+            self.stdout.write(f"Imported {count} products...")
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        reader = catalog_io.read_csv if catalog_format(path, format) == 'csv' else catalog_io.read_jsonl
+        importer = catalog_io.CatalogImporter(batch_size=batch_size, on_batch=batch_done)
+        try:
+            count = importer.run(reader(stream), progress=progress)
+        except catalog_io.CatalogFormatError as exc:
+            raise CommandError(f"{exc} ({importer.imported} products imported before the error).")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {count} products."))
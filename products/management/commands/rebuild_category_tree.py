@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Category
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized path/depth of every Category from its parent links."
+
+    def handle(self, *args, **options):
+        count = Category.rebuild_paths()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt paths for {count} categories."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.related import refresh_related_products
+
+
+class Command(BaseCommand):
+    help = "Recompute the related-products neighbour table for every active product."
+
+    def handle(self, *args, **options):
+        count = refresh_related_products()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt neighbours for {count} products."))
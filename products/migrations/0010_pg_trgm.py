@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:40
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # product_name_trgm_idx (gin_trgm_ops) and the search's TrigramWordSimilarity
+    # need pg_trgm; a no-op on other databases
+
+    dependencies = [
+        ('products', '0009_product_description_productimage'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:05
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_attribute_values(apps, schema_editor):
+    """
+    Fold repeated (attribute, value) rows, which the admin used to allow, into
+    the oldest one before attribute_value_uniq is added; variants keep their links.
+    """
+    AttributeValue = apps.get_model('products', 'AttributeValue')
+    VariantAttribute = apps.get_model('products', 'ProductVariant').attributes.through
+
+    duplicates = (
+        AttributeValue.objects.values('attribute_id', 'value')
+        .annotate(keep=Min('pk'), copies=Count('pk'))
+        .filter(copies__gt=1)
+    )
+    for group in duplicates:
+        extra_ids = (
+            AttributeValue.objects
+            .filter(attribute_id=group['attribute_id'], value=group['value'])
+            .exclude(pk=group['keep'])
+            .values_list('pk', flat=True)
+        )
+        for extra_id in list(extra_ids):
+            # A variant linked to both rows keeps the one link it already has
+            on_keeper = VariantAttribute.objects.filter(attributevalue_id=group['keep']).values('productvariant_id')
+            VariantAttribute.objects.filter(attributevalue_id=extra_id, productvariant_id__in=on_keeper).delete()
+            VariantAttribute.objects.filter(attributevalue_id=extra_id).update(attributevalue_id=group['keep'])
+            AttributeValue.objects.filter(pk=extra_id).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_pg_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_attribute_values, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from designs.models import Design
 from cloudinary.models import CloudinaryField
 from django.utils import timezone
@@ -23,20 +29,108 @@ class Category(models.Model):
     slug = models.SlugField(unique=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subcategories')
 
+    # Materialized path of ids from the root down to this category, e.g. "/1/5/12/".
+    # Maintained in save(); lets ancestors, descendants and the whole tree load in one query.
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name_plural = "Categories"
+        indexes = [
+            # varchar_pattern_ops so `path LIKE '/1/5/%'` can use the index on PostgreSQL
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
-    def get_full_path(self):
-        full_path = [self.name]
-        k = self.parent
-        while k is not None:
-            full_path.append(k.name)
-            k = k.parent
-        return ' -> '.join(full_path[::-1])
+    @property
+    def ancestor_ids(self):
+        """Ids of all ancestors, root first (excluding this category)."""
+        return [int(pk) for pk in self.path.strip('/').split('/')[:-1]] if self.path else []
+
+    def get_ancestors(self, include_self=False):
+        ids = self.ancestor_ids + ([self.pk] if include_self else [])
+        return Category.objects.filter(pk__in=ids).order_by('depth')
+
+    def get_descendants(self, include_self=False):
+        descendants = Category.objects.filter(path__startswith=self.path).order_by('path')
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
+    def get_full_path(self, separator=' -> '):
+        if not self.path:
+            # Not indexed yet (see rebuild_paths); walk the parents instead
+            full_path = [self.name]
+            k = self.parent
+            while k is not None:
+                full_path.append(k.name)
+                k = k.parent
+            return separator.join(full_path[::-1])
+
+        names = list(self.get_ancestors().values_list('name', flat=True))
+        return separator.join(names + [self.name])
+
+    def clean(self):
+        if self.pk and self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or ''
+            if self.parent_id == self.pk or f"/{self.pk}/" in parent_path:
+                raise ValidationError({'parent': "A category cannot be moved under itself or its subcategories."})
+
+    def save(self, *args, **kwargs):
+        self.clean()
+        self._previous_ancestor_ids = []
+        with transaction.atomic():
+            if self.pk is None:
+                # The path needs the id; category_saved takes a new row's ancestors from its parent
+                super().save(*args, **kwargs)
+                self._sync_path()
+            else:
+                # Paths are written before the save so post_save handlers see the new tree
+                self._sync_path()
+                super().save(*args, **kwargs)
+
+    def _sync_path(self):
+        """Recompute this category's path and, if it moved, re-root its whole subtree."""
+        parent_path = '/'
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or '/'
+        new_path = f"{parent_path}{self.pk}/"
+        new_depth = new_path.count('/') - 2
+
+        old_path, old_depth = self.path, self.depth
+        if new_path == old_path:
+            return
+
+        if old_path:
+            # Ancestors it was moved away from, so their cached subcategories get refreshed too
+            self._previous_ancestor_ids = self.ancestor_ids
+            # One UPDATE moves the category and every descendant
+            Category.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+        else:
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        self.path, self.depth = new_path, new_depth
+
+    @classmethod
+    def rebuild_paths(cls):
+        """Recompute every path from parent links (backfill, or repair after bulk writes)."""
+        rows = list(cls.objects.values_list('pk', 'parent_id'))
+        children = {}
+        for pk, parent_id in rows:
+            children.setdefault(parent_id, []).append(pk)
+
+        paths = {}
+        frontier = [(pk, f"/{pk}/") for pk in children.get(None, [])]
+        while frontier:
+            pk, path = frontier.pop()
+            paths[pk] = path
+            frontier.extend((child, f"{path}{child}/") for child in children.get(pk, []))
+
+        updated = [cls(pk=pk, path=path, depth=path.count('/') - 2) for pk, path in paths.items()]
+        cls.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+        return len(updated)
 
-    def __str__(self):
-        return self.get_full_path()
-    
     def __str__(self): 
         return self.name  
 
@@ -90,20 +184,68 @@ class Product(models.Model):
         blank=True
     )
 
+    # Stored sale state, synced on save and flipped at sale_start/sale_end by products.sales
+    is_sale_live = models.BooleanField(default=False, editable=False)
+    effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        editable=False,
+        db_index=True
+    )
+
+    # Weighted name/tags/categories/description vector, kept up to date by products.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            # Trigram index for typo-tolerant name matches (requires the pg_trgm extension)
+            GinIndex(fields=['name'], name='product_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Lets the sale scheduler find sales that are due to start or end
+            models.Index(
+                fields=['sale_start', 'sale_end'],
+                name='product_sale_window_idx',
+                condition=models.Q(is_on_sale=True),
+            ),
+        ]
+
     def __str__(self): 
         return self.name
-    def is_sale_active(self):
-        if not self.is_on_sale:
-            return False
 
-        now = timezone.now()
-        if self.sale_start and self.sale_end:
-            return self.sale_start <= now <= self.sale_end
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets product_saved tell an activation change from any other save
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
 
-        return False
+    def save(self, *args, **kwargs):
+        self.sync_sale_state()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'is_sale_live', 'effective_price'}
+        super().save(*args, **kwargs)
+
+    def sale_live_at(self, now):
+        return bool(
+            self.is_on_sale
+            and self.sale_start and self.sale_end
+            and self.sale_start <= now <= self.sale_end
+        )
+
+    def sync_sale_state(self, now=None):
+        """Recompute is_sale_live and effective_price from the sale window."""
+        self.is_sale_live = self.sale_live_at(now or timezone.now())
+        self.effective_price = self.sale_price if self.is_sale_live and self.sale_price else self.base_price
+
+    def is_sale_active(self):
+        # Stored flag, kept in step with the clock by the sale scheduler; a sale
+        # past its end is over even if the sweep hasn't flipped it yet
+        return self.is_sale_live and not (self.sale_end and self.sale_end <= timezone.now())
 
 
     def get_display_price(self):
@@ -111,6 +253,53 @@ class Product(models.Model):
             return self.sale_price
         return self.base_price
 
+class ProductCard(models.Model):
+    """
+    Precomputed list-card payload for a product.
+    Rebuilt by products.cards whenever the product or anything it embeds changes,
+    so the catalog list endpoints can skip serializer assembly entirely.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="card"
+    )
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Card for {self.product_id}"
+
+class RelatedProduct(models.Model):
+    """
+    Precomputed "you may also like" neighbours of a product, best first.
+    Maintained by products.related: scored by tag Jaccard similarity, with
+    shared categories breaking ties.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="neighbours"
+    )
+    related = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="+"
+    )
+    score = models.FloatField()
+    shared_categories = models.PositiveSmallIntegerField(default=0)
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='related_product_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score:.2f})"
+
 class ProductImage(models.Model):
     product = models.ForeignKey(
         Product, 
@@ -138,6 +327,11 @@ class AttributeValue(models.Model):
     attribute = models.ForeignKey(Attribute, related_name='values', on_delete=models.CASCADE)
     value = models.CharField(max_length=50)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attribute', 'value'], name='attribute_value_uniq'),
+        ]
+
     def __str__(self):
         return f"{self.attribute.name}: {self.value}"
 
@@ -145,8 +339,13 @@ class ProductVariant(models.Model):
     """Links products to specific attribute combinations"""
     product = models.ForeignKey(Product, related_name='variants', on_delete=models.CASCADE)
     attributes = models.ManyToManyField(AttributeValue)
+    # Supplier/stock-keeping code; catalog imports match variants on it
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     price_override = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     stock_quantity = models.PositiveIntegerField(default=0)
+    # Checkout only holds stock for tracked variants; stock_quantity wasn't
+    # maintained before, so existing variants stay untracked until it is
+    track_stock = models.BooleanField(default=False)
 
     def __str__(self):
         attrs = ", ".join([str(v) for v in self.attributes.all()])
@@ -0,0 +1,108 @@
+"""
+Related-products neighbour table.
+
+RelatedProductsView used to run a tag-overlap Count ordered by '?' (plus an
+exists() and a category fallback) on every product page. Neighbours only
+change when tags, categories or the active flag change, so a background job
+computes the top NEIGHBOUR_COUNT for each product into RelatedProduct and the
+view becomes a single indexed lookup.
+
+Scoring: Jaccard similarity of tag sets, ties broken by the number of shared
+categories. Products with no tag overlap but a shared category still qualify
+(score 0), which keeps the old category fallback.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from .models import Product, RelatedProduct
+
+NEIGHBOUR_COUNT = 24
+
+
+def _load_links(through, field, **filters):
+    """{product_id: set(ids)} and {id: set(product_ids)} for a product m2m."""
+    by_product, by_value = {}, {}
+    for product_id, value in through.objects.filter(**filters).values_list('product_id', field):
+        by_product.setdefault(product_id, set()).add(value)
+        by_value.setdefault(value, set()).add(product_id)
+    return by_product, by_value
+
+
+def affected_products(product_ids):
+    """
+    Products whose neighbour lists may change when these products change:
+    the products themselves, anything currently listing them, and anything
+    sharing a tag or category with them.
+    """
+    ids = set(product_ids)
+    ids.update(RelatedProduct.objects.filter(related_id__in=product_ids).values_list('product_id', flat=True))
+    for through, field in ((Product.tags.through, 'tag_id'), (Product.categories.through, 'category_id')):
+        values = through.objects.filter(product_id__in=product_ids).values(field)
+        ids.update(through.objects.filter(**{f'{field}__in': values}).values_list('product_id', flat=True))
+    return ids
+
+
+def compute_neighbours(product_id, tags, categories, tag_index, category_index, active_ids, limit=NEIGHBOUR_COUNT):
+    """Top `limit` (related_id, score, shared_categories) for one product, best first."""
+    own_tags = tags.get(product_id, set())
+    own_categories = categories.get(product_id, set())
+
+    shared_tags = Counter()
+    for tag in own_tags:
+        shared_tags.update(tag_index[tag])
+    shared_categories = Counter()
+    for category in own_categories:
+        shared_categories.update(category_index[category])
+
+    scored = []
+    for other in (shared_tags.keys() | shared_categories.keys()):
+        if other == product_id or other not in active_ids:
+            continue
+        common = shared_tags[other]
+        union = len(own_tags) + len(tags.get(other, ())) - common
+        score = common / union if union else 0.0
+        scored.append((other, score, shared_categories[other]))
+
+    scored.sort(key=lambda row: (-row[1], -row[2], row[0]))
+    return scored[:limit]
+
+
+def refresh_related_products(product_ids=None):
+    """
+    Recompute neighbour lists for the given products (all when None).
+    Returns the number of products refreshed.
+    """
+    active_ids = set(Product.objects.filter(is_active=True).values_list('pk', flat=True))
+    if product_ids is None:
+        targets = active_ids
+        tags, tag_index = _load_links(Product.tags.through, 'tag_id')
+        categories, category_index = _load_links(Product.categories.through, 'category_id')
+    else:
+        # Only the links scoring these products needs: every category link of
+        # their categories, and the full tag sets (Jaccard denominators) of
+        # every product sharing a tag with them
+        targets = set(product_ids)
+        tags_through, categories_through = Product.tags.through, Product.categories.through
+        own_tags = tags_through.objects.filter(product_id__in=targets).values('tag_id')
+        own_categories = categories_through.objects.filter(product_id__in=targets).values('category_id')
+        candidates = tags_through.objects.filter(tag_id__in=own_tags).values('product_id')
+        tags, tag_index = _load_links(tags_through, 'tag_id', product_id__in=candidates)
+        categories, category_index = _load_links(categories_through, 'category_id', category_id__in=own_categories)
+
+    rows = []
+    for product_id in targets & active_ids:
+        neighbours = compute_neighbours(product_id, tags, categories, tag_index, category_index, active_ids)
+        rows.extend(
+            RelatedProduct(product_id=product_id, related_id=other, score=score,
+                           shared_categories=shared, rank=rank)
+            for rank, (other, score, shared) in enumerate(neighbours)
+        )
+
+    with transaction.atomic():
+        stale = RelatedProduct.objects.all()
+        if product_ids is not None:
+            stale = stale.filter(product_id__in=targets)
+        stale.delete()
+        RelatedProduct.objects.bulk_create(rows, batch_size=1000)
+    return len(targets)
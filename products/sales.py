@@ -0,0 +1,81 @@
+"""
+Sale scheduler.
+
+Whether a sale is live used to be worked out with timezone.now() several
+times per product per serialization, and price filters only saw base_price.
+Product now stores is_sale_live and effective_price (what the customer pays),
+synced on save; this module flips them when a sale window opens or closes:
+
+- sync_sale_states() runs every minute from beat and fixes every row whose
+  stored state disagrees with the clock or whose effective_price has drifted
+  (e.g. prices changed with queryset.update(), which skips save()).
+- Product.is_sale_active() also treats a sale past its sale_end as over, so
+  reads are right in the gap before the next sweep.
+- schedule_sale_transitions() queues a one-off sync at a product's
+  sale_start/sale_end when that is close, so flips land on time.
+"""
+from datetime import timedelta
+
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+from .models import Product
+
+# Celery ETAs further out than this are left to the periodic sweep (long ETAs
+# get redelivered by the Redis broker after its visibility timeout)
+ETA_HORIZON = timedelta(hours=1)
+
+
+def _live(now):
+    return Q(is_on_sale=True, sale_start__lte=now, sale_end__gte=now)
+
+
+def _discounted(now):
+    # Rows whose effective_price should be sale_price rather than base_price
+    return _live(now) & Q(sale_price__gt=0)
+
+
+def sync_sale_states(now=None):
+    """
+    Bring is_sale_live/effective_price in line with the clock for every product
+    that is out of step. Returns the ids that changed.
+    """
+    now = now or timezone.now()
+    live, discounted = _live(now), _discounted(now)
+    stale = Product.objects.filter(
+        (live & Q(is_sale_live=False))
+        | (~live & Q(is_sale_live=True))
+        | (discounted & ~Q(effective_price=F('sale_price')))
+        | (~discounted & ~Q(effective_price=F('base_price')))
+        | Q(effective_price__isnull=True)  # rows saved before the column existed
+    )
+    product_ids = list(stale.values_list('pk', flat=True))
+    if product_ids:
+        recompute_sale_states(product_ids, now)
+    return product_ids
+
+
+def recompute_sale_states(product_ids, now=None):
+    """Recompute is_sale_live/effective_price for these rows, e.g. after a bulk upsert."""
+    now = now or timezone.now()
+    Product.objects.filter(pk__in=product_ids).update(
+        is_sale_live=Case(When(_live(now), then=True), default=False),
+        effective_price=Case(
+            When(_discounted(now), then=F('sale_price')),
+            default=F('base_price'),
+        ),
+    )
+
+
+def schedule_sale_transitions(product, now=None):
+    """Queue a sync at the product's next sale boundary if it falls within ETA_HORIZON."""
+    from lensra.core.tasks.products import sync_product_sales
+
+    if not (product.is_on_sale and product.sale_start and product.sale_end):
+        return
+
+    now = now or timezone.now()
+    # sale_end is inclusive, so the sale is over just after it
+    for boundary in (product.sale_start, product.sale_end + timedelta(seconds=1)):
+        if now < boundary <= now + ETA_HORIZON:
+            sync_product_sales.apply_async(eta=boundary)
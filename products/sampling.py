@@ -0,0 +1,102 @@
+"""
+Random product sampling without ORDER BY RANDOM().
+
+The homepage lists and the random recommendation used to sort (or load) the
+whole matching catalog on every request. Instead we keep the ids of each
+common filter set ("pool") in the shared cache, draw random ids from it in
+Python, and hydrate only the ids that were picked.
+
+Pools are rebuilt with one index-only id query when a product's flags change
+(see products.signals) or when they expire, and each process memoizes them
+briefly so most requests cost a single cache read for the version.
+"""
+import random
+import time
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Product
+
+POOLS = {
+    'featured-trending': Q(is_active=True) & (Q(is_featured=True) | Q(is_trending=True)),
+    'customizable': Q(is_active=True, is_customizable=True),
+    'customizable-featured': Q(is_active=True, is_customizable=True, is_featured=True),
+}
+
+VERSION_KEY = 'products:pools:version'
+POOL_KEY = 'products:pools:{name}:{version}'
+POOL_TTL = 60 * 10
+LOCAL_TTL = 30
+
+_local = {}  # name -> (version, expires_at, ids)
+
+
+def _current_version():
+    cache.add(VERSION_KEY, 0, timeout=None)
+    return cache.get(VERSION_KEY) or 0
+
+
+def get_pool(name):
+    """Ids of the products matching POOLS[name], as a list."""
+    version = _current_version()
+    memo = _local.get(name)
+    if memo and memo[0] == version and memo[1] > time.monotonic():
+        return memo[2]
+
+    key = POOL_KEY.format(name=name, version=version)
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(Product.objects.filter(POOLS[name]).order_by().values_list('pk', flat=True))
+        cache.set(key, ids, POOL_TTL)
+
+    _local[name] = (version, time.monotonic() + LOCAL_TTL, ids)
+    return ids
+
+
+def invalidate_pools():
+    """Drop every pool; they are rebuilt on next use."""
+    _current_version()
+    cache.incr(VERSION_KEY)
+
+
+class RandomSample:
+    """
+    Sequence over `ids` in random order that only hydrates the slice asked
+    for, so Django's Paginator can page through it. Each slice is a fresh
+    draw, like ORDER BY RANDOM() was for each request.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(len(self.ids))
+        picked = random.sample(self.ids, max(stop - start, 0))
+        by_id = {obj.pk: obj for obj in self.queryset.filter(pk__in=picked)}
+        return [by_id[pk] for pk in picked if pk in by_id]
+
+
+def sample_pool(name, queryset):
+    """RandomSample over a pool, hydrating through `queryset` (e.g. with select_related)."""
+    return RandomSample(get_pool(name), queryset)
+
+
+def random_object(pool_names, queryset, attempts=3):
+    """
+    One random object from the first non-empty pool, or None. Retries a few
+    ids in case a product left the pool since it was cached.
+    """
+    for name in pool_names:
+        ids = get_pool(name)
+        for pk in random.sample(ids, min(attempts, len(ids))):
+            obj = queryset.filter(pk=pk).first()
+            if obj is not None:
+                return obj
+    return None
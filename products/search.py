@@ -0,0 +1,83 @@
+"""
+PostgreSQL product search.
+
+`?search=` used to become `name ILIKE '%q%'`, which can't use an index and
+ignores descriptions, tags and categories. Each product now keeps a weighted
+tsvector (name > tags/categories > description) in a GIN index, and names
+also carry a trigram GIN index so typos still match (word similarity,
+so a short query can match one word of a longer name). Results are ranked by
+relevance.
+
+On other database backends the filter falls back to DRF's SearchFilter.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .models import Product
+
+SEARCH_CONFIG = 'english'
+
+
+def _names_of(through, field):
+    """Space-joined names of a product's tags/categories, as a correlated subquery."""
+    return Subquery(
+        through.objects
+        .filter(product_id=OuterRef('pk'))
+        .values('product_id')
+        .annotate(names=StringAgg(f'{field}__name', delimiter=' '))
+        .values('names')
+    )
+
+
+def product_search_vector():
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_names_of(Product.tags.through, 'tag'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_names_of(Product.categories.through, 'category'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(product_ids=None):
+    """Recompute search_vector for the given products (all when None) in one UPDATE."""
+    if connection.vendor != 'postgresql':
+        return 0
+
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return products.update(search_vector=product_search_vector())
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter on product querysets: same `?search=`
+    parameter, but matched against search_vector with a trigram fallback on
+    name, and ranked by relevance.
+
+    Place it after the ordering filter: relevance leads unless the client asked
+    for an explicit `?ordering=`, in which case it only breaks ties.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = ' '.join(self.get_search_terms(request))
+        if not terms or connection.vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+        queryset = queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            name_similarity=TrigramWordSimilarity(terms, 'name'),
+        ).filter(
+            Q(search_vector=query) | Q(name__trigram_word_similar=terms)
+        )
+
+        current_ordering = list(queryset.query.order_by)
+        relevance = ['-search_rank', '-name_similarity']
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset.order_by(*current_ordering, *relevance)
+        return queryset.order_by(*relevance, *current_ordering)
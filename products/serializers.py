@@ -4,6 +4,10 @@ from .models import (
     Category, Attribute, AttributeValue, ProductVariant, Tag
 )
 from designs.models import Design 
+from .categories import CategoryTree
+from .variants import build_variant_matrix
+from lensra.utils.images import image_url
+from lensra.utils.serializers import DynamicFieldsMixin
 from django.utils import timezone
 
 
@@ -13,7 +17,7 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ['name', 'slug']
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     parent_id = serializers.IntegerField(source='parent.id', read_only=True)  # Simple parent ID
     parent_name = serializers.CharField(source='parent.name', read_only=True, allow_null=True)  # Optional: Parent name
     subcategories = serializers.SerializerMethodField()  # For nested subcats (limited depth)
@@ -24,42 +28,39 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'slug', 'parent_id', 'parent_name', 'subcategories', 'full_path', 'image_url']
 
+    def get_category_tree(self):
+        # One query loads the whole tree; it is shared through the root serializer's context
+        tree = self.context.get('category_tree')
+        if tree is None:
+            tree = CategoryTree.load()
+            self.context['category_tree'] = tree
+        return tree
+
+    def to_representation(self, instance):
+        # Serve `parent` from the tree instead of a per-category lookup
+        parent_field = Category._meta.get_field('parent')
+        if instance.parent_id and not parent_field.is_cached(instance):
+            parent = self.get_category_tree().get(instance.parent_id)
+            if parent is not None:
+                parent_field.set_cached_value(instance, parent)
+        return super().to_representation(instance)
+
     def get_subcategories(self, obj):
         # Recursively serialize subcategories, but limit depth to avoid infinite loops
         # Use context to track depth if needed (e.g., pass {'depth': 1} in view)
         depth = self.context.get('depth', 0)
         if depth > 2:  # Arbitrary max depth to prevent deep nesting
             return []
-        subcategory_qs = obj.subcategories.all()
-        return CategorySerializer(subcategory_qs, many=True, context={'depth': depth + 1}).data
+        tree = self.get_category_tree()
+        subcategories = tree.children_of(obj)
+        return CategorySerializer(subcategories, many=True, context={'depth': depth + 1, 'category_tree': tree}).data
     
     def get_image_url(self, obj):
-        if obj.image:
-            url = obj.image.url
-            
-            # Add Cloudinary transformations for optimization
-            # This works if you're using CloudinaryField
-            if hasattr(obj.image, 'build_url'):
-                url = obj.image.build_url(
-                    quality='auto',           # Automatic quality adjustment
-                    fetch_format='auto',      # Automatic format (WebP for supported browsers)
-                    width=800,                # Resize to appropriate width
-                    crop='limit',             # Don't upscale, only downscale
-                    flags='progressive'       # Progressive JPEG loading
-                )
-            
-            if url.startswith('http://'):
-                url = 'https://' + url[7:]
-            return url
+        return image_url(obj.image, preset='card')
 
     def get_full_path(self, obj):
         # Build a breadcrumb-style path: "Grandparent > Parent > Name"
-        path = []
-        current = obj
-        while current:
-            path.append(current.name)
-            current = current.parent
-        return ' > '.join(reversed(path)) if path else obj.name
+        return self.get_category_tree().full_path(obj, separator=' > ')
 
 # --- NEW IMAGE SERIALIZER ---
 
@@ -71,24 +72,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image_url', 'alt_text']
 
     def get_image_url(self, obj):
-        if obj.image:
-            url = obj.image.url
-            
-            # Add Cloudinary transformations for optimization
-            # This works if you're using CloudinaryField
-            if hasattr(obj.image, 'build_url'):
-                url = obj.image.build_url(
-                    quality='auto',           # Automatic quality adjustment
-                    fetch_format='auto',      # Automatic format (WebP for supported browsers)
-                    width=800,                # Resize to appropriate width
-                    crop='limit',             # Don't upscale, only downscale
-                    flags='progressive'       # Progressive JPEG loading
-                )
-            
-            if url.startswith('http://'):
-                url = 'https://' + url[7:]
-            return url
-        return None
+        return image_url(obj.image, preset='detail')
 
 
 # --- ATTRIBUTE SERIALIZERS ---
@@ -100,12 +84,12 @@ class AttributeValueSerializer(serializers.ModelSerializer):
         model = AttributeValue
         fields = ['id', 'attribute_name', 'value']
 
-class ProductVariantSerializer(serializers.ModelSerializer):
+class ProductVariantSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     attributes = AttributeValueSerializer(many=True, read_only=True)
 
     class Meta:
         model = ProductVariant
-        fields = ['id', 'attributes', 'price_override', 'stock_quantity']
+        fields = ['id', 'sku', 'attributes', 'price_override', 'stock_quantity']
 
 # --- PRODUCT SERIALIZERS ---
 
@@ -114,7 +98,18 @@ class PrintableAreaSerializer(serializers.ModelSerializer):
         model = PrintableArea
         fields = ['id', 'name', 'x', 'y', 'width', 'height']
 
-class ProductSerializer(serializers.ModelSerializer):
+# Relations each product field reads, for DynamicFieldsMixin.get_prefetch_lookups
+PRODUCT_PREFETCH_MAP = {
+    'printable_areas': ['printable_areas'],
+    'variants': ['variants__attributes__attribute'],
+    'gallery': ['gallery'],
+    'categories': ['categories'],
+    'category_path': ['categories'],
+    'tags': ['tags'],
+}
+
+
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     printable_areas = PrintableAreaSerializer(many=True, read_only=True)
     variants = ProductVariantSerializer(many=True, read_only=True)
     gallery = ProductImageSerializer(many=True, read_only=True)
@@ -139,31 +134,36 @@ class ProductSerializer(serializers.ModelSerializer):
             'is_on_sale', 'display_price', 'original_price', 'sale_label', 'sale_ends_in',
         ]
         read_only_fields = ['id', 'is_trending', 'is_featured', 'is_active', 'is_customizable', 'tags', 'message']
+        prefetch_map = PRODUCT_PREFETCH_MAP
+
+    def wants_variant_matrix(self):
+        # Single-product responses only: the matrix costs one query per product
+        request = self.context.get('request')
+        return (
+            self.parent is None
+            and request is not None
+            and request.query_params.get('variant_format') == 'matrix'
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # ?variant_format=matrix swaps nested variants for the compact matrix
+        if 'variants' in fields and self.wants_variant_matrix():
+            del fields['variants']
+            fields['variant_matrix'] = serializers.SerializerMethodField()
+        return fields
+
+    def get_variant_matrix(self, obj):
+        return build_variant_matrix(obj.pk)
 
     def get_image_url(self, obj):
-        if obj.image:
-            url = obj.image.url
-            
-            # Add Cloudinary transformations for optimization
-            # This works if you're using CloudinaryField
-            if hasattr(obj.image, 'build_url'):
-                url = obj.image.build_url(
-                    quality='auto',           # Automatic quality adjustment
-                    fetch_format='auto',      # Automatic format (WebP for supported browsers)
-                    width=800,                # Resize to appropriate width
-                    crop='limit',             # Don't upscale, only downscale
-                    flags='progressive'       # Progressive JPEG loading
-                )
-            
-            if url.startswith('http://'):
-                url = 'https://' + url[7:]
-            return url
-        return None
+        return image_url(obj.image, preset='detail')
 
     def get_category_path(self, obj):
-        if obj.categories.exists():
-            primary_cat = obj.categories.first()
-            return CategorySerializer(primary_cat).data.get('full_path')  # Use the new full_path
+        categories = list(obj.categories.all())  # uses the prefetch when present
+        if categories:
+            primary_cat = min(categories, key=lambda category: category.pk)
+            return CategorySerializer(primary_cat, context=self.context).get_full_path(primary_cat)
         return None
 
 
@@ -191,13 +191,13 @@ class ProductSerializer(serializers.ModelSerializer):
     def get_sale_ends_in(self, obj):
         if obj.is_sale_active() and obj.sale_end:
             remaining = obj.sale_end - timezone.now()
-            return int(remaining.total_seconds())
+            return max(int(remaining.total_seconds()), 0)
         return None
 
 
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     variants = ProductVariantSerializer(many=True, read_only=True)
     image_url = serializers.SerializerMethodField()
     categories = CategorySerializer(many=True, read_only=True)  # Optional: Full category details
@@ -218,31 +218,16 @@ class ProductListSerializer(serializers.ModelSerializer):
             'is_trending', 'variants', 'categories', 'category_path', 'tags', 'message',
             'is_on_sale', 'display_price', 'original_price', 'sale_label', 'sale_ends_in',
         ]
+        prefetch_map = PRODUCT_PREFETCH_MAP
 
     def get_image_url(self, obj):
-        if obj.image:
-            url = obj.image.url
-            
-            # Add Cloudinary transformations for optimization
-            # This works if you're using CloudinaryField
-            if hasattr(obj.image, 'build_url'):
-                url = obj.image.build_url(
-                    quality='auto',           # Automatic quality adjustment
-                    fetch_format='auto',      # Automatic format (WebP for supported browsers)
-                    width=800,                # Resize to appropriate width
-                    crop='limit',             # Don't upscale, only downscale
-                    flags='progressive'       # Progressive JPEG loading
-                )
-            
-            if url.startswith('http://'):
-                url = 'https://' + url[7:]
-            return url
-        return None
+        return image_url(obj.image, preset='card')
 
     def get_category_path(self, obj):
-        if obj.categories.exists():
-            primary_cat = obj.categories.first()
-            return CategorySerializer(primary_cat).data.get('full_path')  # Use the new full_path
+        categories = list(obj.categories.all())  # uses the prefetch when present
+        if categories:
+            primary_cat = min(categories, key=lambda category: category.pk)
+            return CategorySerializer(primary_cat, context=self.context).get_full_path(primary_cat)
         return None
 
 
@@ -269,7 +254,7 @@ class ProductListSerializer(serializers.ModelSerializer):
     def get_sale_ends_in(self, obj):
         if obj.is_sale_active() and obj.sale_end:
             remaining = obj.sale_end - timezone.now()
-            return int(remaining.total_seconds())
+            return max(int(remaining.total_seconds()), 0)
         return None
 
 class DesignPlacementSerializer(serializers.ModelSerializer):
@@ -307,42 +292,8 @@ class DesignPlacementSerializer(serializers.ModelSerializer):
 
 
     def get_product_image_url(self, obj):
-        if obj.product.image:
-            url = obj.product.image.url
-            
-            # Add Cloudinary transformations for optimization
-            # This works if you're using CloudinaryField
-            if hasattr(obj.product.image, 'build_url'):
-                url = obj.product.image.build_url(
-                    quality='auto',           # Automatic quality adjustment
-                    fetch_format='auto',      # Automatic format (WebP for supported browsers)
-                    width=800,                # Resize to appropriate width
-                    crop='limit',             # Don't upscale, only downscale
-                    flags='progressive'       # Progressive JPEG loading
-                )
-            
-            if url.startswith('http://'):
-                url = 'https://' + url[7:]
-            return url
-        return None
+        return image_url(obj.product.image, preset='card')
 
 
     def get_design_preview_url(self, obj):
-        if obj.design.preview_image:
-            url = obj.design.preview_image.url
-            
-            # Add Cloudinary transformations for optimization
-            # This works if you're using CloudinaryField
-            if hasattr(obj.design.preview_image, 'build_url'):
-                url = obj.design.preview_image.build_url(
-                    quality='auto',           # Automatic quality adjustment
-                    fetch_format='auto',      # Automatic format (WebP for supported browsers)
-                    width=800,                # Resize to appropriate width
-                    crop='limit',             # Don't upscale, only downscale
-                    flags='progressive'       # Progressive JPEG loading
-                )
-            
-            if url.startswith('http://'):
-                url = 'https://' + url[7:]
-            return url
-        return None
\ No newline at end of file
+        return image_url(obj.design.preview_image, preset='detail')
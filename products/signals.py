@@ -0,0 +1,158 @@
+# products/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from products.models import Product, ProductVariant, ProductImage, Tag, Category, RelatedProduct
+from products import sales, sampling, tag_index
+from lensra.utils.conditional import bump_versions
+from lensra.core.tasks.products import refresh_product_read_models, refresh_related_products
+
+
+def products_changed(product_ids, touch=True):
+    """
+    Schedule a read-model refresh for these products once the current transaction commits.
+    `touch` bumps updated_at so HTTP validators (ETag/Last-Modified) change with
+    anything embedded in the product payload.
+    """
+    product_ids = sorted({pk for pk in product_ids if pk is not None})
+    if not product_ids:
+        return
+    if touch:
+        transaction.on_commit(
+            lambda: Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+        )
+    transaction.on_commit(lambda: tag_index.mark_products_changed(product_ids))
+    transaction.on_commit(lambda: refresh_product_read_models.delay(product_ids))
+    bump_versions('catalog')
+
+
+def related_products_changed(product_ids):
+    """Schedule a neighbour-table refresh for products whose tags, categories or status changed."""
+    product_ids = sorted({pk for pk in product_ids if pk is not None})
+    if not product_ids:
+        return
+    transaction.on_commit(lambda: refresh_related_products.delay(product_ids))
+
+
+def _category_family_ids(category):
+    """
+    Categories whose serialized form embeds this one: its ancestors (via
+    subcategories) and its descendants (via parent_name / full_path).
+    """
+    ancestor_ids = category.ancestor_ids
+    if not category.path and category.parent_id:
+        # Just created: the path is written after the insert, so go by the parent's
+        parent_path = Category.objects.filter(pk=category.parent_id).values_list('path', flat=True).first()
+        ancestor_ids = [int(pk) for pk in (parent_path or '').strip('/').split('/') if pk] or [category.parent_id]
+    ids = set(ancestor_ids) | set(getattr(category, '_previous_ancestor_ids', ())) | {category.pk}
+    if category.path:
+        ids.update(category.get_descendants().values_list('pk', flat=True))
+    return ids
+
+
+def _products_in_categories(category_ids):
+    return Product.categories.through.objects.filter(
+        category_id__in=category_ids
+    ).values_list('product_id', flat=True)
+
+
+def _active_changed(instance, created, update_fields):
+    """Whether this save can change neighbour lists (tags and categories go through m2m_changed)."""
+    if update_fields is not None and 'is_active' not in update_fields:
+        return False
+    loaded = getattr(instance, '_loaded_is_active', None)
+    instance._loaded_is_active = instance.is_active
+    return created or loaded is None or loaded != instance.is_active
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, update_fields=None, **kwargs):
+    products_changed([instance.pk], touch=False)  # auto_now already did
+    if _active_changed(instance, created, update_fields):
+        related_products_changed([instance.pk])
+    transaction.on_commit(sampling.invalidate_pools)
+    transaction.on_commit(lambda: sales.schedule_sale_transitions(instance))
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    product_id = instance.pk
+    transaction.on_commit(sampling.invalidate_pools)
+    # Drops it from every process's tag index (apply() won't find the row to reload)
+    transaction.on_commit(lambda: tag_index.mark_products_changed([product_id]))
+    bump_versions('catalog')
+    # Products listing this one lose a neighbour; refill their lists
+    related_products_changed(list(
+        RelatedProduct.objects.filter(related=instance).values_list('product_id', flat=True)
+    ))
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+@receiver(m2m_changed, sender=Product.categories.through)
+def product_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            products_changed([instance.pk])
+            related_products_changed([instance.pk])
+        return
+
+    # Reverse side: instance is a Tag/Category and pk_set holds product ids
+    if action == 'pre_clear':
+        instance._cleared_product_ids = list(instance.products.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        cleared = getattr(instance, '_cleared_product_ids', [])
+        products_changed(cleared)
+        related_products_changed(cleared)
+    elif action in ('post_add', 'post_remove'):
+        products_changed(pk_set or [])
+        related_products_changed(pk_set or [])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_child_changed(sender, instance, **kwargs):
+    products_changed([instance.product_id])
+
+
+@receiver(m2m_changed, sender=ProductVariant.attributes.through)
+def variant_attributes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        products_changed([instance.product_id])
+    elif pk_set:
+        products_changed(
+            ProductVariant.objects.filter(pk__in=pk_set).values_list('product_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    bump_versions('tags')
+    if not created:
+        products_changed(instance.products.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    bump_versions('tags')
+    # Capture before the m2m rows are removed by the cascade
+    product_ids = list(instance.products.values_list('pk', flat=True))
+    products_changed(product_ids)
+    related_products_changed(product_ids)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    bump_versions('categories')
+    products_changed(_products_in_categories(_category_family_ids(instance)))
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    bump_versions('categories')
+    products_changed(list(_products_in_categories(_category_family_ids(instance))))
+    related_products_changed(list(_products_in_categories([instance.pk])))
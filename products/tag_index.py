@@ -0,0 +1,138 @@
+"""
+In-memory tag index for the gift finder.
+
+GiftRecommendationsView used to join tags and run a filtered Count with
+DISTINCT and ORDER BY for every quiz submission. Each process now keeps an
+inverted index of tag slug -> sorted product ids, plus the price and featured
+flag of every active product, and scores relevance by counting postings.
+
+Processes stay in step through a version counter in the shared cache: every
+change bumps the version and records which products changed under that
+version, so a stale process only reloads those products. If it has fallen too
+far behind, or the change list has expired, it rebuilds from scratch.
+"""
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+
+from .models import Product
+
+VERSION_KEY = 'products:tag-index:version'
+CHANGES_KEY = 'products:tag-index:changes:{}'
+CHANGES_TTL = 60 * 60
+MAX_REPLAY = 200  # beyond this many versions behind, rebuilding is cheaper
+
+
+class TagIndex:
+    def __init__(self, version=0):
+        self.version = version
+        self.postings = {}      # tag slug -> array of product ids, sorted
+        self.product_tags = {}  # product id -> set of tag slugs
+        self.price = {}         # product id -> effective_price (what the customer pays)
+        self.featured = {}      # product id -> is_featured
+
+    @classmethod
+    def build(cls, version=0):
+        index = cls(version)
+        index._load(Product.objects.all())
+        return index
+
+    def _load(self, products):
+        """(Re)load the given products: two queries regardless of how many."""
+        rows = list(
+            products.filter(is_active=True)
+            .values_list('pk', Coalesce('effective_price', 'base_price'), 'is_featured')
+        )
+        links = Product.tags.through.objects.filter(
+            product_id__in=[pk for pk, _, _ in rows]
+        ).values_list('product_id', 'tag__slug')
+
+        for pk, price, featured in rows:
+            self.price[pk] = price
+            self.featured[pk] = featured
+            self.product_tags.setdefault(pk, set())
+        touched = set()
+        for pk, slug in links:
+            self.product_tags[pk].add(slug)
+            self.postings.setdefault(slug, array('q')).append(pk)
+            touched.add(slug)
+        # Postings were sorted before; Timsort restores order in ~linear time
+        for slug in touched:
+            self.postings[slug] = array('q', sorted(self.postings[slug]))
+
+    def _remove(self, pk):
+        for slug in self.product_tags.pop(pk, ()):
+            posting = self.postings[slug]
+            i = bisect_left(posting, pk)
+            if i < len(posting) and posting[i] == pk:
+                posting.pop(i)
+        self.price.pop(pk, None)
+        self.featured.pop(pk, None)
+
+    def apply(self, product_ids):
+        """Refresh just these products (changed tags, price, featured or active flags)."""
+        for pk in product_ids:
+            self._remove(pk)
+        self._load(Product.objects.filter(pk__in=product_ids))
+
+    def search(self, tag_slugs, price_filter=None, limit=10):
+        """
+        Product ids sharing at least one tag, best first: most shared tags,
+        then featured, then cheapest.
+        """
+        scores = Counter()
+        for slug in set(tag_slugs):
+            scores.update(self.postings.get(slug, ()))
+
+        candidates = [
+            pk for pk in scores
+            if price_filter is None or price_filter(self.price[pk])
+        ]
+        candidates.sort(key=lambda pk: (-scores[pk], not self.featured[pk], self.price[pk], pk))
+        return candidates[:limit]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _current_version():
+    cache.add(VERSION_KEY, 0, timeout=None)
+    return cache.get(VERSION_KEY) or 0
+
+
+def get_tag_index():
+    """This process's index, brought up to date with the shared version."""
+    global _index
+    version = _current_version()
+
+    with _lock:
+        if _index is not None and _index.version == version:
+            return _index
+
+        behind = version - _index.version if _index is not None else None
+        if behind is not None and 0 < behind <= MAX_REPLAY:
+            keys = [CHANGES_KEY.format(v) for v in range(_index.version + 1, version + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) == len(keys):
+                _index.apply({pk for ids in changes.values() for pk in ids})
+                _index.version = version
+                return _index
+
+        _index = TagIndex.build(version)
+        return _index
+
+
+def mark_products_changed(product_ids=None):
+    """
+    Tell every process these products changed. None forces a full rebuild
+    (e.g. after a tag rename or a bulk import).
+    """
+    _current_version()
+    version = cache.incr(VERSION_KEY)
+    if product_ids is not None:
+        cache.set(CHANGES_KEY.format(version), list(product_ids), CHANGES_TTL)
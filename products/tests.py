@@ -1,7 +1,10 @@
+from unittest import skipUnless
+from django.db import connection
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
 from .models import Product, PrintableArea
+from .tag_index import mark_products_changed
 
 
 class ProductModelTest(TestCase):
@@ -59,3 +62,616 @@ class ProductAPITest(TestCase):
         res = self.client.get(f'/api/products/{product.id}/')
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['name'], 'T-Shirt')
+
+
+class ProductCardTest(TestCase):
+    """Test the precomputed product card read model."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.product = Product.objects.create(
+            name='Mug',
+            slug='mug',
+            base_price=2500.00,
+        )
+
+    def test_list_builds_missing_cards(self):
+        """Listing products builds and stores cards for products without one."""
+        from .models import ProductCard
+
+        res = self.client.get('/api/products/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['slug'], 'mug')
+        self.assertTrue(ProductCard.objects.filter(product=self.product).exists())
+
+    def test_list_reads_stored_card(self):
+        """Stored card payloads are served as-is with live sale fields."""
+        from .cards import refresh_product_cards
+
+        refresh_product_cards([self.product.pk])
+        self.product.card.payload['name'] = 'Cached Mug'
+        self.product.card.save()
+
+        res = self.client.get('/api/products/')
+        self.assertEqual(res.data['results'][0]['name'], 'Cached Mug')
+        self.assertFalse(res.data['results'][0]['is_on_sale'])
+
+
+class ProductViewCountTest(TestCase):
+    """Test the write-behind view counter."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.popular = Product.objects.create(name='Mug', slug='mug', base_price=2500.00, view_count=5)
+        self.rising = Product.objects.create(name='Frame', slug='frame', base_price=4000.00, view_count=1)
+
+    def test_detail_view_counts_without_redis(self):
+        """Without a Redis cache the view is written straight to the row."""
+        res = self.client.get('/api/products/mug/')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.popular.refresh_from_db()
+        self.assertEqual(self.popular.view_count, 6)
+
+    def test_ordering_merges_pending_views(self):
+        """Pending buffered views are merged into -view_count ordering."""
+        from unittest import mock
+
+        with mock.patch('products.view_counts.get_pending_view_counts', return_value={self.rising.pk: 10}):
+            res = self.client.get('/api/products/?ordering=-view_count')
+
+        self.assertEqual([p['slug'] for p in res.data['results']], ['frame', 'mug'])
+
+
+class CategoryTreeTest(TestCase):
+    """Test the materialized category path."""
+
+    def setUp(self):
+        from .models import Category
+
+        self.gifts = Category.objects.create(name='Gifts', slug='gifts')
+        self.for_her = Category.objects.create(name='For Her', slug='for-her', parent=self.gifts)
+        self.jewelry = Category.objects.create(name='Jewelry', slug='jewelry', parent=self.for_her)
+        self.home = Category.objects.create(name='Home', slug='home')
+
+    def test_paths_follow_parents(self):
+        """Paths and breadcrumbs are derived from the parent chain."""
+        self.assertEqual(self.jewelry.path, f'/{self.gifts.pk}/{self.for_her.pk}/{self.jewelry.pk}/')
+        self.assertEqual(self.jewelry.depth, 2)
+        self.assertEqual(self.jewelry.get_full_path(' > '), 'Gifts > For Her > Jewelry')
+
+    def test_move_reroots_subtree(self):
+        """Moving a category rewrites the paths of all its descendants."""
+        self.for_her.parent = self.home
+        self.for_her.save()
+        self.jewelry.refresh_from_db()
+        self.assertEqual(self.jewelry.path, f'/{self.home.pk}/{self.for_her.pk}/{self.jewelry.pk}/')
+        self.assertEqual(list(self.home.get_descendants()), [self.for_her, self.jewelry])
+
+    def test_move_refreshes_old_and_new_ancestors(self):
+        """Products under both the old and the new ancestors get their cards refreshed."""
+        from unittest import mock
+
+        lamp = Product.objects.create(name='Lamp', slug='lamp', base_price=9000.00)
+        lamp.categories.add(self.home)
+        mug = Product.objects.create(name='Mug', slug='mug', base_price=9000.00)
+        mug.categories.add(self.gifts)
+
+        with mock.patch('products.signals.products_changed') as changed:
+            self.for_her.parent = self.home
+            self.for_her.save()
+        refreshed = set(changed.call_args.args[0])
+        self.assertEqual(refreshed, {lamp.pk, mug.pk})
+
+    def test_cannot_move_under_descendant(self):
+        """A category cannot become its own ancestor."""
+        from django.core.exceptions import ValidationError
+
+        self.gifts.parent = self.jewelry
+        with self.assertRaises(ValidationError):
+            self.gifts.save()
+
+    def test_category_filter_includes_descendants(self):
+        """?category= matches products in any subcategory."""
+        ring = Product.objects.create(name='Ring', slug='ring', base_price=9000.00)
+        ring.categories.add(self.jewelry)
+        Product.objects.create(name='Lamp', slug='lamp', base_price=9000.00).categories.add(self.home)
+
+        res = APIClient().get('/api/products/?category=gifts')
+        self.assertEqual([p['slug'] for p in res.data['results']], ['ring'])
+
+
+class ProductSearchTest(TestCase):
+    """Test full-text product search."""
+
+    def setUp(self):
+        from .models import Tag
+        from .search import update_search_vectors
+
+        mug = Product.objects.create(name='Photo Mug', slug='photo-mug', base_price=2500.00)
+        mug.tags.add(Tag.objects.create(name='Anniversary', slug='anniversary'))
+        Product.objects.create(
+            name='Wooden Frame', slug='wooden-frame', base_price=4000.00,
+            description='A frame for your anniversary photo'
+        )
+        Product.objects.create(name='Scented Candle', slug='candle', base_price=3000.00)
+        update_search_vectors()
+
+    @skipUnless(connection.vendor == 'postgresql', 'relevance ranking needs PostgreSQL')
+    def test_search_ranks_name_and_tags_above_description(self):
+        """Tag matches outrank description matches."""
+        res = APIClient().get('/api/products/?search=anniversary')
+        self.assertEqual([p['slug'] for p in res.data['results']], ['photo-mug', 'wooden-frame'])
+
+    def test_search_tolerates_typos(self):
+        """Trigram fallback matches misspelled names."""
+        res = APIClient().get('/api/products/?search=candl')
+        self.assertEqual([p['slug'] for p in res.data['results']], ['candle'])
+
+
+class GiftRecommendationsTest(TestCase):
+    """Test the tag-index backed gift finder."""
+
+    def setUp(self):
+        from .models import Tag
+
+        self.her = Tag.objects.create(name='For Her', slug='for-her')
+        self.cozy = Tag.objects.create(name='Cozy', slug='cozy')
+        self.blanket = Product.objects.create(name='Blanket', slug='blanket', base_price=20000.00)
+        self.blanket.tags.add(self.her, self.cozy)
+        self.mug = Product.objects.create(name='Mug', slug='mug', base_price=5000.00, is_featured=True)
+        self.mug.tags.add(self.her)
+        Product.objects.create(name='Lamp', slug='lamp', base_price=8000.00)
+        mark_products_changed()  # rebuild from this test's data
+
+    def recommend(self, tags):
+        res = APIClient().get(f'/api/products/gift-finder/recommendations/?tags={tags}')
+        return [p['slug'] for p in res.data['results']]
+
+    def test_ranks_by_matching_tags_then_featured(self):
+        self.assertEqual(self.recommend('for-her,cozy'), ['blanket', 'mug'])
+        self.assertEqual(self.recommend('for-her,cozy,budget-low'), ['mug'])
+
+    def test_picks_up_changed_products(self):
+        self.assertEqual(self.recommend('cozy'), ['blanket'])
+        self.mug.tags.add(self.cozy)
+        mark_products_changed([self.mug.pk])
+        self.assertEqual(self.recommend('cozy'), ['mug', 'blanket'])
+
+    def test_deleted_products_leave_the_index(self):
+        from .tag_index import get_tag_index
+
+        blanket_pk = self.blanket.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blanket.delete()
+        self.assertNotIn(blanket_pk, get_tag_index().product_tags)
+        self.assertEqual(self.recommend('for-her'), ['mug'])
+
+
+class RelatedProductsTest(TestCase):
+    """Test the precomputed related-products table."""
+
+    def setUp(self):
+        from .models import Tag, Category
+
+        her, cozy, candle = (Tag.objects.create(name=n, slug=n) for n in ('her', 'cozy', 'candle'))
+        home = Category.objects.create(name='Home', slug='home')
+        self.blanket = Product.objects.create(name='Blanket', slug='blanket', base_price=20000.00)
+        self.blanket.tags.add(her, cozy)
+        throw = Product.objects.create(name='Throw', slug='throw', base_price=9000.00)
+        throw.tags.add(her, cozy)
+        mug = Product.objects.create(name='Mug', slug='mug', base_price=5000.00)
+        mug.tags.add(her, candle)
+        lamp = Product.objects.create(name='Lamp', slug='lamp', base_price=8000.00)
+        lamp.categories.add(home)
+        self.blanket.categories.add(home)
+        Product.objects.create(name='Pen', slug='pen', base_price=500.00)
+
+    def related(self, slug):
+        res = APIClient().get(f'/api/products/related/{slug}/')
+        return [p['slug'] for p in res.data['results']]
+
+    def test_neighbours_ranked_by_jaccard_then_category(self):
+        from .related import refresh_related_products
+
+        refresh_related_products()
+        self.assertEqual(self.related('blanket'), ['throw', 'mug', 'lamp'])
+
+    def test_partial_refresh_matches_full(self):
+        from .models import RelatedProduct
+        from .related import affected_products, refresh_related_products
+
+        refresh_related_products()
+        full = sorted(RelatedProduct.objects.values_list('product_id', 'related_id', 'score', 'shared_categories', 'rank'))
+        RelatedProduct.objects.all().delete()
+        refresh_related_products(affected_products([self.blanket.pk]))
+        partial = sorted(RelatedProduct.objects.values_list('product_id', 'related_id', 'score', 'shared_categories', 'rank'))
+        self.assertEqual(partial, full)
+
+    def test_only_activation_changes_refresh_neighbours(self):
+        from unittest import mock
+
+        blanket = Product.objects.get(pk=self.blanket.pk)
+        with mock.patch('products.signals.related_products_changed') as changed:
+            blanket.base_price = 18000
+            blanket.save()
+            blanket.save(update_fields=['base_price'])
+            self.assertFalse(changed.called)
+            blanket.is_active = False
+            blanket.save()
+            changed.assert_called_once_with([blanket.pk])
+
+    def test_falls_back_to_live_query(self):
+        self.assertEqual(self.related('blanket')[:2], ['throw', 'mug'])
+
+
+class ProductSamplingTest(TestCase):
+    """Test random sampling from cached id pools."""
+
+    def setUp(self):
+        from .sampling import invalidate_pools
+
+        for i in range(5):
+            Product.objects.create(name=f'Gift {i}', slug=f'gift-{i}', base_price=1000.00, is_featured=True)
+        Product.objects.create(name='Plain', slug='plain', base_price=1000.00)
+        invalidate_pools()
+
+    def test_featured_pages_are_random_draws_from_pool(self):
+        res = APIClient().get('/api/products/featured/')
+        self.assertEqual(res.data['count'], 5)
+        slugs = [p['slug'] for p in res.data['results']]
+        self.assertEqual(sorted(slugs), [f'gift-{i}' for i in range(5)])
+
+    def test_pool_follows_product_changes(self):
+        from .sampling import get_pool, invalidate_pools
+
+        self.assertEqual(len(get_pool('featured-trending')), 5)
+        Product.objects.filter(slug='plain').update(is_trending=True)
+        invalidate_pools()
+        self.assertEqual(len(get_pool('featured-trending')), 6)
+
+
+class ProductSaleScheduleTest(TestCase):
+    """Test stored sale state and effective_price."""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        now = timezone.now()
+        self.product = Product.objects.create(
+            name='Watch', slug='watch', base_price=30000.00, sale_price=12000.00,
+            is_on_sale=True, sale_start=now - timedelta(hours=1), sale_end=now + timedelta(hours=1)
+        )
+        Product.objects.create(name='Pen', slug='pen', base_price=14000.00)
+
+    def test_price_filter_uses_effective_price(self):
+        self.assertTrue(self.product.is_sale_active())
+        res = APIClient().get('/api/products/?max_price=13000')
+        self.assertEqual([p['slug'] for p in res.data['results']], ['watch'])
+
+    def test_sweep_ends_expired_sales(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .sales import sync_sale_states
+
+        self.assertEqual(sync_sale_states(), [])
+        self.assertEqual(sync_sale_states(timezone.now() + timedelta(hours=2)), [self.product.pk])
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.is_sale_active())
+        self.assertEqual(float(self.product.effective_price), 30000.00)
+
+    def test_ended_sale_reads_as_over_before_the_sweep(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .serializers import ProductListSerializer
+
+        Product.objects.filter(pk=self.product.pk).update(sale_end=timezone.now() - timedelta(minutes=1))
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.is_sale_live)  # not swept yet
+        self.assertFalse(self.product.is_sale_active())
+        self.assertIsNone(ProductListSerializer().get_sale_ends_in(self.product))
+        self.assertEqual(APIClient().get('/api/products/deals/').data['count'], 0)
+
+    def test_sweep_fixes_price_drift_from_bulk_updates(self):
+        from .sales import sync_sale_states
+
+        Product.objects.filter(pk=self.product.pk).update(sale_price=10000.00)
+        self.assertEqual(sync_sale_states(), [self.product.pk])
+        self.product.refresh_from_db()
+        self.assertEqual(float(self.product.effective_price), 10000.00)
+
+
+class ProductPaginationTest(TestCase):
+    """Test keyset and count-free pagination on the catalog list."""
+
+    def setUp(self):
+        for i in range(25):
+            Product.objects.create(name=f'Gift {i}', slug=f'gift-{i}', base_price=1000.00 + (i % 5), view_count=i % 3)
+
+    def test_cursor_pages_cover_everything_once(self):
+        client = APIClient()
+        res = client.get('/api/products/?pagination=cursor&ordering=base_price')
+        self.assertNotIn('count', res.data)
+        slugs = [p['slug'] for p in res.data['results']]
+        res = client.get(res.data['next'])
+        slugs += [p['slug'] for p in res.data['results']]
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(sorted(slugs), sorted(f'gift-{i}' for i in range(25)))
+
+    def test_cursor_pages_across_null_values(self):
+        # effective_price is NULL until backfilled; cursors must step over those rows
+        Product.objects.filter(slug__in=[f'gift-{i}' for i in range(0, 25, 3)]).update(effective_price=None)
+        client = APIClient()
+        for ordering in ('effective_price', '-effective_price'):
+            res = client.get(f'/api/products/?pagination=cursor&ordering={ordering}')
+            slugs = [p['slug'] for p in res.data['results']]
+            while res.data['next']:
+                res = client.get(res.data['next'])
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                slugs += [p['slug'] for p in res.data['results']]
+            self.assertEqual(sorted(slugs), sorted(f'gift-{i}' for i in range(25)))
+
+    def test_count_can_be_skipped(self):
+        res = APIClient().get('/api/products/?count=false&page=2')
+        self.assertNotIn('count', res.data)
+        self.assertEqual(len(res.data['results']), 5)
+        self.assertIsNone(res.data['next'])
+
+
+class ProductSparseFieldsTest(TestCase):
+    """Test ?fields= / ?expand= on the product serializers."""
+
+    def setUp(self):
+        self.product = Product.objects.create(name='Mug', slug='mug', base_price=2500.00)
+
+    def test_fields_trim_response_and_prefetches(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            res = APIClient().get('/api/products/mug/?fields=id,name,display_price')
+        self.assertEqual(set(res.data), {'id', 'name', 'display_price'})
+        self.assertEqual(len(queries), 3)  # ETag validators, product, buffered view count update
+
+    def test_nested_product_is_full_unless_trimmed(self):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from .serializers import ProductSerializer
+        from wishlists.serializers import WishlistItemSerializer
+
+        # Existing cart and wishlist clients keep the whole product
+        field = WishlistItemSerializer().fields['product']
+        self.assertEqual(set(field.fields), set(ProductSerializer().fields))
+
+        request = Request(APIRequestFactory().get('/', {'fields': 'id,product.name,product.category_path,product.variants'}))
+        field = WishlistItemSerializer(context={'request': request}).fields['product']
+        self.assertEqual(set(field.fields), {'name', 'category_path', 'variants'})
+        self.assertEqual(set(field.get_prefetch_lookups()), {'categories', 'variants__attributes__attribute'})
+
+
+class ConditionalGetTest(TestCase):
+    """Test ETag revalidation on catalog endpoints."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.product = Product.objects.create(name='Mug', slug='mug', base_price=2500.00)
+
+    def test_product_detail_revalidates_until_touched(self):
+        client = APIClient()
+        res = client.get('/api/products/mug/')
+        etag = res['ETag']
+        self.assertIn('public', res['Cache-Control'])
+        self.assertEqual(res['Surrogate-Key'], f'product-{self.product.pk}')
+
+        res = client.get('/api/products/mug/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.view_count, 2)  # 304s still count
+
+        self.product.save()
+        res = client.get('/api/products/mug/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+    def test_wildcard_revalidation_of_missing_product_is_404(self):
+        client = APIClient()
+        self.assertEqual(client.get('/api/products/nope/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        self.assertEqual(client.get('/api/products/mug/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+
+    def test_tag_list_version_bumps_on_change(self):
+        from .models import Tag
+
+        client = APIClient()
+        etag = client.get('/api/products/tags/')['ETag']
+        self.assertEqual(client.get('/api/products/tags/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Cozy', slug='cozy')
+        self.assertEqual(client.get('/api/products/tags/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ProductFacetsTest(TestCase):
+    """Test facet counts for the filter sidebar."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import Category, Tag
+
+        cache.clear()
+        gifts = Category.objects.create(name='Gifts', slug='gifts')
+        jewelry = Category.objects.create(name='Jewelry', slug='jewelry', parent=gifts)
+        cozy = Tag.objects.create(name='Cozy', slug='cozy')
+        ring = Product.objects.create(name='Ring', slug='ring', base_price=60000.00, is_featured=True)
+        ring.categories.add(gifts, jewelry)
+        mug = Product.objects.create(name='Mug', slug='mug', base_price=5000.00, is_customizable=True)
+        mug.categories.add(gifts)
+        mug.tags.add(cozy)
+
+    def test_counts_follow_filters(self):
+        res = APIClient().get('/api/products/facets/')
+        self.assertEqual(res.data['count'], 2)
+        self.assertEqual([(c['slug'], c['count']) for c in res.data['categories']], [('gifts', 2), ('jewelry', 1)])
+        self.assertEqual([(p['key'], p['count']) for p in res.data['price']],
+                         [('under-15000', 1), ('15000-50000', 0), ('over-50000', 1)])
+        self.assertEqual(res.data['flags'], {'is_customizable': 1, 'is_featured': 1, 'is_trending': 0})
+
+        res = APIClient().get('/api/products/facets/?tag=cozy')
+        self.assertEqual(res.data['count'], 1)
+        self.assertEqual(res.data['tags'], [{'slug': 'cozy', 'name': 'Cozy', 'count': 1}])
+
+
+class VariantMatrixTest(TestCase):
+    """Test the compact ?variant_format=matrix encoding."""
+
+    def setUp(self):
+        from .models import Attribute, AttributeValue, ProductVariant
+
+        self.product = Product.objects.create(name='Tee', slug='tee', base_price=5000.00)
+        color, size = Attribute.objects.create(name='Color'), Attribute.objects.create(name='Size')
+        red, blue = (AttributeValue.objects.create(attribute=color, value=v) for v in ('Red', 'Blue'))
+        small, large = (AttributeValue.objects.create(attribute=size, value=v) for v in ('S', 'L'))
+        self.variants = {}
+        for c, sz, stock in ((red, small, 1), (red, large, 2), (blue, large, 3)):
+            variant = ProductVariant.objects.create(product=self.product, stock_quantity=stock)
+            variant.attributes.add(c, sz)
+            self.variants[(c.value, sz.value)] = variant.pk
+
+    def test_matrix_is_dense_over_axes(self):
+        res = APIClient().get('/api/products/tee/?variant_format=matrix')
+        self.assertNotIn('variants', res.data)
+        matrix = res.data['variant_matrix']
+        self.assertEqual([axis['name'] for axis in matrix['axes']], ['Color', 'Size'])
+        self.assertEqual(matrix['shape'], [2, 2])
+        self.assertEqual(matrix['cells'], [
+            [self.variants[('Red', 'S')], None, 1], [self.variants[('Red', 'L')], None, 2],
+            None, [self.variants[('Blue', 'L')], None, 3],
+        ])
+        self.assertEqual(matrix['unplaced'], [])
+
+
+class CatalogImportExportTest(TestCase):
+    """Test the streaming import_catalog / export_catalog commands."""
+
+    CSV = (
+        "slug,name,base_price,is_featured,categories,tags,sku,stock_quantity,attributes\n"
+        "mug,Mug,2500,true,gifts/kitchen,For Her|Cozy,MUG-R,4,Color=Red;Size=11oz\n"
+        "mug,,,,,,MUG-B,2,Color=Blue;Size=11oz\n"
+        "card,Card,500,0,gifts,,,,\n"
+    )
+
+    def test_import_upserts_and_round_trips(self):
+        import io
+        import json
+        import sys
+        from unittest import mock
+        from django.core.management import call_command
+
+        with mock.patch.object(sys, 'stdin', io.StringIO(self.CSV)):
+            call_command('import_catalog', '-', format='csv', batch_size=1, stdout=io.StringIO())
+
+        mug = Product.objects.get(slug='mug')
+        self.assertTrue(mug.is_featured)
+        self.assertEqual(mug.effective_price, 2500)
+        self.assertEqual([c.get_full_path('/') for c in mug.categories.all()], ['Gifts/Kitchen'])
+        self.assertEqual(sorted(mug.tags.values_list('slug', flat=True)), ['cozy', 'for-her'])
+        self.assertEqual(sorted(mug.variants.values_list('sku', 'stock_quantity')), [('MUG-B', 2), ('MUG-R', 4)])
+
+        # Re-importing updates in place instead of duplicating
+        updated = self.CSV.replace('Mug,2500', 'Mug,3000').replace('MUG-R,4', 'MUG-R,9')
+        with mock.patch.object(sys, 'stdin', io.StringIO(updated)):
+            call_command('import_catalog', '-', format='csv', stdout=io.StringIO())
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Product.objects.get(slug='mug').effective_price, 3000)
+        self.assertEqual(mug.variants.get(sku='MUG-R').stock_quantity, 9)
+
+        out = io.StringIO()
+        with mock.patch.object(sys, 'stdout', out):
+            call_command('export_catalog', format='jsonl')
+        records = {r['slug']: r for r in map(json.loads, out.getvalue().splitlines())}
+        self.assertEqual(records['mug']['categories'], ['gifts/kitchen'])
+        self.assertEqual(records['mug']['variants'][0]['attributes'], {'Color': 'Red', 'Size': '11oz'})
+        self.assertEqual(records['card']['variants'], [])
+
+    def test_feed_without_link_columns_keeps_links(self):
+        import io
+        import sys
+        from unittest import mock
+        from django.core.management import call_command
+
+        with mock.patch.object(sys, 'stdin', io.StringIO(self.CSV)):
+            call_command('import_catalog', '-', format='csv', stdout=io.StringIO())
+
+        prices = "slug,name,base_price\nmug,Mug,2800\n"
+        with mock.patch.object(sys, 'stdin', io.StringIO(prices)):
+            call_command('import_catalog', '-', format='csv', stdout=io.StringIO())
+        jsonl = '{"slug": "mug", "name": "Mug", "base_price": "2900"}\n'
+        with mock.patch.object(sys, 'stdin', io.StringIO(jsonl)):
+            call_command('import_catalog', '-', format='jsonl', stdout=io.StringIO())
+
+        mug = Product.objects.get(slug='mug')
+        self.assertEqual(mug.base_price, 2900)
+        self.assertEqual(mug.categories.count(), 1)
+        self.assertEqual(sorted(mug.tags.values_list('slug', flat=True)), ['cozy', 'for-her'])
+
+    def test_category_under_another_parent_is_reported(self):
+        import io
+        import sys
+        from unittest import mock
+        from django.core.management import CommandError, call_command
+
+        with mock.patch.object(sys, 'stdin', io.StringIO(self.CSV)):
+            call_command('import_catalog', '-', format='csv', stdout=io.StringIO())
+
+        moved = "slug,name,base_price,categories\nbowl,Bowl,1500,home/kitchen\n"
+        with mock.patch.object(sys, 'stdin', io.StringIO(moved)):
+            with self.assertRaisesMessage(CommandError, "'kitchen' already exists under 'gifts'"):
+                call_command('import_catalog', '-', format='csv', stdout=io.StringIO())
+        self.assertFalse(Product.objects.filter(slug='bowl').exists())
+
+    def test_round_trip_adopts_variants_without_sku(self):
+        import io
+        import sys
+        from unittest import mock
+        from django.core.management import call_command
+        from .models import Attribute, AttributeValue, ProductVariant
+
+        mug = Product.objects.create(name='Mug', slug='mug', base_price=2500.00)
+        color = Attribute.objects.create(name='Color')
+        for value in ('Red', 'Blue'):
+            variant = ProductVariant.objects.create(product=mug, stock_quantity=3)
+            variant.attributes.add(AttributeValue.objects.create(attribute=color, value=value))
+        ProductVariant.objects.create(product=mug, stock_quantity=1)  # no attributes
+
+        out = io.StringIO()
+        with mock.patch.object(sys, 'stdout', out):
+            call_command('export_catalog', format='jsonl')
+        for _ in range(2):
+            with mock.patch.object(sys, 'stdin', io.StringIO(out.getvalue())):
+                call_command('import_catalog', '-', format='jsonl', stdout=io.StringIO())
+
+        self.assertEqual(
+            sorted(ProductVariant.objects.filter(product=mug).values_list('sku', flat=True)),
+            ['mug:', 'mug:Color=Blue', 'mug:Color=Red'],
+        )
+
+    def test_jsonl_records_write_only_their_own_keys(self):
+        import io
+        import sys
+        from unittest import mock
+        from django.core.management import call_command
+
+        Product.objects.create(name='Card', slug='card', base_price=500.00, description='Keep me', is_featured=True)
+        jsonl = (
+            '{"slug": "mug", "name": "Mug", "base_price": "2500", "description": "New mug", "is_featured": false}\n'
+            '{"slug": "card", "name": "Card", "base_price": "600"}\n'
+        )
+        with mock.patch.object(sys, 'stdin', io.StringIO(jsonl)):
+            call_command('import_catalog', '-', format='jsonl', stdout=io.StringIO())
+
+        card = Product.objects.get(slug='card')
+        self.assertEqual(card.base_price, 600)
+        self.assertEqual(card.description, 'Keep me')
+        self.assertTrue(card.is_featured)
+        self.assertEqual(Product.objects.get(slug='mug').description, 'New mug')
@@ -10,7 +10,8 @@ from .views import (
     TagListView,
     CategoryDetailView,
     RelatedProductsView,
-    SaleProductListView
+    SaleProductListView,
+    ProductFacetsView,
 )
 
 app_name = 'products'
@@ -24,6 +25,7 @@ urlpatterns = [
     path('related/<slug:slug>/', RelatedProductsView.as_view(), name='related-products'),
     path('categories/<slug:slug>/', CategoryDetailView.as_view(), name='category-detail'),
     path('featured/', FeaturedProductsView.as_view(), name='featured-products'),
+    path('facets/', ProductFacetsView.as_view(), name='product-facets'),
     path('gift-finder/recommendations/', GiftRecommendationsView.as_view(), name='gift-recommendations'),
     
     # 2. Action Routes
@@ -0,0 +1,79 @@
+"""
+Compact variant matrix.
+
+ProductVariantSerializer nests every attribute value of every variant, so a
+5 colours x 6 sizes product repeats attribute names 60 times and needs the
+variants__attributes__attribute prefetch. The matrix form lists each
+attribute axis once and stores variants in a dense row-major grid indexed by
+value positions:
+
+    {
+      "axes": [{"id": 1, "name": "Color", "values": [{"id": 4, "value": "Red"}, ...]}, ...],
+      "shape": [5, 6],
+      "fields": ["id", "price_override", "stock_quantity"],
+      "cells": [[31, "2500.00", 4], null, ...],
+      "unplaced": [[40, null, 2]]
+    }
+
+The cell for value positions (i, j) is cells[i * shape[1] + j]; missing
+combinations are null. Variants that can't be placed (missing an axis, or
+duplicating another variant's combination) are listed in "unplaced".
+Built from one flat query.
+"""
+from math import prod
+
+from .models import ProductVariant
+
+MATRIX_FIELDS = ('id', 'price_override', 'stock_quantity')
+
+
+def _cell(variant_id, price_override, stock_quantity):
+    return [variant_id, None if price_override is None else str(price_override), stock_quantity]
+
+
+def build_variant_matrix(product_id):
+    rows = (
+        ProductVariant.objects
+        .filter(product_id=product_id)
+        .order_by('pk', 'attributes__attribute_id', 'attributes__pk')
+        .values_list(
+            'pk', 'price_override', 'stock_quantity',
+            'attributes__attribute_id', 'attributes__attribute__name', 'attributes__pk', 'attributes__value',
+        )
+    )
+
+    axes = {}      # attribute id -> {'id', 'name', 'values': [...], 'index': {value id: position}}
+    variants = {}  # variant id -> (cell, {attribute id: value id})
+    for variant_id, price, stock, attribute_id, attribute_name, value_id, value in rows:
+        cell, combo = variants.setdefault(variant_id, (_cell(variant_id, price, stock), {}))
+        if attribute_id is None:
+            continue
+        axis = axes.setdefault(attribute_id, {'id': attribute_id, 'name': attribute_name, 'values': [], 'index': {}})
+        if value_id not in axis['index']:
+            axis['index'][value_id] = len(axis['values'])
+            axis['values'].append({'id': value_id, 'value': value})
+        combo[attribute_id] = value_id
+
+    ordered_axes = [axes[attribute_id] for attribute_id in sorted(axes)]
+    shape = [len(axis['values']) for axis in ordered_axes]
+    cells = [None] * (prod(shape) if ordered_axes else 0)
+    unplaced = []
+    for cell, combo in variants.values():
+        if not ordered_axes or len(combo) != len(ordered_axes):
+            unplaced.append(cell)
+            continue
+        position = 0
+        for axis, size in zip(ordered_axes, shape):
+            position = position * size + axis['index'][combo[axis['id']]]
+        if cells[position] is None:
+            cells[position] = cell
+        else:
+            unplaced.append(cell)
+
+    return {
+        'axes': [{key: axis[key] for key in ('id', 'name', 'values')} for axis in ordered_axes],
+        'shape': shape,
+        'fields': list(MATRIX_FIELDS),
+        'cells': cells,
+        'unplaced': unplaced,
+    }
@@ -0,0 +1,138 @@
+"""
+Write-behind product view counter.
+
+Detail views used to run `UPDATE ... view_count = view_count + 1` on every hit,
+which makes the hottest products fight over row locks. Views are now buffered
+in a Redis hash (the django-redis connection behind CACHES) and folded into
+Product.view_count in batches by the flush_product_view_counts task.
+
+When the cache is not Redis (tests, local dev without Redis) we fall back to
+the old synchronous UPDATE.
+"""
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from .models import Product
+
+PENDING_KEY = 'products:views:pending'
+FLUSHING_KEY = 'products:views:flushing'
+FLUSH_LOCK_KEY = 'products:views:flush-lock'
+
+FLUSH_BATCH_SIZE = 500
+# Upper bound on how many pending deltas get merged into a live ordering query
+LIVE_MERGE_LIMIT = 200
+
+
+def _get_connection():
+    """Raw Redis connection for the default cache, or None if the cache isn't Redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def _increment_now(product_id, amount=1):
+    Product.objects.filter(pk=product_id).update(view_count=F('view_count') + amount)
+
+
+def record_view(product_id):
+    """Count one view of a product without touching the product row."""
+    conn = _get_connection()
+    if conn is None:
+        _increment_now(product_id)
+        return
+
+    from redis.exceptions import RedisError
+    try:
+        conn.hincrby(PENDING_KEY, product_id, 1)
+    except RedisError:
+        # Never lose a view because Redis hiccupped; pay for the row lock instead
+        _increment_now(product_id)
+
+
+def _decode(raw):
+    return {int(pk): int(count) for pk, count in raw.items()}
+
+
+def get_pending_view_counts():
+    """Views recorded but not yet flushed, as {product_id: delta}."""
+    conn = _get_connection()
+    if conn is None:
+        return {}
+
+    from redis.exceptions import RedisError
+    try:
+        pipe = conn.pipeline()
+        pipe.hgetall(PENDING_KEY)
+        pipe.hgetall(FLUSHING_KEY)
+        pending, flushing = pipe.execute()
+    except RedisError:
+        return {}
+
+    deltas = _decode(pending)
+    for pk, count in _decode(flushing).items():
+        deltas[pk] = deltas.get(pk, 0) + count
+    return deltas
+
+
+def _view_count_case(deltas):
+    return Case(
+        *[When(pk=pk, then=Value(count)) for pk, count in deltas.items()],
+        default=Value(0),
+        output_field=PositiveIntegerField(),
+    )
+
+
+def with_live_view_counts(queryset):
+    """
+    Annotate `live_view_count`: the stored view_count plus any pending views,
+    so ordering by popularity stays close to live between flushes. Only the
+    largest pending deltas are merged to keep the query bounded.
+    """
+    deltas = get_pending_view_counts()
+    if not deltas:
+        return queryset.annotate(live_view_count=F('view_count'))
+
+    top = dict(sorted(deltas.items(), key=lambda item: item[1], reverse=True)[:LIVE_MERGE_LIMIT])
+    return queryset.annotate(live_view_count=F('view_count') + _view_count_case(top))
+
+
+def flush_view_counts(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Move buffered views into Product.view_count with batched UPDATEs.
+    Returns the number of views written.
+    """
+    conn = _get_connection()
+    if conn is None:
+        return 0
+
+    from redis.exceptions import ResponseError
+    if not conn.set(FLUSH_LOCK_KEY, 1, nx=True, ex=300):
+        return 0  # another worker is flushing
+
+    try:
+        # A leftover FLUSHING_KEY means a previous flush died part-way; finish it first
+        if not conn.exists(FLUSHING_KEY):
+            try:
+                conn.rename(PENDING_KEY, FLUSHING_KEY)
+            except ResponseError:
+                return 0  # nothing pending
+
+        deltas = _decode(conn.hgetall(FLUSHING_KEY))
+        items = list(deltas.items())
+        written = 0
+        for start in range(0, len(items), batch_size):
+            chunk = dict(items[start:start + batch_size])
+            Product.objects.filter(pk__in=chunk.keys()).update(
+                view_count=F('view_count') + _view_count_case(chunk)
+            )
+            # Drop what we applied so a later crash doesn't re-apply it. Delivery is
+            # at-least-once: dying between the UPDATE and this hdel re-applies this
+            # chunk on the next flush (a few extra views, never lost ones)
+            conn.hdel(FLUSHING_KEY, *chunk.keys())
+            written += sum(chunk.values())
+
+        conn.delete(FLUSHING_KEY)
+        return written
+    finally:
+        conn.delete(FLUSH_LOCK_KEY)
@@ -1,7 +1,7 @@
 from rest_framework import generics, filters
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Product, DesignPlacement, Category, Tag
+from .models import Product, DesignPlacement, Category, Tag, RelatedProduct
 from .serializers import (
     ProductSerializer, 
     ProductListSerializer, 
@@ -9,26 +9,36 @@ from .serializers import (
     CategorySerializer,
     TagSerializer,
 )
+import time
 import django_filters
 from django.db import models
+from django.utils import timezone
 import django_filters
-from .models import Product, Tag
+from rest_framework.response import Response
+from .models import Product, Tag, Category
+from .cards import render_cards
+from .view_counts import record_view, with_live_view_counts
+from .search import ProductSearchFilter
+from .tag_index import get_tag_index
+from .sampling import RandomSample, sample_pool
+from .facets import FACET_SCOPES, get_facets
+from lensra.utils.pagination import KeysetPageNumberPagination
+from lensra.utils.conditional import ConditionalGetMixin
 
 
 class ProductFilter(django_filters.FilterSet):
+    # Price the customer pays, sale price included (see products.sales)
     min_price = django_filters.NumberFilter(
-        field_name="base_price",
+        field_name="effective_price",
         lookup_expr='gte'
     )
     max_price = django_filters.NumberFilter(
-        field_name="base_price",
+        field_name="effective_price",
         lookup_expr='lte'
     )
 
-    category = django_filters.CharFilter(
-        field_name="categories__slug",
-        lookup_expr='exact'
-    )
+    # Matches the category and every category below it in the tree
+    category = django_filters.CharFilter(method='filter_category')
 
     tag = django_filters.ModelMultipleChoiceFilter(
         field_name="tags__slug",   # change to tags__id if you prefer
@@ -36,6 +46,16 @@ class ProductFilter(django_filters.FilterSet):
         queryset=Tag.objects.all()
     )
 
+    def filter_category(self, queryset, name, value):
+        category = Category.objects.filter(slug=value).only('path').first()
+        if category is None:
+            return queryset.none()
+        # Subquery on the through table keeps rows distinct without a DISTINCT
+        in_subtree = Product.categories.through.objects.filter(
+            category__path__startswith=category.path
+        ).values('product_id')
+        return queryset.filter(id__in=in_subtree)
+
     class Meta:
         model = Product
         fields = [
@@ -47,38 +67,82 @@ class ProductFilter(django_filters.FilterSet):
         ]
 
 
-class CategoryListView(generics.ListAPIView):
+class LiveViewCountOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that sorts `view_count` by the stored count plus views still
+    buffered in Redis (see products.view_counts), so popularity ordering stays live.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering or not any(field.lstrip('-') == 'view_count' for field in ordering):
+            return super().filter_queryset(request, queryset, view)
+
+        # Cursors need a stable sort key, so keyset pages use the stored count
+        paginator = getattr(view, 'paginator', None)
+        if isinstance(paginator, KeysetPageNumberPagination) and paginator.uses_keyset(request):
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = with_live_view_counts(queryset)
+        ordering = [
+            field.replace('view_count', 'live_view_count') if field.lstrip('-') == 'view_count' else field
+            for field in ordering
+        ]
+        return queryset.order_by(*ordering)
+
+
+class CategoryListView(ConditionalGetMixin, generics.ListAPIView):
     """Returns list of categories for navigation/filtering."""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_scopes = ('categories',)
 
-class CategoryDetailView(generics.RetrieveAPIView):
+class CategoryDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """Returns detailed info for a specific category."""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
+    cache_scopes = ('categories',)
 
-class TagListView(generics.ListAPIView):
+class TagListView(ConditionalGetMixin, generics.ListAPIView):
     """Returns list of tags for filtering."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_scopes = ('tags',)
+
+
+class ProductCardListMixin:
+    """
+    Renders list responses from stored ProductCard payloads (see products.cards)
+    instead of running ProductListSerializer for every row.
+    Querysets should select_related('card') so each page is a single query.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(render_cards(page))
+
+        return Response(render_cards(queryset))
 
 
-class ProductListView(generics.ListAPIView):
-    queryset = Product.objects.filter(is_active=True)\
-        .prefetch_related('categories', 'variants__attributes__attribute', 'printable_areas')
+class ProductListView(ProductCardListMixin, generics.ListAPIView):
+    queryset = Product.objects.filter(is_active=True).select_related('card')
     
     serializer_class = ProductListSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, LiveViewCountOrderingFilter, ProductSearchFilter]
     filterset_class = ProductFilter 
     search_fields = ['name']
+    pagination_class = KeysetPageNumberPagination  # ?pagination=cursor / ?count=false
     
-    # Allow sorting by base_price AND view_count
-    ordering_fields = ['base_price', 'view_count']
+    # Allow sorting by price (list or effective) AND view_count
+    ordering_fields = ['base_price', 'effective_price', 'view_count']
     
     # Optional: default ordering
     ordering = ['-view_count']  # most viewed first
@@ -86,40 +150,73 @@ class ProductListView(generics.ListAPIView):
     
 
 from rest_framework.response import Response
+from django.http import Http404
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductConditionalGetMixin(ConditionalGetMixin):
+    """
+    Validators from the product row's updated_at, which products.signals
+    touches whenever anything embedded in the detail payload changes.
+    """
+
+    def get_object_validators(self, request):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        row = Product.objects.filter(is_active=True, **{self.lookup_field: lookup})\
+            .values_list('pk', 'updated_at', 'is_sale_live').first()
+        if row is None:
+            # Missing or inactive: a 404 now, never a 304 (If-None-Match: * matches any ETag)
+            raise Http404
+
+        pk, updated_at, sale_live = row
+        self.validated_pk = pk
+        parts = [pk, updated_at.isoformat()]
+        last_modified = updated_at.timestamp()
+        if sale_live:
+            # sale_ends_in counts down, so live sales revalidate every minute
+            parts.append(int(time.time() // 60))
+            last_modified = None
+        return parts, last_modified, [f'product-{pk}']
+
+    def not_modified(self, request):
+        # A 304 is still a product view
+        record_view(self.validated_pk)
+
+
+class ProductDetailView(ProductConditionalGetMixin, generics.RetrieveAPIView):
     """Detailed view for the editor: Loads product, print zones, and all variants."""
-    queryset = Product.objects.filter(is_active=True)\
-        .prefetch_related('categories', 'variants__attributes__attribute', 'printable_areas')
-        
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        # Prefetch only the relations the (possibly ?fields= trimmed) response renders
+        return Product.objects.filter(is_active=True)\
+            .prefetch_related(*self.get_serializer().get_prefetch_lookups())
+
     def get(self, request, *args, **kwargs):
         # Retrieve the object
         product = self.get_object()
 
-        # Increment view_count safely
-        Product.objects.filter(pk=product.pk).update(view_count=models.F('view_count') + 1)
+        # Buffered increment, flushed to view_count in batches
+        record_view(product.pk)
 
         # Serialize and return
         serializer = self.get_serializer(product)
         return Response(serializer.data)
 
 
-class ProductDetail(generics.RetrieveAPIView):
+class ProductDetail(ProductConditionalGetMixin, generics.RetrieveAPIView):
     """Detailed view for the editor: Loads product, print zones, and all variants."""
-    queryset = Product.objects.filter(is_active=True)\
-        .prefetch_related('categories', 'variants__attributes__attribute', 'printable_areas')
-        
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'id'
 
+    def get_queryset(self):
+        return Product.objects.filter(is_active=True)\
+            .prefetch_related(*self.get_serializer().get_prefetch_lookups())
+
     def get(self, request, *args, **kwargs):
         product = self.get_object()
-        Product.objects.filter(pk=product.pk).update(view_count=models.F('view_count') + 1)
+        record_view(product.pk)
         serializer = self.get_serializer(product)
         return Response(serializer.data)
 
@@ -144,6 +241,14 @@ from django.db.models import Count, Q
 from .models import Product
 from .serializers import ProductSerializer
 
+# Budget quiz answers, checked in this order (first match wins)
+BUDGET_FILTERS = {
+    'budget-low': lambda price: price < 15000,
+    'budget-mid': lambda price: 15000 <= price <= 50000,
+    'budget-high': lambda price: price > 50000,
+}
+
+
 class GiftRecommendationsView(APIView):
     permission_classes = [AllowAny]
     
@@ -158,30 +263,26 @@ class GiftRecommendationsView(APIView):
         # 2. Separate price tags from descriptive tags for cleaner logic
         price_tags = [t for t in tag_slugs if t.startswith('budget-')]
         interest_tags = [t for t in tag_slugs if not t.startswith('budget-')]
-        
-        # 3. Base Query: Only active products
-        products = Product.objects.filter(is_active=True)
-
-        # 4. Apply Hard Budget Filters (if applicable)
-        if 'budget-low' in price_tags:
-            products = products.filter(base_price__lt=15000)
-        elif 'budget-mid' in price_tags:
-            products = products.filter(base_price__range=(15000, 50000))
-        elif 'budget-high' in price_tags:
-            products = products.filter(base_price__gt=50000)
-
-        # 5. THE RANKING ENGINE: 
-        # - Filter for products containing at least one of the interest tags
-        # - Count how many of those tags match (relevance score)
-        # - Order by the count (descending) then by featured status
-        products = products.filter(tags__slug__in=interest_tags) \
-            .annotate(relevance_score=Count('tags', filter=Q(tags__slug__in=interest_tags))) \
-            .order_by('-relevance_score', '-is_featured', 'base_price') \
-            .distinct()
 
-        # 6. Final limit and serialize
-        results = products[:10]
-        serializer = ProductSerializer(results, many=True)
+        # 3. Hard budget filter (if applicable)
+        price_filter = next(
+            (check for budget, check in BUDGET_FILTERS.items() if budget in price_tags),
+            None
+        )
+
+        # 4. THE RANKING ENGINE (in-memory, see products.tag_index):
+        # - Products containing at least one of the interest tags
+        # - Ranked by how many of those tags match, then featured, then price
+        product_ids = get_tag_index().search(interest_tags, price_filter, limit=10)
+
+        # 5. Hydrate only the winners and serialize in rank order
+        context = {'request': request}  # honours ?fields= / ?expand=
+        products = Product.objects.filter(pk__in=product_ids).prefetch_related(
+            *ProductSerializer(context=context).get_prefetch_lookups()
+        )
+        by_id = {product.pk: product for product in products}
+        results = [by_id[pk] for pk in product_ids if pk in by_id]
+        serializer = ProductSerializer(results, many=True, context=context)
         
         return Response({"results": serializer.data}, status=status.HTTP_200_OK)
 
@@ -191,7 +292,7 @@ from django.db.models import Q
 
 
 
-class FeaturedProductsView(generics.ListAPIView):
+class FeaturedProductsView(ProductCardListMixin, generics.ListAPIView):
     """
     Returns featured or trending non-customizable products.
     Supports filtering by tags, category, price, etc.
@@ -202,95 +303,132 @@ class FeaturedProductsView(generics.ListAPIView):
 
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
         filters.OrderingFilter,
+        ProductSearchFilter,  # after ordering so relevance leads
     ]
     filterset_class = ProductFilter
     search_fields = ['name']
-    ordering_fields = ['base_price']
+    ordering_fields = ['base_price', 'effective_price']
 
     def get_queryset(self):
         return (
             Product.objects
             .filter(is_active=True)
             .filter(Q(is_featured=True) | Q(is_trending=True))
-            .prefetch_related(
-                'categories',
-                'tags',  # ✅ IMPORTANT: prefetch tags
-                'variants__attributes__attribute'
-            )
-            .order_by('?')  # randomize for homepage freshness
+            .select_related('card')  # cards carry categories, tags and variants
         )
 
+    def filter_queryset(self, queryset):
+        # Randomize for homepage freshness by sampling ids (see products.sampling)
+        params = set(self.request.query_params) - {self.paginator.page_query_param}
+        if not params:
+            return sample_pool('featured-trending', queryset)
+
+        queryset = super().filter_queryset(queryset)
+        if queryset.ordered:
+            return queryset  # explicit ?ordering= or search relevance
+        return RandomSample(list(queryset.values_list('pk', flat=True)), queryset)
 
+
+import random
 from django.shortcuts import get_object_or_404
 from django.db.models import Count
 
-class RelatedProductsView(generics.ListAPIView):
+class RelatedProductsView(ProductCardListMixin, generics.ListAPIView):
     """
-    Returns products related to the current product
-    based on shared tags (primary signal).
+    Returns products related to the current product, read from the
+    precomputed neighbour table (see products.related).
     """
 
     serializer_class = ProductListSerializer
     permission_classes = [AllowAny]
+    related_count = 8  # perfect number for UI
 
     def get_queryset(self):
         product = get_object_or_404(
-            Product.objects.prefetch_related('tags', 'categories'),
+            Product.objects.only('pk'),
             slug=self.kwargs['slug'],
             is_active=True,
             is_customizable=False,
         )
 
+        neighbours = list(
+            RelatedProduct.objects
+            .filter(product=product)
+            .values_list('related_id', 'score', 'shared_categories')
+        )
+        if not neighbours:
+            # Not computed yet (e.g. a brand new product): query it live
+            return self.get_live_queryset(product)
+
+        # Shuffle within equally scored neighbours so the section doesn't look frozen
+        random.shuffle(neighbours)
+        neighbours.sort(key=lambda row: (-row[1], -row[2]))
+        ids = [related_id for related_id, _, _ in neighbours[:self.related_count]]
+
+        by_id = Product.objects.filter(pk__in=ids, is_active=True).select_related('card').in_bulk()
+        return [by_id[pk] for pk in ids if pk in by_id]
+
+    def get_live_queryset(self, product):
         product_tags = product.tags.all()
 
-        # 1️⃣ Primary: products sharing the most tags
-        related = (
+        # 1️⃣ Primary: products sharing the most tags, shuffled within ties like the precomputed path
+        related = list(
             Product.objects
             .filter(is_active=True)
             .exclude(id=product.id)
             .filter(tags__in=product_tags)
             .annotate(shared_tags=Count('tags'))
             .order_by('-shared_tags', '?')
-            .prefetch_related(
-                'categories',
-                'tags',
-                'variants__attributes__attribute'
-            )
+            .select_related('card')[:self.related_count]
         )
+        if related:
+            return related
 
         # 2️⃣ Fallback: same category if tags are weak
-        if not related.exists():
-            related = (
-                Product.objects
-                .filter(
-                    is_active=True,
-                    categories__in=product.categories.all()
-                )
-                .exclude(id=product.id)
-                .distinct()
-                .order_by('?')
+        candidates = list(
+            Product.objects
+            .filter(
+                is_active=True,
+                categories__in=product.categories.all()
             )
-
-        return related[:8]  # perfect number for UI
+            .exclude(id=product.id)
+            .distinct()
+            .values_list('pk', flat=True)
+        )
+        return RandomSample(candidates, Product.objects.select_related('card'))[:self.related_count]
 
 
-from django.utils import timezone
 from rest_framework.generics import ListAPIView
 
 
 
-class SaleProductListView(ListAPIView):
+class ProductFacetsView(ConditionalGetMixin, generics.GenericAPIView):
+    """
+    Facet counts (categories, tags, price buckets, flags) for the product list
+    filtered by the same query params, e.g. /api/products/facets/?tag=for-her
+    """
+    queryset = Product.objects.filter(is_active=True)
+    permission_classes = [AllowAny]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter]
+    filterset_class = ProductFilter
+    search_fields = ['name']
+    cache_scopes = FACET_SCOPES
+
+    def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(get_facets(queryset, request.query_params))
+
+
+class SaleProductListView(ProductCardListMixin, ListAPIView):
     serializer_class = ProductListSerializer
     permission_classes = [AllowAny]
 
     def get_queryset(self):
-        now = timezone.now()
-
+        # is_sale_live is flipped at sale_start/sale_end by products.sales; sales
+        # that ended since the last sweep are left out already
         return Product.objects.filter(
             is_active=True,
-            is_on_sale=True,
-            sale_start__lte=now,
-            sale_end__gte=now
-        ).order_by('-created_at')
\ No newline at end of file
+            is_sale_live=True,
+            sale_end__gt=timezone.now(),
+        ).select_related('card').order_by('-created_at')
\ No newline at end of file
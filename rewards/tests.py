@@ -1,3 +1,36 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import RewardPerk, RewardProfile, RewardTransaction
+
+User = get_user_model()
+
+
+class RedeemPerkIdempotencyTest(TestCase):
+    """Test that a retried redemption with the same Idempotency-Key runs once."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='points@example.com', password='testpass123')
+        RewardProfile.objects.update_or_create(user=self.user, defaults={'points': 500})
+        self.perk = RewardPerk.objects.create(title='Free Card', description='A card', point_cost=200)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_retry_replays_first_response(self):
+        url = f'/api/rewards/redeem/{self.perk.pk}/'
+        first = self.client.post(url, {}, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        second = self.client.post(url, {}, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(RewardTransaction.objects.count(), 1)
+
+        mismatch = self.client.post(url, {'note': 'other'}, format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(mismatch.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        # A new key is a new redemption
+        self.client.post(url, {}, format='json', HTTP_IDEMPOTENCY_KEY='retry-2')
+        self.assertEqual(RewardTransaction.objects.count(), 2)
@@ -7,6 +7,7 @@ from .serializers import RewardProfileSerializer, PerkSerializer
 import secrets
 import string
 from django.db import transaction # Essential for point safety
+from lensra.utils.idempotency import idempotent
 
 class RewardDashboardView(generics.RetrieveAPIView):
     """Returns user points and history"""
@@ -24,6 +25,7 @@ class AvailablePerksView(generics.ListAPIView):
 class RedeemPerkView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, perk_id):
         try:
             # We use select_for_update() to prevent race conditions 
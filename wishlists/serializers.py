@@ -4,6 +4,7 @@ from products.serializers import ProductSerializer
 from products.models import Product
 
 class WishlistItemSerializer(serializers.ModelSerializer):
+    # Full product by default; ?fields=items.id,items.product.name,... trims it (and its prefetches)
     product = ProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(), 
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, prefetch_related_objects
 from .models import Wishlist, WishlistItem
 from .serializers import WishlistSerializer, WishlistItemSerializer
 
@@ -12,7 +13,16 @@ class WishlistDetailView(APIView):
     def get(self, request):
         """Get the user's wishlist and items."""
         wishlist, _ = Wishlist.objects.get_or_create(user=request.user)
-        serializer = WishlistSerializer(wishlist)
+        serializer = WishlistSerializer(wishlist, context={'request': request})
+
+        # Prefetch only what the (possibly ?fields=/?expand= trimmed) product cards render
+        product_serializer = serializer.fields['items'].child.fields['product']
+        prefetch_related_objects([wishlist], Prefetch(
+            'items',
+            queryset=WishlistItem.objects.select_related('product').prefetch_related(
+                *product_serializer.get_prefetch_lookups(prefix='product__')
+            )
+        ))
         return Response(serializer.data)
 
     def post(self, request):